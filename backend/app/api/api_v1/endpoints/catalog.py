@@ -146,7 +146,9 @@ async def import_ontology_data(
     
     try:
         stats = await examination_kg_importer.import_from_csv(tmp_path, clear_existing=clear_existing)
-        return {"success": True, "stats": stats}
+        # Swap in the new ontology for the standardization pipeline
+        snapshot = await examination_kg_service.refresh_snapshot()
+        return {"success": True, "stats": stats, "ontology_version": snapshot.version}
     finally:
         os.unlink(tmp_path)
 
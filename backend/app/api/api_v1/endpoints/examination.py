@@ -2,14 +2,19 @@
 API endpoints for examination standardization.
 """
 
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query, BackgroundTasks
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, BackgroundTasks, Response
 from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
 from typing import Optional
-import io
+import asyncio
+import json
 import logging
 import os
 
-from app.services.examination_standardization_service import examination_service
+from app.core.events import task_events
+from app.core.exceptions import LLMOverloadedError
+from app.services.examination_standardization_service import examination_service, STANDARDIZATION_MODES
+from app.services.examination_result_exporter import XLSX_CONTENT_TYPE
 from app.services.examination_kg_importer import examination_kg_importer
 from app.services.examination_kg_service import examination_kg_service
 
@@ -22,7 +27,10 @@ router = APIRouter()
 async def upload_examination_file(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
-    user: str = Query(default="system")
+    user: str = Query(default="system"),
+    batch_size: Optional[int] = Query(default=None, ge=1, le=50),
+    mode: Optional[str] = Query(default=None),
+    dry_run: bool = Query(default=False)
 ):
     """
     Upload a file for examination standardization.
@@ -30,8 +38,13 @@ async def upload_examination_file(
     Expected file format: CSV or Excel
     Required columns: 检查项目名, 检查标准模态 (or exam_name, modality)
     
+    Args:
+        batch_size: Exam names per LLM prompt (defaults to STANDARDIZATION_BATCH_SIZE)
+        mode: "two_stage" or "single_pass" (defaults to STANDARDIZATION_MODE)
+        dry_run: Only estimate LLM calls, tokens and wall time; no task is created
+    
     Returns:
-        Task ID for tracking progress
+        Task ID for tracking progress (the estimate for a dry run)
     """
     try:
         # Validate file type
@@ -40,15 +53,30 @@ async def upload_examination_file(
                 status_code=400,
                 detail="Unsupported file format. Please upload CSV or Excel file."
             )
+        if mode is not None and mode not in STANDARDIZATION_MODES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unsupported mode. Choose one of: {', '.join(STANDARDIZATION_MODES)}"
+            )
+        
+        options = {}
+        if batch_size is not None:
+            options["batch_size"] = batch_size
+        if mode is not None:
+            options["mode"] = mode
         
-        # Read content
-        content = await file.read()
+        if dry_run:
+            estimate = await examination_service.estimate_upload(file, options)
+            return {"success": True, "dry_run": True, "estimate": estimate}
         
         # Create task
-        task_id = examination_service.create_task(file.filename, user)
+        task_id = examination_service.create_task(file.filename, user, options=options)
+        
+        # Spool to disk; the background job streams it in chunks
+        file_path = await examination_service.save_upload(task_id, file)
         
         # Process in background
-        background_tasks.add_task(examination_service.process_file, task_id, content, file.filename)
+        background_tasks.add_task(examination_service.process_file, task_id, file_path, file.filename)
         
         return {
             "success": True,
@@ -56,11 +84,59 @@ async def upload_examination_file(
             "message": "File uploaded and processing started"
         }
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error uploading file: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+class StandardizeRequest(BaseModel):
+    exam_name: str = Field(..., min_length=1)
+    modality: Optional[str] = ""
+    deadline_ms: Optional[int] = Field(default=None, ge=0, le=30000)
+
+
+def _overloaded(e: LLMOverloadedError) -> HTTPException:
+    headers = {"Retry-After": str(int(e.retry_after))} if e.retry_after else None
+    return HTTPException(status_code=429, detail="LLM 服务繁忙，请稍后重试", headers=headers)
+
+
+@router.post("/standardize")
+async def standardize_one(request: StandardizeRequest, response: Response):
+    """
+    Standardize a single exam name synchronously (order-entry integrations).
+    
+    Cache and dictionary hits answer immediately; the LLM fallback gets
+    `deadline_ms` (default STANDARDIZATION_SYNC_DEADLINE). If it takes longer
+    the response is 202 with a ticket for GET /standardize/{ticket}.
+    """
+    deadline = request.deadline_ms / 1000 if request.deadline_ms is not None else None
+    try:
+        result = await examination_service.standardize_one(request.exam_name, request.modality or "", deadline)
+    except LLMOverloadedError as e:
+        raise _overloaded(e)
+    
+    if result["status"] == "pending":
+        response.status_code = 202
+    return {"success": True, **result}
+
+
+@router.get("/standardize/{ticket}")
+async def get_standardize_ticket(ticket: str, response: Response):
+    """Poll a pending single-item standardization."""
+    try:
+        result = examination_service.get_ticket(ticket)
+    except LLMOverloadedError as e:
+        raise _overloaded(e)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Ticket not found or expired")
+    
+    if result["status"] == "pending":
+        response.status_code = 202
+    return {"success": True, **result}
+
+
 @router.get("/history")
 async def get_history(limit: int = 50):
     """
@@ -95,6 +171,107 @@ async def get_task_status(task_id: str):
     }
 
 
+SSE_HEARTBEAT_SECONDS = 15
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+@router.get("/tasks/{task_id}/events")
+async def stream_task_events(task_id: str):
+    """
+    Server-sent events for a standardization task.
+
+    Events:
+        progress: counters, rows_per_second and eta_seconds (at most every
+            STANDARDIZATION_EVENT_INTERVAL seconds, plus a final one)
+        results: {"rows": [...]} rows as they are standardized
+        end: the task is no longer running; carries the final task status
+
+    Tasks that are not "processing" get their current status and `end` at
+    once. A processing task is followed even before its run starts (an
+    upload or resume whose background job is still queued).
+    """
+    # Subscribe before checking the task so a run finishing in between still ends the stream
+    queue = task_events.subscribe(task_id)
+    task = examination_service.get_task(task_id)
+    if not task:
+        task_events.unsubscribe(task_id, queue)
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    async def events():
+        try:
+            status = task["status"]
+            while status == "processing":
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=SSE_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # A run that ends without publishing here (e.g. in another worker) still ends the stream
+                    current = examination_service.get_task(task_id)
+                    status = current["status"] if current else None
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is None:
+                    break
+                yield _sse(*item)
+            yield _sse("end", examination_service.get_task(task_id) or task)
+        finally:
+            task_events.unsubscribe(task_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/tasks/{task_id}/resume")
+async def resume_task(task_id: str, background_tasks: BackgroundTasks):
+    """
+    Resume an interrupted or failed task.
+
+    Rows whose results were already stored are skipped; only the remaining
+    rows of the spooled upload are standardized.
+    """
+    # Reserved here, so a second resume request is refused with 409
+    reason = examination_service.check_resumable(task_id, reserve=True)
+    if reason == "Task not found":
+        raise HTTPException(status_code=404, detail=reason)
+    if reason:
+        raise HTTPException(status_code=409, detail=reason)
+
+    background_tasks.add_task(examination_service.resume_task, task_id, reserved=True)
+    return {
+        "success": True,
+        "task_id": task_id,
+        "message": "Task resumed"
+    }
+
+
+@router.post("/tasks/{task_id}/sync")
+async def sync_task_to_graph(task_id: str):
+    """
+    Re-run the StdTerm graph sync of a completed task (e.g. after a failed
+    sync or manual corrections). Progress is reported in the task's `kag_sync`.
+    """
+    task = examination_service.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+    if task["status"] != "completed":
+        raise HTTPException(status_code=409, detail="Task is not completed")
+    if (task["kag_sync"] or {}).get("status") in ("pending", "running"):
+        raise HTTPException(status_code=409, detail="Graph sync is already in progress")
+
+    job_id = examination_service.schedule_kag_sync(task_id)
+    return {
+        "success": True,
+        "task_id": task_id,
+        "job_id": job_id,
+        "message": "Graph sync scheduled"
+    }
+
+
 @router.delete("/tasks/{task_id}")
 async def delete_task(task_id: str):
     """
@@ -111,21 +288,34 @@ async def delete_task(task_id: str):
 
 
 @router.get("/tasks/{task_id}/results")
-async def get_task_results(task_id: str):
+async def get_task_results(
+    task_id: str,
+    offset: int = Query(default=0, ge=0),
+    limit: Optional[int] = Query(default=None, ge=1, le=5000),
+    status: Optional[str] = Query(default=None)
+):
     """
     Get detailed results for a completed task.
     
+    Args:
+        offset: Rows to skip
+        limit: Page size (omit to return all rows)
+        status: Only rows with this status (success, review_required, failed)
+    
     Returns:
-        List of standardization results
+        Page of standardization results and the total matching row count
     """
-    results = examination_service.get_task_results(task_id)
-    
-    if results is None:
+    if not examination_service.get_task(task_id):
         raise HTTPException(status_code=404, detail="Task not found")
     
+    results = examination_service.get_task_results(task_id, offset=offset, limit=limit, status=status)
+    
     return {
         "success": True,
-        "results": results
+        "results": results,
+        "total": examination_service.count_task_results(task_id, status=status),
+        "offset": offset,
+        "limit": limit
     }
 
 
@@ -139,12 +329,13 @@ async def update_task_results(
     
     Args:
         task_id: Task ID
-        results: List of corrected results
+        results: Corrected rows (any page of GET /results); each is matched
+            on its row_index, unknown indexes reject the whole update
         
     Returns:
         Success status
     """
-    success = examination_service.update_task_results(task_id, results)
+    success = await examination_service.update_task_results(task_id, results)
     
     if not success:
         raise HTTPException(status_code=400, detail="Failed to update results. Task not found or invalid data.")
@@ -155,6 +346,34 @@ async def update_task_results(
     }
 
 
+@router.patch("/tasks/{task_id}/results/{row_index}")
+async def update_task_result(
+    task_id: str,
+    row_index: int,
+    correction: dict
+):
+    """
+    Correct a single result row (Manual Correction).
+    Expects: { "standardized": [[一级部位, 二级部位, 检查方法], ...], "status": "success" (optional) }
+    """
+    standardized = correction.get("standardized")
+    if not isinstance(standardized, list) or not all(
+        isinstance(item, list) and len(item) == 3 for item in standardized
+    ):
+        raise HTTPException(status_code=400, detail="standardized must be a list of [level1, level2, method] triples")
+    
+    row = await examination_service.update_task_result(
+        task_id, row_index, standardized, correction.get("status")
+    )
+    if row is None:
+        raise HTTPException(status_code=404, detail="Task or result row not found")
+    
+    return {
+        "success": True,
+        "result": row
+    }
+
+
 @router.get("/config/llm")
 async def get_llm_config():
     """Get current LLM configuration."""
@@ -248,23 +467,21 @@ async def export_task_results(
     content = examination_service.export_results(task_id, format)
     
     if content is None:
-        raise HTTPException(status_code=404, detail="Task not found or no results available")
+        raise HTTPException(status_code=404, detail="Task not found")
     
     # Prepare response
     if format == "csv":
-        media_type = "text/csv"
+        media_type = "text/csv; charset=utf-8"
         filename = f"examination_results_{task_id}.csv"
     else:
-        media_type = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        media_type = XLSX_CONTENT_TYPE
         filename = f"examination_results_{task_id}.xlsx"
     
+    # Sync iterator: Starlette pulls it in a worker thread, one chunk at a time
     return StreamingResponse(
-        io.BytesIO(content),
+        content,
         media_type=media_type,
         headers={
             "Content-Disposition": f"attachment; filename={filename}"
         }
     )
-
-
-
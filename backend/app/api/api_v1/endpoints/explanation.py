@@ -4,8 +4,14 @@ from typing import List, Optional, Dict, Any
 from pydantic import BaseModel
 from app.services.explanation_service import ExplanationService
 from app.adapters.neo4j_adapter import Neo4jAdapter
+from app.core.config import settings
 from app.core.llm import llm_service
+from app.core.exceptions import LLMOverloadedError
 from app.services.conversation_service import conversation_service
+from app.services.explanation_stream import (
+    STREAM_MODES, STREAM_SEQUENTIAL, THINKING_AUTO, THINKING_OFF, THINKING_OPTIONS,
+    resolve_option, stream_thinking_and_answer
+)
 from app.api.api_v1.endpoints.auth import get_current_user
 import logging
 import json
@@ -31,16 +37,24 @@ class RealLLMProvider:
             )
         
         try:
-            response = await client.chat.completions.create(
-                model=llm_service.get_model_name(),
+            response = await llm_service.chat_completion(
                 messages=[
                     {"role": "system", "content": "你是一位专业的医保政策助手。"},
                     {"role": "user", "content": prompt}
                 ],
+                site="explanation.generate",
                 temperature=0.7,
                 max_tokens=2000
             )
             return response.choices[0].message.content
+        except LLMOverloadedError as e:
+            logger.warning(f"LLM overloaded: {e}")
+            headers = {"Retry-After": str(int(e.retry_after))} if e.retry_after else None
+            raise HTTPException(
+                status_code=429,
+                detail="LLM 服务繁忙，请稍后重试",
+                headers=headers
+            )
         except Exception as e:
             logger.error(f"LLM generation failed: {e}")
             raise HTTPException(
@@ -48,10 +62,10 @@ class RealLLMProvider:
                 detail=f"LLM 调用失败: {str(e)}"
             )
     
-    async def generate_stream(self, prompt: str):
+    async def generate_stream(self, prompt: str, site: str = "explanation.stream"):
         """流式生成，逐步返回内容"""
         try:
-            async for chunk in llm_service.generate_stream(prompt):
+            async for chunk in llm_service.generate_stream(prompt, site=site):
                 yield chunk
         except Exception as e:
             logger.error(f"Streaming generation failed: {e}")
@@ -72,6 +86,8 @@ class QueryRequest(BaseModel):
     question: str
     session_id: Optional[str] = None
     use_history: bool = True  # 是否使用历史对话
+    stream_mode: Optional[str] = None  # 仅流式接口: sequential | buffered | interleaved，默认取配置
+    thinking: Optional[str] = None  # 仅流式接口: on | off | auto（负载高时跳过思考），默认取配置
 
 
 @router.post("/query")
@@ -166,8 +182,14 @@ async def query_policy_stream(
     - data: {"type": "metadata", "data": {...}}  # 推理元数据
     - data: {"type": "thinking", "content": "..."}  # 思考过程片段
     - data: {"type": "thinking_done"}  # 思考完成
+    - data: {"type": "thinking_skipped"}  # 未生成思考过程（thinking=off，或 auto 且 LLM 繁忙）
     - data: {"type": "chunk", "content": "..."}  # 答案片段
     - data: {"type": "done", "session_id": "..."}  # 结束标记
+    
+    stream_mode 控制思考与答案的生成方式：
+    - sequential: 思考完成后再开始生成答案
+    - buffered: 两者同时生成，答案片段缓存到思考结束后立即发送（事件顺序不变）
+    - interleaved: 两者同时生成，答案片段到达即发送（与思考片段交错）
     """
     
     # 检查 LLM 是否可用
@@ -223,9 +245,15 @@ async def query_policy_stream(
             }
             yield f"data: {json.dumps(metadata, ensure_ascii=False)}\n\n"
             
-            # === 思考过程阶段 ===
-            # 构建思考过程的 prompt
-            thinking_prompt = f"""
+            stream_mode = resolve_option(request.stream_mode, STREAM_MODES, settings.EXPLANATION_STREAM_MODE)
+            thinking = resolve_option(request.thinking, THINKING_OPTIONS, settings.EXPLANATION_THINKING)
+            skip_thinking = thinking == THINKING_OFF or (
+                thinking == THINKING_AUTO
+                and llm_service.limiter.is_busy(settings.EXPLANATION_THINKING_BUSY_UTILIZATION)
+            )
+            
+            # === 思考过程 prompt ===
+            thinking_prompt = None if skip_thinking else f"""
 请分析以下问题，并展示你的思考过程：
 
 问题：{result.get('contextualized_question', request.question)}
@@ -244,42 +272,27 @@ async def query_policy_stream(
 
 请用 200 字以内简明扼要地展示思考过程。
 """
+            if skip_thinking:
+                logger.info(f"[THINKING] Skipped (thinking={thinking})")
+                yield f"data: {json.dumps({'type': 'thinking_skipped'}, ensure_ascii=False)}\n\n"
+            logger.info(f"[STREAM] mode={stream_mode}, thinking={'off' if skip_thinking else 'on'}")
             
-            logger.info("[THINKING] Starting thinking process generation")
-            yield f"data: {json.dumps({'type': 'thinking_start'}, ensure_ascii=False)}\n\n"
-            
+            # === 思考与答案生成 ===
             full_thinking = ""
-            chunk_count = 0
-            async for chunk in llm_provider.generate_stream(thinking_prompt):
-                full_thinking += chunk
-                chunk_count += 1
-                thinking_data = {
-                    "type": "thinking",
-                    "content": chunk
-                }
-                yield f"data: {json.dumps(thinking_data, ensure_ascii=False)}\n\n"
-                await asyncio.sleep(0.01)
-            
-            logger.info(f"[THINKING] Completed. Total chunks: {chunk_count}, Total length: {len(full_thinking)}")
-            yield f"data: {json.dumps({'type': 'thinking_done'}, ensure_ascii=False)}\n\n"
-            
-            # === 答案生成阶段 ===
-            logger.info("[ANSWER] Starting answer generation")
-            yield f"data: {json.dumps({'type': 'answer_start'}, ensure_ascii=False)}\n\n"
-            
             full_answer = ""
-            answer_chunk_count = 0
-            async for chunk in llm_provider.generate_stream(result["prompt"]):
-                full_answer += chunk
-                answer_chunk_count += 1
-                chunk_data = {
-                    "type": "chunk",
-                    "content": chunk
-                }
-                yield f"data: {json.dumps(chunk_data, ensure_ascii=False)}\n\n"
-                await asyncio.sleep(0.01)
+            async for event_type, content in stream_thinking_and_answer(
+                llm_provider.generate_stream, thinking_prompt, result["prompt"], mode=stream_mode
+            ):
+                if event_type == "thinking":
+                    full_thinking += content
+                elif event_type == "chunk":
+                    full_answer += content
+                event = {"type": event_type} if content is None else {"type": event_type, "content": content}
+                yield f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+                if content is not None and stream_mode == STREAM_SEQUENTIAL:
+                    await asyncio.sleep(0.01)
             
-            logger.info(f"[ANSWER] Completed. Total chunks: {answer_chunk_count}, Total length: {len(full_answer)}")
+            logger.info(f"[STREAM] Completed. Thinking length: {len(full_thinking)}, answer length: {len(full_answer)}")
             
             # 保存完整答案（包含思考过程）
             conversation_service.add_message(
@@ -1,9 +1,11 @@
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
 import os
 import logging
-from app.core.llm import llm_service
+from app.core.concurrency import render_single_flight_metrics
+from app.core.llm import llm_service, llm_metrics
 from app.core.kg import neo4j_service
 
 router = APIRouter()
@@ -48,21 +50,31 @@ async def update_llm_config(config: LLMConfig):
 @router.post("/test/llm")
 async def test_llm_connection():
     """Test LLM connection."""
-    client = llm_service.get_client()
-    if not client:
+    if not llm_service.get_client():
         return {"success": False, "message": "Client not initialized"}
         
     try:
         # Simple test call
-        await client.chat.completions.create(
-            model=llm_service.get_model_name(),
+        await llm_service.chat_completion(
             messages=[{"role": "user", "content": "Hi"}],
+            site="system.test",
+            deadline=15.0,
             max_tokens=5
         )
         return {"success": True, "message": "Connection successful"}
     except Exception as e:
         return {"success": False, "message": str(e)}
 
+@router.get("/metrics/llm", response_class=PlainTextResponse)
+async def get_llm_metrics():
+    """LLM gateway metrics by call site (Prometheus text format)."""
+    return PlainTextResponse(llm_metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/metrics/single-flight", response_class=PlainTextResponse)
+async def get_single_flight_metrics():
+    """Calls executed and duplicate concurrent calls absorbed, per single-flight group."""
+    return PlainTextResponse(render_single_flight_metrics(), media_type="text/plain; version=0.0.4")
+
 @router.get("/config/kg")
 async def get_kg_config():
     """Get current KG configuration."""
@@ -0,0 +1,320 @@
+import asyncio
+import functools
+import inspect
+import logging
+from typing import Any, AsyncIterable, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+
+class SlidingWindowScheduler:
+    """
+    Worker-pool scheduler that keeps up to `concurrency` jobs in flight.
+
+    Unlike fixed `asyncio.gather` batches, a slot is refilled as soon as any
+    job finishes, so one slow call no longer stalls the whole batch.
+    """
+
+    def __init__(self, concurrency: int):
+        self.concurrency = max(1, int(concurrency))
+
+    async def run(
+        self,
+        items: Union[Iterable[Any], AsyncIterable[Any]],
+        worker: Callable[[Any], Awaitable[Any]],
+        on_result: Optional[Callable[[Any, Any, Optional[BaseException]], Any]] = None
+    ) -> int:
+        """
+        Run `worker(item)` for every item with bounded concurrency.
+
+        Args:
+            items: Sync or async iterable; consumed lazily
+            worker: Coroutine function processing one item
+            on_result: Called as on_result(item, result, error) in completion
+                order; may be a coroutine function
+
+        Returns:
+            Number of items processed
+        """
+        iterator = self._iterate(items)
+        pull_lock = asyncio.Lock()
+        processed = 0
+
+        async def next_item():
+            async with pull_lock:
+                try:
+                    return True, await iterator.__anext__()
+                except StopAsyncIteration:
+                    return False, None
+
+        async def run_worker():
+            nonlocal processed
+            while True:
+                has_item, item = await next_item()
+                if not has_item:
+                    return
+                result, error = None, None
+                try:
+                    result = await worker(item)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    error = e
+                processed += 1
+                if on_result is not None:
+                    outcome = on_result(item, result, error)
+                    if inspect.isawaitable(outcome):
+                        await outcome
+
+        workers = [asyncio.create_task(run_worker()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            raise
+        return processed
+
+    @staticmethod
+    async def _iterate(items):
+        if hasattr(items, "__aiter__"):
+            async for item in items:
+                yield item
+        else:
+            for item in items:
+                yield item
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD (additive-increase / multiplicative-decrease) concurrency limiter.
+
+    - Each healthy completion (latency under target, low error rate) grows the
+      limit by 1/limit, i.e. about +1 per window of `limit` requests.
+    - An overload signal (429, timeout, 5xx) multiplies the limit by
+      `backoff_factor`, at most once per `cooldown` seconds.
+    - A Retry-After hint pauses new acquisitions until it expires.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 8,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        latency_target: float = 10.0,
+        backoff_factor: float = 0.5,
+        error_rate_threshold: float = 0.1,
+        cooldown: float = 1.0
+    ):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(max(initial_limit, self.min_limit), self.max_limit))
+        self.latency_target = latency_target
+        self.backoff_factor = backoff_factor
+        self.error_rate_threshold = error_rate_threshold
+        self.cooldown = cooldown
+
+        self.in_flight = 0
+        self.error_rate = 0.0  # EWMA of overload signals
+        self.blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+
+        self.total_requests = 0
+        self.total_overloads = 0
+        self.latency_ewma: Optional[float] = None  # seconds, completed calls only
+
+    def _get_condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        """Wait for a free slot and for any Retry-After pause to expire."""
+        condition = self._get_condition()
+        async with condition:
+            while True:
+                loop = asyncio.get_running_loop()
+                pause = self.blocked_until - loop.time()
+                if pause > 0:
+                    condition.release()
+                    try:
+                        await asyncio.sleep(pause)
+                    finally:
+                        await condition.acquire()
+                    continue
+                if self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    self.total_requests += 1
+                    return
+                await condition.wait()
+
+    async def release(self, latency: Optional[float] = None, overloaded: bool = False,
+                      retry_after: Optional[float] = None):
+        """
+        Free a slot and adapt the limit.
+
+        Args:
+            latency: Call duration in seconds (None if the call did not complete)
+            overloaded: The call hit a rate limit / timeout / server error
+            retry_after: Provider Retry-After hint in seconds
+        """
+        condition = self._get_condition()
+        async with condition:
+            self.in_flight = max(0, self.in_flight - 1)
+            now = asyncio.get_running_loop().time()
+
+            if overloaded:
+                self.total_overloads += 1
+                self.error_rate = 0.8 * self.error_rate + 0.2
+                if now - self._last_decrease >= self.cooldown:
+                    self.limit = max(float(self.min_limit), self.limit * self.backoff_factor)
+                    self._last_decrease = now
+                    logger.warning(f"LLM overload signal: concurrency limit reduced to {int(self.limit)}")
+                if retry_after:
+                    self.blocked_until = max(self.blocked_until, now + retry_after)
+            else:
+                self.error_rate = 0.8 * self.error_rate
+                if latency is not None:
+                    self.latency_ewma = latency if self.latency_ewma is None else 0.8 * self.latency_ewma + 0.2 * latency
+                healthy = latency is not None and latency <= self.latency_target
+                if healthy and self.error_rate < self.error_rate_threshold:
+                    self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+            condition.notify_all()
+
+    def is_busy(self, utilization: float) -> bool:
+        """True while pausing for a Retry-After or with `utilization` of the limit in flight."""
+        paused = self.blocked_until > asyncio.get_running_loop().time()
+        return paused or self.in_flight >= utilization * self.limit
+
+    def get_stats(self) -> dict:
+        return {
+            "limit": int(self.limit),
+            "in_flight": self.in_flight,
+            "error_rate": round(self.error_rate, 4),
+            "total_requests": self.total_requests,
+            "total_overloads": self.total_overloads,
+            "latency_ewma": round(self.latency_ewma, 3) if self.latency_ewma is not None else None
+        }
+
+
+class SingleFlight:
+    """
+    Request coalescing: concurrent callers with the same key share one call.
+
+    The first caller for a key starts `fn()` as a task; callers arriving
+    while it runs await that task instead of starting their own and get its
+    result (the same object) or exception. The key is dropped as soon as the
+    call finishes, so nothing is cached. A cancelled caller leaves the call
+    running for the others; it is cancelled only when nobody waits for it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        # key -> [task, waiters]
+        self._calls: Dict[Hashable, List[Any]] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]], join_timeout: Optional[float] = None) -> Any:
+        """
+        Result of `fn()`, or of the running call with the same key.
+
+        Args:
+            join_timeout: Seconds a caller that joins a running call waits for
+                it (asyncio.TimeoutError after); the starting call bounds itself
+        """
+        call = self._calls.get(key)
+        joined = call is not None
+        if call is None:
+            task = asyncio.ensure_future(fn())
+            call = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        task = call[0]
+        call[1] += 1
+        try:
+            if joined and join_timeout is not None:
+                return await asyncio.wait_for(asyncio.shield(task), join_timeout)
+            return await asyncio.shield(task)
+        finally:
+            call[1] -= 1
+            if call[1] == 0 and not task.done():
+                task.cancel()
+
+    def forget(self, key: Hashable) -> None:
+        """
+        Detach the running call for `key`, e.g. after a write it may predate.
+
+        Its current waiters still get its result; later callers start a new call.
+        """
+        self._calls.pop(key, None)
+
+    def get_stats(self) -> dict:
+        return {"calls": self.calls, "coalesced": self.coalesced, "in_flight": len(self._calls)}
+
+    def _forget(self, key: Hashable, task: asyncio.Future):
+        call = self._calls.get(key)
+        if call is not None and call[0] is task:
+            del self._calls[key]
+
+
+single_flight_groups: Dict[str, SingleFlight] = {}
+
+
+def get_single_flight(name: str) -> SingleFlight:
+    """The process-wide SingleFlight group called `name`."""
+    group = single_flight_groups.get(name)
+    if group is None:
+        group = single_flight_groups[name] = SingleFlight(name)
+    return group
+
+
+def single_flight(name: str, key: Optional[Callable[..., Hashable]] = None):
+    """
+    Decorator coalescing concurrent calls of a coroutine function.
+
+    Calls share a flight when `key(*args, **kwargs)` matches (default: all
+    arguments, `self` included). Calls with unhashable arguments run on
+    their own. Callers get the same result object and must not mutate it.
+    `wrapper.forget(*args, **kwargs)` detaches the running call for those
+    arguments (pass `self` explicitly for methods).
+    """
+    group = get_single_flight(name)
+
+    def call_key_for(*args, **kwargs):
+        return key(*args, **kwargs) if key else (args, tuple(sorted(kwargs.items())))
+
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            call_key = call_key_for(*args, **kwargs)
+            try:
+                hash(call_key)
+            except TypeError:
+                return await func(*args, **kwargs)
+            return await group.do(call_key, lambda: func(*args, **kwargs))
+
+        def forget(*args, **kwargs):
+            group.forget(call_key_for(*args, **kwargs))
+
+        wrapper.forget = forget
+        return wrapper
+    return decorator
+
+
+def render_single_flight_metrics() -> str:
+    """Prometheus text for every SingleFlight group."""
+    lines = ["# HELP single_flight_calls_total Calls actually executed, by group",
+             "# TYPE single_flight_calls_total counter"]
+    lines += [f'single_flight_calls_total{{group="{name}"}} {group.calls}'
+              for name, group in sorted(single_flight_groups.items())]
+    lines += ["# HELP single_flight_coalesced_total Duplicate concurrent calls absorbed, by group",
+              "# TYPE single_flight_coalesced_total counter"]
+    lines += [f'single_flight_coalesced_total{{group="{name}"}} {group.coalesced}'
+              for name, group in sorted(single_flight_groups.items())]
+    return "\n".join(lines) + "\n"
@@ -43,6 +43,69 @@ class Settings(BaseSettings):
     KAG_HOST: str = kag_project_cfg.get("host_addr", "http://127.0.0.1:8887")
     KAG_NAMESPACE: str = kag_project_cfg.get("namespace", "MedicalGovernance")
 
+    # Examination standardization
+    STANDARDIZATION_CONCURRENCY: int = 10  # LLM requests in flight per task
+    LLM_PROVIDER_CONCURRENCY: Dict[str, int] = {}  # per provider host cap, e.g. {"api.openai.com": 20}
+    STANDARDIZATION_PROGRESS_INTERVAL: float = 2.0  # seconds between progress commits
+    STANDARDIZATION_EVENT_INTERVAL: float = 0.5  # seconds between live progress events
+    STANDARDIZATION_FLUSH_ROWS: int = 1000  # buffered result rows before a bulk insert
+    STANDARDIZATION_RESUME_ON_STARTUP: bool = True  # resume interrupted tasks on startup, else mark them failed
+    STANDARDIZATION_RESUME_WORKERS: int = 1  # startup resumes run at once (own queue, not the shared task_queue)
+    STANDARDIZATION_SYNC_DEADLINE: float = 0.15  # seconds POST /examination/standardize waits for the LLM
+    STANDARDIZATION_TICKET_TTL: float = 600.0  # seconds a finished pending ticket stays readable
+    STANDARDIZATION_CACHE_MISS_TTL: float = 30.0  # seconds a result-cache miss is remembered in memory
+    STANDARDIZATION_ESTIMATE_CALL_LATENCY: float = 3.0  # seconds per LLM call in dry-run estimates before any call was observed
+    STANDARDIZATION_CORRECTION_SIMILARITY: float = 0.85  # min edit similarity to reuse a reviewer correction for a variant name
+    STD_TERM_SYNC_BATCH_SIZE: int = 2000  # StdTerm nodes per UNWIND MERGE
+    STD_TERM_SYNC_MAX_RETRIES: int = 3
+    STD_TERM_SYNC_RETRY_BASE_DELAY: float = 2.0
+    STANDARDIZATION_MAX_REQUEUES: int = 5  # times a rate-limited record is retried before failing
+    STANDARDIZATION_BATCH_SIZE: int = 1  # exam names per LLM prompt; 1 disables batch mode
+    STANDARDIZATION_MODE: str = "two_stage"  # two_stage | single_pass
+
+    # LLM adaptive concurrency (AIMD)
+    LLM_INITIAL_CONCURRENCY: int = 8
+    LLM_MIN_CONCURRENCY: int = 1
+    LLM_MAX_CONCURRENCY: int = 64
+    LLM_LATENCY_TARGET: float = 15.0  # seconds; slower calls stop the limit from growing
+    LLM_MAX_RETRIES: int = 3  # retries per call on 429 / 5xx / timeout
+    LLM_RETRY_BASE_DELAY: float = 1.0  # seconds, doubled per retry when no Retry-After is sent
+
+    # LLM gateway HTTP pool (shared by every OpenAI-compatible client)
+    LLM_HTTP_MAX_CONNECTIONS: int = 100
+    LLM_HTTP_MAX_KEEPALIVE: int = 20
+    LLM_HTTP_KEEPALIVE_EXPIRY: float = 30.0  # seconds an idle connection is kept
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_REQUEST_TIMEOUT: float = 60.0  # seconds per attempt unless a call passes a deadline
+
+    # LLM prompt cache: call site -> TTL seconds; sites not listed are never cached
+    LLM_PROMPT_CACHE_SITES: Dict[str, int] = {
+        "examination.level1": 7 * 86400,
+        "examination.detail": 7 * 86400,
+        "examination.single_pass": 7 * 86400,
+        "examination.batch_level1": 7 * 86400,
+        "examination.batch_detail": 7 * 86400,
+        "examination.batch_single_pass": 7 * 86400,
+        "clinical_nlp.entities": 86400,
+        "clinical_nlp.relations": 86400,
+        "clinical_nlp.classify": 86400,
+        "rule.compile": 86400,
+        "rule.validate": 86400,
+        "terminology.expand_query": 86400
+    }
+    LLM_PROMPT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024  # in-process LRU tier
+    LLM_PROMPT_CACHE_REDIS: bool = True  # second tier through CacheService
+
+    # Streaming policy Q&A (/explanation/query-stream)
+    # sequential | buffered | interleaved; the concurrent modes hold two LLM limiter slots per request
+    EXPLANATION_STREAM_MODE: str = "buffered"
+    EXPLANATION_THINKING: str = "auto"  # on | off | auto (skipped while the LLM limiter is busy)
+    EXPLANATION_THINKING_BUSY_UTILIZATION: float = 0.8  # share of the LLM limit in flight that counts as busy
+
+    # KAG LLMClient (NLP, rule and terminology services)
+    KAG_LLM_MAX_WORKERS: int = 8  # threads for clients without a native async path
+    KAG_LLM_TIMEOUT: float = 60.0  # seconds per call
+
     class Config:
         case_sensitive = True
 
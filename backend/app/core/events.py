@@ -1,5 +1,5 @@
 import asyncio
-from typing import Dict, Any, Callable, List
+from typing import Dict, Any, Callable, List, Optional, Set, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
@@ -45,6 +45,62 @@ class EventBus:
 # Global event bus instance
 event_bus = EventBus()
 
+
+class TopicBroker:
+    """
+    In-process fan-out pub/sub keyed by topic (e.g. a task id).
+
+    Every subscriber owns a bounded queue; `publish` never blocks the
+    publisher: when a slow subscriber's queue is full its oldest event is
+    dropped. The last "progress" event of each topic is replayed to new
+    subscribers so they start from the current state.
+    """
+
+    def __init__(self, max_queue: int = 1000):
+        self.max_queue = max_queue
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._latest: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+
+    def has_subscribers(self, topic: str) -> bool:
+        return bool(self._subscribers.get(topic))
+
+    def subscribe(self, topic: str) -> asyncio.Queue:
+        """Register a queue receiving (event, data) tuples; None marks the end of the topic."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue)
+        if topic in self._latest:
+            queue.put_nowait(self._latest[topic])
+        self._subscribers.setdefault(topic, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, topic: str, queue: asyncio.Queue):
+        queues = self._subscribers.get(topic)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[topic]
+
+    def publish(self, topic: str, event: str, data: Dict[str, Any]):
+        if event == "progress":
+            self._latest[topic] = (event, data)
+        for queue in self._subscribers.get(topic, ()):
+            self._offer(queue, (event, data))
+
+    def close(self, topic: str):
+        """End a topic: subscribers receive None and the replay state is dropped."""
+        self._latest.pop(topic, None)
+        for queue in self._subscribers.pop(topic, ()):
+            self._offer(queue, None)
+
+    @staticmethod
+    def _offer(queue: asyncio.Queue, item: Optional[Tuple[str, Dict[str, Any]]]):
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(item)
+
+
+# Live progress of standardization tasks, one topic per task id
+task_events = TopicBroker()
+
 # Example handlers
 async def on_document_uploaded(data: Dict[str, Any]):
     """Handler for document upload events."""
@@ -22,6 +22,12 @@ class GraphQueryError(GovernanceException):
     def __init__(self, message: str):
         super().__init__(message, code="GRAPH_QUERY_ERROR")
 
+class LLMOverloadedError(GovernanceException):
+    """LLM provider still rate-limited/unavailable after retries; the work can be retried later."""
+    def __init__(self, message: str, retry_after: float = None):
+        self.retry_after = retry_after
+        super().__init__(message, code="LLM_OVERLOADED")
+
 async def governance_exception_handler(request: Request, exc: GovernanceException):
     """Handle custom governance exceptions."""
     return JSONResponse(
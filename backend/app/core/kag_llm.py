@@ -0,0 +1,171 @@
+"""
+Async adapter for the KAG LLMClient.
+
+KAG's `LLMClient.__call__` is synchronous; calling it inside an `async def`
+blocks the event loop (every concurrent request and stream) for the whole
+LLM round trip. AsyncKAGLLM awaits the client's own async HTTP path when it
+has one and otherwise runs the sync call on a bounded thread pool. Every call
+has a timeout, can be cancelled, goes through the gateway's limiter and
+jittered retries and is recorded in the gateway's `llm_metrics` under its call
+site; opted-in sites share the gateway's prompt cache.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import asyncio
+import inspect
+import logging
+import os
+import threading
+import time
+
+from app.core.concurrency import get_single_flight
+from app.core.config import settings
+from app.core.exceptions import LLMOverloadedError
+from app.core.llm import LLMService, build_async_client, llm_metrics, llm_service
+from app.core.llm_cache import MISS, prompt_cache, prompt_key
+
+logger = logging.getLogger(__name__)
+
+kag_flight = get_single_flight("kag_llm")
+
+
+class AsyncKAGLLM:
+    """
+    Awaitable wrapper around a KAG LLMClient: `await llm(prompt)`.
+
+    - Native path: the client class overrides `acall` (KAG's OpenAI-compatible
+      clients use AsyncOpenAI). The base `LLMClient.acall` just calls the
+      blocking `__call__`, so it does not count.
+    - Fallback: `client(prompt)` on a pool of `max_workers` threads. A call
+      that times out or is cancelled before it starts is dropped from the
+      queue; one already running finishes in its thread, but nobody waits
+      for it.
+    """
+
+    def __init__(self, client: Any, max_workers: int = 8, timeout: Optional[float] = 60.0,
+                 gateway: Optional[LLMService] = None):
+        self.client = client
+        self.timeout = timeout
+        # Supplies the limiter and retries (the client's SDK retries are off)
+        self.gateway = gateway or llm_service
+        self._native: Optional[Callable] = self._native_acall(client)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        if self._native is None:
+            self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="kag-llm")
+
+        self.calls = 0
+        self.timeouts = 0
+
+    @property
+    def is_native(self) -> bool:
+        return self._native is not None
+
+    async def __call__(self, prompt: Any, timeout: Optional[float] = None, site: str = "kag", **kwargs) -> str:
+        """
+        Run one inference without blocking the event loop.
+
+        Args:
+            site: Call-site label for `llm_metrics`
+
+        Raises:
+            asyncio.TimeoutError: No answer within `timeout` (default: the adapter's),
+                retries included
+            LLMOverloadedError: Provider still overloaded after LLM_MAX_RETRIES retries
+        """
+        timeout = self.timeout if timeout is None else timeout
+        key = prompt_key(getattr(self.client, "model", ""), prompt, kwargs)
+        cache_ttl = prompt_cache.ttl_for(site)
+        if cache_ttl:
+            cached, tier = await prompt_cache.get(key)
+            llm_metrics.cache_lookup(site, tier)
+            if tier != MISS:
+                return cached
+
+        # Identical prompts already in flight on this adapter are joined, not re-sent
+        return await kag_flight.do(
+            (id(self), key), lambda: self._infer(prompt, timeout, site, kwargs, key, cache_ttl), join_timeout=timeout
+        )
+
+    async def _infer(self, prompt: Any, timeout: Optional[float], site: str, kwargs: dict,
+                     cache_key: str, cache_ttl: Optional[int]) -> str:
+        self.calls += 1
+
+        def send(budget: Optional[float]):
+            if self._native is not None:
+                return self._native(prompt, **kwargs)
+            loop = asyncio.get_running_loop()
+            return loop.run_in_executor(self._executor, lambda: self.client(prompt, **kwargs))
+
+        started = time.monotonic()
+        try:
+            response = await self.gateway.run_with_retries(send, site, timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            llm_metrics.observe(site, "timeout", time.monotonic() - started)
+            logger.warning(f"KAG LLM call timed out after {timeout}s")
+            raise
+        except LLMOverloadedError:
+            llm_metrics.observe(site, "overloaded", time.monotonic() - started)
+            raise
+        except Exception:
+            llm_metrics.observe(site, "error", time.monotonic() - started)
+            raise
+        llm_metrics.observe(site, "ok", time.monotonic() - started)
+        if cache_ttl and isinstance(response, str):
+            await prompt_cache.set(cache_key, response, cache_ttl)
+        return response
+
+    def shutdown(self):
+        """Stop the fallback pool (queued calls are cancelled)."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def get_stats(self) -> dict:
+        return {"native_async": self.is_native, "calls": self.calls, "timeouts": self.timeouts}
+
+    @staticmethod
+    def _native_acall(client: Any) -> Optional[Callable]:
+        for klass in type(client).__mro__:
+            if "acall" in vars(klass):
+                if klass.__name__ == "LLMClient" or not inspect.iscoroutinefunction(vars(klass)["acall"]):
+                    return None
+                return client.acall
+        return None
+
+
+_kag_llm: Optional[AsyncKAGLLM] = None
+_kag_llm_lock = threading.Lock()
+
+
+def get_kag_llm() -> AsyncKAGLLM:
+    """
+    Shared adapter over KAG's `chat_llm` (config/kag_config.yaml), created on
+    first use. Raises if KAG or its chat_llm config is unavailable.
+    """
+    global _kag_llm
+    with _kag_llm_lock:
+        if _kag_llm is None:
+            from kag.common.conf import KAG_CONFIG
+            from kag.interface.common.llm_client import LLMClient
+
+            if not KAG_CONFIG._is_initialized:
+                config_path = os.path.join(settings.PROJECT_ROOT, "config/kag_config.yaml")
+                KAG_CONFIG.initialize(prod=False, config_file=config_path)
+
+            llm_config = KAG_CONFIG.all_config.get("chat_llm")
+            if not llm_config:
+                raise ValueError("chat_llm not found in config/kag_config.yaml")
+
+            client = LLMClient.from_config(llm_config)
+            if hasattr(client, "aclient") and getattr(client, "api_key", None):
+                # OpenAI-compatible client: send its async calls over the gateway's pool;
+                # AsyncKAGLLM retries them through the gateway's limiter
+                client.aclient = build_async_client(client.api_key, getattr(client, "base_url", None))
+            _kag_llm = AsyncKAGLLM(
+                client,
+                max_workers=settings.KAG_LLM_MAX_WORKERS,
+                timeout=settings.KAG_LLM_TIMEOUT
+            )
+            logger.info(f"KAG LLM adapter ready (native async: {_kag_llm.is_native})")
+        return _kag_llm
@@ -98,5 +98,24 @@ class Neo4jService:
             logger.error(f"Query execution failed: {e}")
             return []
 
+    async def execute_write(self, query: str, params: Dict[str, Any] = None, database: str = None) -> List[Dict[str, Any]]:
+        """
+        Run a Cypher write in a managed transaction (the driver retries
+        transient errors). Unlike execute_query, failures are raised so
+        callers can retry or report them.
+        """
+        if not self.driver:
+            await self.initialize()
+        if not self.driver:
+            raise ConnectionError("Neo4j driver not initialized")
+        
+        async def work(tx):
+            result = await tx.run(query, params or {})
+            return await result.data()
+        
+        session_kwargs = {"database": database} if database else {}
+        async with self.driver.session(**session_kwargs) as session:
+            return await session.execute_write(work)
+
 # Global instance
 neo4j_service = Neo4jService()
@@ -1,9 +1,33 @@
+"""
+LLM gateway: the single entry point for OpenAI-compatible chat calls.
+
+Every caller (Q&A, explanation streams, examination standardization, the KAG
+adapter) shares one pooled httpx connection pool, the adaptive concurrency
+limiter, jittered retries, per-call deadlines and per-call-site metrics
+(`llm_metrics`, Prometheus text via GET /system/metrics/llm).
+"""
+
 import os
+import asyncio
 import logging
-from typing import Optional, Dict
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Optional, Dict, List, Tuple
+import httpx
+import openai
 from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
 from dotenv import load_dotenv
 from pathlib import Path
+from urllib.parse import urlparse
+
+from app.core.config import settings
+from app.core.concurrency import AdaptiveConcurrencyLimiter, get_single_flight
+from app.core.exceptions import LLMOverloadedError
+from app.core.llm_cache import MISS, prompt_cache, prompt_key
 
 # Ensure env vars are loaded from backend/.env
 # Get the backend directory (3 levels up from this file)
@@ -20,9 +44,139 @@ else:
 
 logger = logging.getLogger(__name__)
 
+
+class LLMMetrics:
+    """
+    Prometheus-style counters and a latency histogram, labeled by call site.
+
+    - llm_requests_total{site, outcome}: calls by final outcome
+      (ok | overloaded | timeout | error)
+    - llm_attempt_errors_total{site, kind}: failed attempts, retried or not
+    - llm_tokens_total{site, kind}: prompt / completion tokens from `usage`
+    - llm_request_duration_seconds{site}: call latency including retries
+    - llm_cache_requests_total{site, result}: prompt cache lookups
+      (memory | redis | miss)
+    """
+
+    BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.attempt_errors: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.tokens: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.cache_lookups: Dict[Tuple[str, str], int] = defaultdict(int)
+        self.latency_buckets: Dict[str, List[int]] = defaultdict(lambda: [0] * len(self.BUCKETS))
+        self.latency_sum: Dict[str, float] = defaultdict(float)
+        self.latency_count: Dict[str, int] = defaultdict(int)
+
+    def observe(self, site: str, outcome: str, latency: Optional[float] = None,
+                prompt_tokens: int = 0, completion_tokens: int = 0):
+        """Record one finished call."""
+        with self._lock:
+            self.requests[(site, outcome)] += 1
+            if prompt_tokens:
+                self.tokens[(site, "prompt")] += prompt_tokens
+            if completion_tokens:
+                self.tokens[(site, "completion")] += completion_tokens
+            if latency is not None:
+                buckets = self.latency_buckets[site]
+                for index, bound in enumerate(self.BUCKETS):
+                    if latency <= bound:
+                        buckets[index] += 1
+                self.latency_sum[site] += latency
+                self.latency_count[site] += 1
+
+    def attempt_error(self, site: str, kind: str):
+        with self._lock:
+            self.attempt_errors[(site, kind)] += 1
+
+    def cache_lookup(self, site: str, result: str):
+        with self._lock:
+            self.cache_lookups[(site, result)] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-site totals as plain dicts."""
+        with self._lock:
+            sites = {site for site, _ in self.requests} | {site for site, _ in self.cache_lookups}
+            return {
+                site: {
+                    "requests": {o: n for (s, o), n in self.requests.items() if s == site},
+                    "attempt_errors": {k: n for (s, k), n in self.attempt_errors.items() if s == site},
+                    "tokens": {k: n for (s, k), n in self.tokens.items() if s == site},
+                    "cache": {r: n for (s, r), n in self.cache_lookups.items() if s == site},
+                    "latency_avg_s": round(self.latency_sum[site] / self.latency_count[site], 4)
+                    if self.latency_count[site] else None
+                }
+                for site in sorted(sites)
+            }
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        def labels(**values) -> str:
+            return "{" + ",".join(f'{k}="{v}"' for k, v in values.items()) + "}"
+
+        with self._lock:
+            lines = ["# HELP llm_requests_total LLM calls by call site and outcome",
+                     "# TYPE llm_requests_total counter"]
+            lines += [f"llm_requests_total{labels(site=s, outcome=o)} {n}" for (s, o), n in sorted(self.requests.items())]
+            lines += ["# HELP llm_attempt_errors_total Failed LLM attempts by call site and error kind",
+                      "# TYPE llm_attempt_errors_total counter"]
+            lines += [f"llm_attempt_errors_total{labels(site=s, kind=k)} {n}"
+                      for (s, k), n in sorted(self.attempt_errors.items())]
+            lines += ["# HELP llm_tokens_total Tokens reported by the provider",
+                      "# TYPE llm_tokens_total counter"]
+            lines += [f"llm_tokens_total{labels(site=s, kind=k)} {n}" for (s, k), n in sorted(self.tokens.items())]
+            lines += ["# HELP llm_cache_requests_total Prompt cache lookups by call site and result",
+                      "# TYPE llm_cache_requests_total counter"]
+            lines += [f"llm_cache_requests_total{labels(site=s, result=r)} {n}"
+                      for (s, r), n in sorted(self.cache_lookups.items())]
+            lines += ["# HELP llm_request_duration_seconds LLM call latency including retries",
+                      "# TYPE llm_request_duration_seconds histogram"]
+            for site in sorted(self.latency_count):
+                for bound, count in zip(self.BUCKETS, self.latency_buckets[site]):
+                    le = "+Inf" if bound == math.inf else repr(bound)
+                    lines.append(f"llm_request_duration_seconds_bucket{labels(site=site, le=le)} {count}")
+                lines.append(f"llm_request_duration_seconds_sum{labels(site=site)} {self.latency_sum[site]:.6f}")
+                lines.append(f"llm_request_duration_seconds_count{labels(site=site)} {self.latency_count[site]}")
+        return "\n".join(lines) + "\n"
+
+
+llm_metrics = LLMMetrics()
+
+# Identical concurrent requests (same model, messages and parameters) share one call
+llm_flight = get_single_flight("llm")
+
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def shared_http_client() -> httpx.AsyncClient:
+    """The process-wide pooled httpx client behind every AsyncOpenAI client."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=settings.LLM_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_EXPIRY
+            ),
+            timeout=httpx.Timeout(settings.LLM_REQUEST_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT)
+        )
+    return _http_client
+
+
+def build_async_client(api_key: str, base_url: str) -> AsyncOpenAI:
+    """
+    AsyncOpenAI on the shared pool. SDK retries are off: callers go through
+    `LLMService.run_with_retries` (chat_completion, AsyncKAGLLM), so the
+    limiter sees every 429.
+    """
+    return AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, http_client=shared_http_client())
+
+
 class LLMService:
     """
-    Core service for managing OpenAI LLM client.
+    LLM gateway around the configured OpenAI-compatible client.
     Singleton pattern to ensure global access to the configured client.
     """
     _instance = None
@@ -39,6 +193,13 @@ class LLMService:
             
         self.client: Optional[AsyncOpenAI] = None
         self.model: str = "gpt-4"
+        # Shared by every chat-completion call in the process (batch jobs and Q&A)
+        self.limiter = AdaptiveConcurrencyLimiter(
+            initial_limit=settings.LLM_INITIAL_CONCURRENCY,
+            min_limit=settings.LLM_MIN_CONCURRENCY,
+            max_limit=settings.LLM_MAX_CONCURRENCY,
+            latency_target=settings.LLM_LATENCY_TARGET
+        )
         self._init_client()
         self._initialized = True
         
@@ -50,10 +211,7 @@ class LLMService:
         
         if api_key:
             try:
-                self.client = AsyncOpenAI(
-                    api_key=api_key,
-                    base_url=base_url
-                )
+                self.client = build_async_client(api_key, base_url)
                 logger.info(f"OpenAI Core Client initialized with base_url={base_url}, model={self.model}")
             except Exception as e:
                 logger.error(f"Failed to initialize OpenAI Core Client: {e}")
@@ -69,6 +227,11 @@ class LLMService:
     def get_model_name(self) -> str:
         """Get the configured model name."""
         return self.model
+
+    def get_provider_name(self) -> str:
+        """Get the provider host (e.g. "api.openai.com") used to key per-provider limits."""
+        base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
+        return urlparse(base_url).hostname or base_url
         
     def get_config(self) -> Dict[str, str]:
         """Get current configuration (safely masked)."""
@@ -93,14 +256,156 @@ class LLMService:
         self._init_client()
         return self.client is not None
     
-    async def generate_stream(self, prompt: str, temperature: float = 0.7):
+    async def chat_completion(self, messages: List[Dict], site: str = "default", deadline: Optional[float] = None,
+                              json_mode: bool = False, **kwargs):
+        """
+        Create a chat completion through the adaptive concurrency limiter.
+
+        Rate limits, timeouts and 5xx responses shrink the limiter and are
+        retried with jittered exponential backoff (honoring Retry-After).
+        Raises LLMOverloadedError if the provider is still overloaded after
+        LLM_MAX_RETRIES attempts.
+
+        Args:
+            site: Call-site label for `llm_metrics`
+            deadline: Seconds for the whole call, limiter wait and retries
+                included; asyncio.TimeoutError once it is spent
+            json_mode: Ask for a JSON object answer (response_format). Dropped
+                for the rest of the process if the provider rejects it.
+
+        Sites listed in LLM_PROMPT_CACHE_SITES are answered from the prompt
+        cache when the same model, messages and parameters were seen before.
+        Identical requests already in flight are joined instead of re-sent
+        (`llm_flight`); a joining caller still gives up at its own deadline.
+        """
+        if not self.client:
+            raise ValueError("LLM client not initialized")
+
+        kwargs.setdefault("model", self.model)
+        if json_mode and getattr(self, "json_mode_supported", True):
+            kwargs["response_format"] = {"type": "json_object"}
+        key = prompt_key(kwargs["model"], messages, kwargs)
+        cache_ttl = prompt_cache.ttl_for(site)
+        if cache_ttl:
+            cached, tier = await prompt_cache.get(key)
+            llm_metrics.cache_lookup(site, tier)
+            if tier != MISS:
+                return ChatCompletion.model_validate(cached)
+
+        return await llm_flight.do(
+            key, lambda: self._complete(messages, site, deadline, kwargs, key, cache_ttl), join_timeout=deadline
+        )
+
+    async def _complete(self, messages: List[Dict], site: str, deadline: Optional[float], kwargs: Dict[str, Any],
+                        cache_key: str, cache_ttl: Optional[int]):
+        """One chat completion with retries, metrics and the prompt cache write."""
+        def send(budget: Optional[float]):
+            if budget is not None:
+                kwargs["timeout"] = budget
+            return self.client.chat.completions.create(messages=messages, **kwargs)
+
+        def drop_json_mode(error: Exception) -> bool:
+            if "response_format" not in kwargs or not self._rejects_json_mode(error):
+                return False
+            logger.warning(f"Provider rejected JSON mode, disabling it: {error}")
+            self.json_mode_supported = False
+            kwargs.pop("response_format")
+            return True
+
+        started = time.monotonic()
+        try:
+            response = await self.run_with_retries(send, site, deadline, retry_now=drop_json_mode)
+        except asyncio.TimeoutError:
+            llm_metrics.observe(site, "timeout", time.monotonic() - started)
+            raise
+        except LLMOverloadedError:
+            llm_metrics.observe(site, "overloaded", time.monotonic() - started)
+            raise
+        except Exception:
+            llm_metrics.observe(site, "error", time.monotonic() - started)
+            raise
+        usage = getattr(response, "usage", None)
+        llm_metrics.observe(
+            site, "ok", time.monotonic() - started,
+            prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+            completion_tokens=getattr(usage, "completion_tokens", 0) or 0
+        )
+        if cache_ttl and isinstance(response, ChatCompletion):
+            await prompt_cache.set(cache_key, response.model_dump(mode="json"), cache_ttl)
+        return response
+
+    async def run_with_retries(self, send: Callable[[Optional[float]], Awaitable[Any]], site: str,
+                               deadline: Optional[float] = None,
+                               retry_now: Optional[Callable[[Exception], bool]] = None):
+        """
+        Await `send(budget)` under the adaptive limiter, one limiter slot per attempt.
+
+        Rate limits, timeouts and 5xx responses shrink the limiter and are
+        retried with jittered exponential backoff (honoring Retry-After);
+        other errors are raised. Records attempt errors in `llm_metrics`;
+        the final outcome is left to the caller.
+
+        Args:
+            send: Starts one attempt; `budget` is the seconds left of `deadline` (None without one)
+            deadline: Seconds for the whole call, limiter wait and retries
+                included; asyncio.TimeoutError once it is spent
+            retry_now: Called with a failed attempt's error; True resends at
+                once without using up a retry
+
+        Raises:
+            LLMOverloadedError: Still overloaded after LLM_MAX_RETRIES retries
+        """
+        loop = asyncio.get_running_loop()
+        expires = loop.time() + deadline if deadline is not None else None
+        retry_after = None
+        attempt = 0
+        while attempt <= settings.LLM_MAX_RETRIES:
+            remaining = expires - loop.time() if expires is not None else None
+            if remaining is not None and remaining <= 0:
+                raise asyncio.TimeoutError(f"LLM deadline of {deadline}s exceeded")
+            await asyncio.wait_for(self.limiter.acquire(), remaining)
+            attempt_started = time.monotonic()
+            try:
+                budget = None if expires is None else max(0.001, expires - loop.time())
+                response = await asyncio.wait_for(send(budget), budget)
+            except Exception as e:
+                if expires is not None and loop.time() >= expires:
+                    # Our own deadline, not a provider overload signal
+                    await self.limiter.release()
+                    raise asyncio.TimeoutError(f"LLM deadline of {deadline}s exceeded") from e
+                overloaded, retry_after = self._classify_error(e)
+                await self.limiter.release(overloaded=overloaded, retry_after=retry_after)
+                llm_metrics.attempt_error(site, self._error_kind(e))
+                if retry_now is not None and retry_now(e):
+                    continue
+                if not overloaded:
+                    raise
+                logger.warning(f"LLM overloaded (attempt {attempt + 1}, site {site}): {e}")
+                if attempt < settings.LLM_MAX_RETRIES:
+                    await asyncio.sleep(self._backoff(attempt, retry_after, expires, loop))
+                attempt += 1
+                continue
+            except BaseException:
+                await self.limiter.release()
+                raise
+            await self.limiter.release(latency=time.monotonic() - attempt_started)
+            return response
+
+        raise LLMOverloadedError("LLM provider is overloaded, retry later", retry_after=retry_after)
+
+    async def generate_stream(self, prompt: str, temperature: float = 0.7, site: str = "stream"):
         """
         Generate streaming response from LLM.
         Yields chunks of text as they are generated.
+        The limiter slot is held until the stream is exhausted.
         """
         if not self.client:
             raise ValueError("LLM client not initialized")
         
+        await self.limiter.acquire()
+        started = time.monotonic()
+        overloaded, retry_after = False, None
+        outcome = "error"
         try:
             stream = await self.client.chat.completions.create(
                 model=self.model,
@@ -112,10 +417,61 @@ class LLMService:
             async for chunk in stream:
                 if chunk.choices and len(chunk.choices) > 0 and chunk.choices[0].delta.content:
                     yield chunk.choices[0].delta.content
+            outcome = "ok"
                     
         except Exception as e:
+            overloaded, retry_after = self._classify_error(e)
+            llm_metrics.attempt_error(site, self._error_kind(e))
             logger.error(f"Streaming generation failed: {e}")
             raise
+        finally:
+            llm_metrics.observe(site, outcome if not overloaded else "overloaded", time.monotonic() - started)
+            # Streams are long by nature; their duration alone is not an overload signal
+            await self.limiter.release(
+                latency=None if overloaded else min(time.monotonic() - started, self.limiter.latency_target),
+                overloaded=overloaded,
+                retry_after=retry_after
+            )
+
+    @staticmethod
+    def _backoff(attempt: int, retry_after: Optional[float], expires: Optional[float], loop) -> float:
+        """Retry-After if sent, else full-jitter exponential backoff; never past the deadline."""
+        delay = retry_after if retry_after else random.uniform(0, settings.LLM_RETRY_BASE_DELAY * (2 ** attempt))
+        if expires is not None:
+            delay = min(delay, max(0.0, expires - loop.time()))
+        return delay
+
+    @staticmethod
+    def _error_kind(error: Exception) -> str:
+        if isinstance(error, openai.RateLimitError):
+            return "rate_limit"
+        if isinstance(error, (openai.APITimeoutError, asyncio.TimeoutError)):
+            return "timeout"
+        if isinstance(error, openai.InternalServerError):
+            return "server"
+        if isinstance(error, openai.APIConnectionError):
+            return "connection"
+        return "other"
+
+    @staticmethod
+    def _rejects_json_mode(error: Exception) -> bool:
+        return isinstance(error, openai.BadRequestError) and "response_format" in str(error)
+
+    @staticmethod
+    def _classify_error(error: Exception) -> Tuple[bool, Optional[float]]:
+        """Return (is_overload_signal, retry_after_seconds) for a client error."""
+        if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.InternalServerError)):
+            retry_after = None
+            response = getattr(error, "response", None)
+            if response is not None:
+                try:
+                    retry_after = float(response.headers.get("retry-after"))
+                except (TypeError, ValueError):
+                    retry_after = None
+            return True, retry_after
+        if isinstance(error, asyncio.TimeoutError):
+            return True, None
+        return False, None
 
 # Global instance
 llm_service = LLMService()
@@ -0,0 +1,134 @@
+"""
+Prompt -> completion cache for repeatable LLM calls.
+
+Two tiers: an in-process LRU bounded by bytes, backed by Redis through the
+shared `CacheService`. Keys hash the model, the prompt and the sampling
+parameters, so any change to the prompt template misses. Only call sites
+listed in LLM_PROMPT_CACHE_SITES (site -> TTL seconds) are cached.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import logging
+import threading
+import time
+
+from app.core.config import settings
+from app.services.cache_service import cache_service
+
+logger = logging.getLogger(__name__)
+
+REDIS_PREFIX = "llm:prompt:"
+
+# Per-attempt transport options that do not change the answer
+_TRANSPORT_PARAMS = {"timeout", "extra_headers", "extra_query", "extra_body"}
+
+MISS = "miss"
+HIT_MEMORY = "memory"
+HIT_REDIS = "redis"
+
+
+def prompt_key(model: str, prompt: Any, params: Optional[Dict[str, Any]] = None) -> str:
+    """Stable hash of (model, prompt, answer-affecting params)."""
+    params = {k: v for k, v in (params or {}).items() if k not in _TRANSPORT_PARAMS}
+    payload = json.dumps([model or "", prompt, params], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PromptCache:
+    """
+    Byte-bounded LRU in front of Redis.
+
+    - Values must be JSON-serializable (completion dumps, plain strings).
+    - Each entry keeps its own expiry; expired entries are dropped on read.
+    - A Redis hit is promoted into the LRU for the rest of its TTL window.
+    - Redis errors never fail a call; once CacheService gives up on Redis
+      the cache runs memory-only.
+    """
+
+    def __init__(self, max_bytes: int, use_redis: bool = True):
+        self.max_bytes = max_bytes
+        self.use_redis = use_redis
+        # key -> (value, size in bytes, expires at)
+        self._entries: "OrderedDict[str, Tuple[Any, int, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.evictions = 0
+
+    @staticmethod
+    def ttl_for(site: str) -> Optional[int]:
+        """TTL of a call site, or None if the site is not cached."""
+        ttl = settings.LLM_PROMPT_CACHE_SITES.get(site)
+        return ttl if ttl and ttl > 0 else None
+
+    async def get(self, key: str) -> Tuple[Optional[Any], str]:
+        """(value, tier) where tier is HIT_MEMORY, HIT_REDIS or MISS."""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, size, expires = entry
+                if expires > now:
+                    self._entries.move_to_end(key)
+                    return value, HIT_MEMORY
+                self._drop(key)
+
+        redis = self._redis()
+        if redis is not None:
+            cached = await redis.get(REDIS_PREFIX + key)
+            if isinstance(cached, dict) and "value" in cached:
+                self._put(key, cached["value"], cached.get("expires", now))
+                return cached["value"], HIT_REDIS
+        return None, MISS
+
+    async def set(self, key: str, value: Any, ttl: int):
+        expires = time.time() + ttl
+        self._put(key, value, expires)
+        redis = self._redis()
+        if redis is not None:
+            await redis.set(REDIS_PREFIX + key, {"value": value, "expires": expires}, expire=ttl)
+
+    def clear(self):
+        """Drop the in-process tier (Redis entries expire on their own)."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "redis": self._redis() is not None
+        }
+
+    # ==================== Internals ====================
+
+    def _put(self, key: str, value: Any, expires: float):
+        if expires <= time.time():
+            return
+        size = len(key) + len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, size, expires)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _drop(self, key: str):
+        _, size, _ = self._entries.pop(key)
+        self.bytes -= size
+
+    def _redis(self):
+        return cache_service if self.use_redis and cache_service.available else None
+
+
+# Singleton instance
+prompt_cache = PromptCache(settings.LLM_PROMPT_CACHE_MAX_BYTES, use_redis=settings.LLM_PROMPT_CACHE_REDIS)
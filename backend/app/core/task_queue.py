@@ -4,6 +4,8 @@ from dataclasses import dataclass
 from enum import Enum
 import uuid
 
+from app.core.config import settings
+
 class TaskStatus(Enum):
     PENDING = "pending"
     RUNNING = "running"
@@ -37,10 +39,11 @@ class AsyncTaskQueue:
             for i in range(self.max_workers)
         ]
     
-    async def stop(self):
-        """Stop worker pool."""
+    async def stop(self, wait: bool = True):
+        """Stop worker pool (after the queued tasks finish, unless `wait` is False)."""
         self.running = False
-        await self.queue.join()
+        if wait:
+            await self.queue.join()
         for worker in self.workers:
             worker.cancel()
     
@@ -105,3 +108,7 @@ class AsyncTaskQueue:
 
 # Global task queue instance
 task_queue = AsyncTaskQueue()
+
+# Resumed standardization tasks run as long as an upload; kept off `task_queue`
+# so they cannot starve its short jobs (e.g. std_term_sync)
+resume_queue = AsyncTaskQueue(max_workers=settings.STANDARDIZATION_RESUME_WORKERS)
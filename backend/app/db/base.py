@@ -1,4 +1,4 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 import os
@@ -29,6 +29,29 @@ def get_db():
     finally:
         db.close()
 
-def init_db():
+# Columns added to existing tables after their first release.
+# create_all never alters an existing table, so init_db adds these itself.
+ADDED_COLUMNS = {
+    "standardization_tasks": ["stats", "options", "file_path", "kag_sync"],
+}
+
+def init_db(bind=None):
     """Initialize database tables"""
-    Base.metadata.create_all(bind=engine)
+    import app.db.models  # noqa: F401  (registers the tables on Base.metadata)
+    bind = bind or engine
+    Base.metadata.create_all(bind=bind)
+    add_missing_columns(bind)
+
+def add_missing_columns(bind):
+    """ALTER TABLE ... ADD COLUMN for each ADDED_COLUMNS entry the table lacks (idempotent)."""
+    inspector = inspect(bind)
+    with bind.begin() as conn:
+        for table_name, column_names in ADDED_COLUMNS.items():
+            if not inspector.has_table(table_name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table_name)}
+            for name in column_names:
+                if name in existing:
+                    continue
+                column_type = Base.metadata.tables[table_name].c[name].type.compile(dialect=bind.dialect)
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {name} {column_type}"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, Integer, Text, DateTime, Float, Boolean, ForeignKey
+from sqlalchemy import Column, String, Integer, Text, DateTime, Float, Boolean, ForeignKey, Index
 from sqlalchemy.sql import func
 from app.db.base import Base
 
@@ -178,13 +178,49 @@ class StandardizationTask(Base):
     id = Column(String, primary_key=True)
     tenant_id = Column(String, nullable=False, index=True, default="system")
     filename = Column(String, nullable=False)
+    file_path = Column(String)  # spooled upload, relative to the working directory
     status = Column(String)  # processing, completed, failed
     user = Column(String)
     total_records = Column(Integer, default=0)
     processed_records = Column(Integer, default=0)
     success_count = Column(Integer, default=0)
     failed_count = Column(Integer, default=0)
-    results = Column(Text)  # JSON array
+    results = Column(Text)  # JSON array (legacy; rows now live in standardization_results)
+    stats = Column(Text)  # JSON object: pipeline statistics (dictionary hit rate, ...)
+    options = Column(Text)  # JSON object: per-task pipeline options (batch_size, ...)
+    kag_sync = Column(Text)  # JSON object: StdTerm graph sync progress
     error_message = Column(Text)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True))
+
+class StandardizationResult(Base):
+    """标准化结果行模型 (one row per input record)"""
+    __tablename__ = "standardization_results"
+    __table_args__ = (
+        Index("ix_standardization_results_task_row", "task_id", "row_index", unique=True),
+        Index("ix_standardization_results_task_status", "task_id", "status"),
+    )
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    task_id = Column(String, ForeignKey("standardization_tasks.id"), nullable=False)
+    row_index = Column(Integer, nullable=False)  # 0-based position in the uploaded file
+    original_name = Column(String)
+    modality = Column(String)
+    triples = Column(Text)  # JSON array
+    status = Column(String)  # success, review_required, failed
+    source = Column(String)  # cache, dictionary, llm, manual
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+class StandardizationCacheEntry(Base):
+    """标准化结果缓存模型"""
+    __tablename__ = "standardization_cache"
+    
+    id = Column(String, primary_key=True)  # hash of normalized_name + modality + ontology_version
+    normalized_name = Column(String, nullable=False, index=True)
+    modality = Column(String)
+    ontology_version = Column(String, index=True)
+    triples = Column(Text)  # JSON array
+    status = Column(String)  # success, review_required
+    source = Column(String)  # llm, manual
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -10,7 +10,7 @@ from app.core.exceptions import (
     general_exception_handler
 )
 from app.core.logging import LoggingMiddleware, setup_logging
-from app.core.task_queue import task_queue
+from app.core.task_queue import resume_queue, task_queue
 import asyncio
 
 # Load environment variables from .env file
@@ -51,16 +51,22 @@ async def startup_event():
     """Start background tasks and initialize DB on startup."""
     from app.db.base import init_db
     from app.core.kg import neo4j_service
+    from app.services.examination_standardization_service import examination_service
     
     init_db()
     asyncio.create_task(task_queue.start())
+    asyncio.create_task(resume_queue.start())
     await neo4j_service.initialize()
+    # Tasks left "processing" by the previous process are resumed or failed
+    examination_service.recover_interrupted_tasks()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Clean up on shutdown."""
     from app.core.kg import neo4j_service
     await task_queue.stop()
+    # Unfinished resumes stay "processing" and are picked up by the next startup sweep
+    await resume_queue.stop(wait=False)
     await neo4j_service.close()
 
 @app.get("/")
@@ -16,6 +16,11 @@ class CacheService:
         self._redis: Optional[redis.Redis] = None
         self._failed_once = False
 
+    @property
+    def available(self) -> bool:
+        """False once connecting to Redis has failed; callers can skip the cache."""
+        return not self._failed_once
+
     async def _get_redis(self) -> redis.Redis:
         if self._failed_once:
             raise Exception("Redis connection previously failed. Skipping.")
@@ -1,8 +1,6 @@
 from typing import List, Dict, Any
 import logging
-from kag.interface.common.llm_client import LLMClient
-from kag.common.conf import KAG_CONFIG
-from app.core.config import settings
+from app.core.kag_llm import get_kag_llm
 
 logger = logging.getLogger(__name__)
 
@@ -14,18 +12,8 @@ class ClinicalNLPService:
     def __init__(self):
         """Initialize with real KAG LLM client."""
         try:
-            # Initialize KAG config if not already done
-            if not KAG_CONFIG._is_initialized:
-                import os
-                config_path = os.path.join(settings.PROJECT_ROOT, "config/kag_config.yaml")
-                KAG_CONFIG.initialize(prod=False, config_file=config_path)
-            
-            # Get LLM config from KAG
-            llm_config = KAG_CONFIG.all_config.get("chat_llm")
-            if not llm_config:
-                raise ValueError("chat_llm not found in config/kag_config.yaml")
-            
-            self.llm = LLMClient.from_config(llm_config)
+            # Shared async adapter: LLM calls no longer block the event loop
+            self.llm = get_kag_llm()
             logger.info("ClinicalNLPService initialized with real LLM")
         except Exception as e:
             logger.error(f"Failed to initialize ClinicalNLPService: {e}")
@@ -41,7 +29,7 @@ class ClinicalNLPService:
 请以JSON格式返回,格式如下:
 [{{"entity": "实体名称", "type": "实体类型", "offset": [起始位置, 结束位置]}}]
 """
-            response = self.llm(prompt)
+            response = await self.llm(prompt, site="clinical_nlp.entities")
             # Parse LLM response
             import json
             entities = json.loads(response)
@@ -60,7 +48,7 @@ class ClinicalNLPService:
 请以JSON格式返回,格式如下:
 [{{"subject": "主体", "predicate": "关系", "object": "客体"}}]
 """
-            response = self.llm(prompt)
+            response = await self.llm(prompt, site="clinical_nlp.relations")
             import json
             relations = json.loads(response)
             return relations
@@ -78,7 +66,7 @@ class ClinicalNLPService:
 
 请只返回类别名称。
 """
-            response = self.llm(prompt)
+            response = await self.llm(prompt, site="clinical_nlp.classify")
             return response.strip()
         except Exception as e:
             logger.error(f"Text classification failed: {e}")
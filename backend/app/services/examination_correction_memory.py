@@ -0,0 +1,201 @@
+"""
+Examination Correction Memory
+Nearest-neighbor lookup over reviewer-corrected results, so close variants of
+a corrected exam name ("左腕关节正侧位片" / "右腕关节正侧位") reuse the
+correction instead of going to the LLM.
+"""
+
+from typing import Any, Dict, List, Set, Tuple
+import heapq
+import json
+import logging
+import math
+import re
+import threading
+
+from app.db.base import SessionLocal
+from app.db.models import StandardizationCacheEntry
+from app.services.examination_result_cache import normalize_exam_name, normalize_modality_key
+
+logger = logging.getLogger(__name__)
+
+# Laterality and film wording that does not change the standardized triples;
+# two-character forms first so "正侧位" keeps its "侧"
+_MODIFIERS = re.compile(r"左侧|右侧|双侧|单侧|摄片|[左右双单片]")
+_PUNCTUATION = re.compile(r"[()（）\[\]【】,，、;；:：.。\-_/|]+")
+
+NGRAM = 2
+MAX_CANDIDATES = 20
+
+
+def canonical_name(name: Any) -> str:
+    """Normalized exam name without laterality / film wording and punctuation."""
+    text = _MODIFIERS.sub("", normalize_exam_name(name))
+    return _PUNCTUATION.sub("", text)
+
+
+def ngrams(text: str, n: int = NGRAM) -> Set[str]:
+    if len(text) <= n:
+        return {text} if text else set()
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+def edit_similarity(a: str, b: str, threshold: float = 0.0) -> float:
+    """
+    1 - Levenshtein distance / longer length; 0.0 as soon as the result is
+    known to fall below `threshold` (only the diagonal band of the DP table
+    that can stay within the edit budget is computed).
+    """
+    if a == b:
+        return 1.0
+    longest = max(len(a), len(b))
+    budget = math.floor((1 - threshold) * longest + 1e-9)
+    if not a or not b or abs(len(a) - len(b)) > budget:
+        return 0.0
+
+    over = budget + 1
+    previous = [j if j <= budget else over for j in range(len(b) + 1)]
+    for i, char_a in enumerate(a, start=1):
+        low, high = max(1, i - budget), min(len(b), i + budget)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= budget else over
+        for j in range(low, high + 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != b[j - 1]), over)
+        if min(current[max(0, low - 1):high + 1]) > budget:
+            return 0.0
+        previous = current
+    distance = previous[-1]
+    return 1 - distance / longest if distance <= budget else 0.0
+
+
+class CorrectionMemory:
+    """
+    In-process index of corrected (name, modality) -> triples pairs.
+
+    - Loaded lazily from the manual entries of `standardization_cache` and
+      extended as reviewers correct results.
+    - Candidates share character bigrams with the query (inverted index,
+      bucketed by name length so only lengths within reach are visited).
+      A q-gram count filter drops those that cannot reach the threshold; the
+      MAX_CANDIDATES with most shared bigrams are scored by edit similarity
+      of their canonical names.
+    """
+
+    def __init__(self):
+        # (canonical name, modality key) -> entry; the latest correction wins
+        self._entries: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # (bigram, modality key, name length) -> entry keys
+        self._index: Dict[Tuple[str, str, int], Set[Tuple[str, str]]] = {}
+        self._gram_counts: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._loaded = False
+        self.lookups = 0
+        self.hits = 0
+
+    def add(self, name: str, modality: str, triples: List[List[str]], status: str = "success"):
+        """Remember a correction."""
+        self._ensure_loaded()
+        with self._lock:
+            self._add(name, modality, triples, status)
+
+    def nearest(self, name: str, modality: str, threshold: float, record: bool = True) -> List[Dict[str, Any]]:
+        """
+        Corrections of the same modality whose canonical name is at least
+        `threshold` similar to `name`, best first. Each is a dict with
+        name, triples, status and similarity. `record=False` leaves the
+        lookup counter alone (estimates).
+        """
+        self._ensure_loaded()
+        canonical = canonical_name(name)
+        modality_key = normalize_modality_key(modality)
+        query = ngrams(canonical)
+        if record:
+            self.lookups += 1
+        if not query:
+            return []
+
+        # Lengths within reach: the length gap is a lower bound on the edit distance
+        longest = math.floor(len(canonical) / max(threshold, 1e-9) + 1e-9)
+        lengths = range(math.ceil(len(canonical) * threshold - 1e-9), longest + 1)
+        with self._lock:
+            overlap: Dict[Tuple[str, str], int] = {}
+            for gram in query:
+                for length in lengths:
+                    for key in self._index.get((gram, modality_key, length), ()):
+                        overlap[key] = overlap.get(key, 0) + 1
+            viable = [key for key, shared in overlap.items()
+                      if self._can_reach(canonical, query, key, shared, threshold)]
+            matches = []
+            for key in heapq.nlargest(MAX_CANDIDATES, viable, key=overlap.__getitem__):
+                similarity = edit_similarity(canonical, key[0], threshold)
+                if similarity and similarity >= threshold:
+                    matches.append({**self._entries[key], "similarity": round(similarity, 4)})
+
+        matches.sort(key=lambda match: match["similarity"], reverse=True)
+        return matches
+
+    def record_hit(self):
+        self.hits += 1
+
+    def reload(self):
+        """Drop the index; it is rebuilt from the database on next use."""
+        with self._lock:
+            self._entries.clear()
+            self._index.clear()
+            self._gram_counts.clear()
+            self._loaded = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": round(self.hits / self.lookups, 4) if self.lookups else 0.0
+        }
+
+    # ==================== Internals ====================
+
+    def _can_reach(self, canonical: str, query: Set[str], key: Tuple[str, str], shared: int,
+                   threshold: float) -> bool:
+        """
+        q-gram count filter: each edit removes at most NGRAM distinct bigrams,
+        so a `threshold`-similar candidate shares all but NGRAM * edits of them.
+        """
+        max_edits = math.floor((1 - threshold) * max(len(canonical), len(key[0])) + 1e-9)
+        return shared >= max(len(query), self._gram_counts[key]) - NGRAM * max_edits
+
+    def _add(self, name: str, modality: str, triples: List[List[str]], status: str):
+        canonical = canonical_name(name)
+        if not canonical or not triples:
+            return
+        key = (canonical, normalize_modality_key(modality))
+        grams = ngrams(canonical)
+        self._entries[key] = {"name": name, "triples": [list(triple) for triple in triples], "status": status}
+        self._gram_counts[key] = len(grams)
+        for gram in grams:
+            self._index.setdefault((gram, key[1], len(canonical)), set()).add(key)
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            db = SessionLocal()
+            try:
+                rows = db.query(StandardizationCacheEntry).filter(
+                    StandardizationCacheEntry.source == "manual"
+                ).order_by(StandardizationCacheEntry.created_at).all()
+                for row in rows:
+                    self._add(row.normalized_name, row.modality or "", json.loads(row.triples or "[]"),
+                              row.status or "success")
+                logger.info(f"Correction memory loaded {len(self._entries)} corrections")
+            except Exception as e:
+                logger.warning(f"Failed to load correction memory: {e}")
+            finally:
+                db.close()
+            self._loaded = True
+
+
+# Singleton instance
+correction_memory = CorrectionMemory()
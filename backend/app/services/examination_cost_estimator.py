@@ -0,0 +1,104 @@
+"""
+Examination Cost Estimator
+Token counting and projections for standardization dry runs: how many LLM
+calls, prompt / completion tokens and minutes a file will take, without
+calling the LLM.
+"""
+
+from typing import Any, Dict, Optional
+import asyncio
+import logging
+import math
+import re
+
+logger = logging.getLogger(__name__)
+
+try:
+    import tiktoken
+    HAS_TIKTOKEN = True
+except ImportError:
+    HAS_TIKTOKEN = False
+
+DEFAULT_ENCODING = "cl100k_base"
+
+# Fallback when tiktoken (or its encoding file) is unavailable: BPE vocabularies
+# spend about one token per CJK character and one per ~4 other characters
+_CJK = re.compile(r"[\u3000-\u303f\u3400-\u9fff\uf900-\ufaff\uff00-\uffef]")
+
+
+class TokenCounter:
+    """Local tokenizer for the configured model, with a character-based fallback."""
+
+    def __init__(self, model: Optional[str] = None):
+        self._encoding = None
+        self.name = "heuristic"
+        if not HAS_TIKTOKEN:
+            return
+        try:
+            try:
+                self._encoding = tiktoken.encoding_for_model(model or "")
+            except KeyError:
+                # Non-OpenAI models (Qwen, DeepSeek, ...) are sized with the GPT-4 vocabulary
+                self._encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+            self.name = f"tiktoken:{self._encoding.name}"
+        except Exception as e:
+            # The encoding file is downloaded on first use; offline hosts fall back
+            logger.warning(f"tiktoken encoding unavailable, using heuristic token counts: {e}")
+            self._encoding = None
+
+    def count(self, text: str) -> int:
+        if not text:
+            return 0
+        if self._encoding is not None:
+            return len(self._encoding.encode(text, disallowed_special=()))
+        cjk = len(_CJK.findall(text))
+        return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+# model -> TokenCounter; building one may load (or download) a BPE file
+_counters: Dict[str, TokenCounter] = {}
+
+
+async def get_token_counter(model: Optional[str] = None) -> TokenCounter:
+    """Shared TokenCounter of a model, built in a worker thread on first use."""
+    counter = _counters.get(model or "")
+    if counter is None:
+        counter = await asyncio.to_thread(TokenCounter, model)
+        counter = _counters.setdefault(model or "", counter)
+    return counter
+
+
+class CostEstimate:
+    """Running totals of a dry run."""
+
+    def __init__(self):
+        self.llm_calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        # Sequential LLM round trips each scheduler slot spends (2 per two-stage unit)
+        self.rounds = 0
+
+    def add_call(self, prompt_tokens: int, completion_tokens: int):
+        self.llm_calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.completion_tokens += completion_tokens
+
+    def projection(self, call_latency: float, concurrency: int, llm_limit: int) -> Dict[str, Any]:
+        """
+        Projected totals and wall time.
+
+        Wall time is bounded both by the task's scheduler slots (each runs its
+        unit's rounds back to back) and by the shared LLM limiter.
+        """
+        wall = call_latency * max(self.rounds / max(1, concurrency), self.llm_calls / max(1, llm_limit))
+        return {
+            "llm_calls": self.llm_calls,
+            "prompt_tokens": self.prompt_tokens,
+            "completion_tokens": self.completion_tokens,
+            "total_tokens": self.prompt_tokens + self.completion_tokens,
+            "call_latency_s": round(call_latency, 3),
+            "concurrency": concurrency,
+            "llm_concurrency_limit": llm_limit,
+            "estimated_wall_s": round(wall, 1),
+            "estimated_minutes": round(wall / 60, 1)
+        }
@@ -0,0 +1,202 @@
+"""
+Examination Dictionary Matcher
+Deterministic pre-LLM stage: resolves exam names built from literal ontology
+names and method aliases without calling the LLM.
+"""
+
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import re
+
+from app.services.examination_ontology_snapshot import OntologySnapshot
+
+logger = logging.getLogger(__name__)
+
+# Modality spellings seen in uploads -> ontology modality names
+MODALITY_HINTS = {
+    "DR": "DR",
+    "CR": "DR",
+    "X线": "DR",
+    "CT": "CT",
+    "MRI": "MRI",
+    "MR": "MRI",
+    "磁共振": "MRI",
+    "核磁共振": "MRI",
+    "核磁": "MRI",
+}
+
+# Text that carries no standardization meaning once parts/methods are matched
+IGNORABLE_TOKENS = [
+    "双侧", "左侧", "右侧", "单侧", "摄片", "摄影", "检查", "成像",
+    "双", "单", "左", "右", "侧", "片",
+]
+_IGNORABLE_PUNCT = re.compile(r"[\s()（）\[\]【】,，、;；:：.。+\-_/|]+")
+
+
+class AhoCorasick:
+    """
+    Aho-Corasick automaton over a fixed pattern set.
+
+    `find_longest` returns leftmost-longest, non-overlapping matches so that
+    "正侧位" wins over its suffix "侧位".
+    """
+
+    def __init__(self, patterns: Dict[str, Any]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[str]] = [[]]
+        self.payloads = dict(patterns)
+
+        for pattern in patterns:
+            if pattern:
+                self._add(pattern)
+        self._build_failure_links()
+
+    def _add(self, pattern: str):
+        state = 0
+        for char in pattern:
+            nxt = self._goto[state].get(char)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][char] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = nxt
+        self._output[state].append(pattern)
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[nxt] = self._goto[fallback].get(char, 0)
+                self._output[nxt] = self._output[nxt] + self._output[self._fail[nxt]]
+
+    def find_all(self, text: str) -> List[Tuple[int, int, str]]:
+        """All (start, end, pattern) occurrences, possibly overlapping."""
+        matches = []
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for pattern in self._output[state]:
+                matches.append((index - len(pattern) + 1, index + 1, pattern))
+        return matches
+
+    def find_longest(self, text: str) -> List[Tuple[int, int, str]]:
+        """Leftmost-longest non-overlapping matches in text order."""
+        ordered = sorted(self.find_all(text), key=lambda m: (m[0], -(m[1] - m[0])))
+        selected = []
+        cursor = 0
+        for start, end, pattern in ordered:
+            if start >= cursor:
+                selected.append((start, end, pattern))
+                cursor = end
+        return selected
+
+
+def normalize_modality(modality: Optional[str]) -> str:
+    """Map an upload modality spelling (e.g. "MR") to the ontology name."""
+    if not modality:
+        return ""
+    text = str(modality).strip().upper()
+    return MODALITY_HINTS.get(text, text)
+
+
+class DictionaryMatcher:
+    """
+    Matches exam names against level 2 part names, method names and method
+    aliases of one ontology snapshot.
+
+    A match is emitted only when it is unambiguous: exactly one level 2 part,
+    at least one method, a single level 1 parent for which every path exists,
+    methods compatible with the modality, and no unexplained leftover text.
+    """
+
+    def __init__(self, snapshot: OntologySnapshot, aliases: Optional[Dict[str, Any]] = None):
+        self.snapshot = snapshot
+        self.version = snapshot.version
+
+        patterns: Dict[str, Tuple[str, Any]] = {}
+        for hint, modality in MODALITY_HINTS.items():
+            patterns[hint] = ("modality", modality)
+        for method in snapshot.all_methods:
+            patterns[method] = ("method", [method])
+        for alias, expanded in (aliases or {}).items():
+            methods = expanded if isinstance(expanded, list) else [expanded]
+            patterns[alias.upper()] = ("method", list(methods))
+        for part in snapshot.all_level2_parts:
+            patterns[part] = ("part", part)
+        for token in IGNORABLE_TOKENS:
+            patterns.setdefault(token, ("ignore", None))
+
+        self.automaton = AhoCorasick(patterns)
+
+    def match(self, exam_name: str, modality: Optional[str] = None) -> Optional[List[List[str]]]:
+        """
+        Resolve an exam name to triples.
+
+        Returns:
+            List of [level1, level2, method] triples, or None when the name
+            must go through the LLM flow.
+        """
+        text = str(exam_name or "").strip().upper()
+        if not text or self.snapshot.is_empty:
+            return None
+
+        parts: List[str] = []
+        methods: List[str] = []
+        hinted_modalities = set()
+        residual = []
+        cursor = 0
+
+        for start, end, pattern in self.automaton.find_longest(text):
+            residual.append(text[cursor:start])
+            cursor = end
+            kind, payload = self.automaton.payloads[pattern]
+            if kind == "part" and payload not in parts:
+                parts.append(payload)
+            elif kind == "method":
+                methods.extend(m for m in payload if m not in methods)
+            elif kind == "modality":
+                hinted_modalities.add(payload)
+        residual.append(text[cursor:])
+
+        if len(parts) != 1 or not methods:
+            return None
+        if _IGNORABLE_PUNCT.sub("", "".join(residual)):
+            return None
+
+        column_modality = normalize_modality(modality)
+        if column_modality:
+            hinted_modalities.add(column_modality)
+        if len(hinted_modalities) > 1:
+            return None
+        if not self._methods_fit_modality(methods, hinted_modalities):
+            return None
+
+        part = parts[0]
+        parents = [
+            level1 for level1 in self.snapshot.level1_by_level2.get(part, ())
+            if all(self.snapshot.has_path(level1, part, method) for method in methods)
+        ]
+        if len(parents) != 1:
+            return None
+
+        return [[parents[0], part, method] for method in methods]
+
+    def _methods_fit_modality(self, methods: List[str], modalities: set) -> bool:
+        if not modalities or not self.snapshot.method_modalities:
+            return True
+        modality = next(iter(modalities))
+        if modality not in self.snapshot.methods_by_modality:
+            # Modality unknown to the ontology: no evidence either way
+            return True
+        return all(modality in self.snapshot.method_modalities.get(m, ()) for m in methods)
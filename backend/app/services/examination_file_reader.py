@@ -0,0 +1,119 @@
+"""
+Examination File Reader
+Streams records out of uploaded CSV / Excel files chunk by chunk, so a
+large upload is never held in memory as a whole DataFrame.
+"""
+
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+import asyncio
+import csv
+import io
+import logging
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Raw file content or a path to the spooled upload on disk
+FileSource = Union[bytes, str]
+
+DEFAULT_CHUNK_SIZE = 5000
+
+
+def _open_binary(source: FileSource):
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else open(source, "rb")
+
+
+def iter_record_chunks(source: FileSource, filename: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Yield lists of up to `chunk_size` row dicts keyed by header.
+
+    - .csv: pandas `read_csv(chunksize=...)`
+    - .xlsx: openpyxl read-only row iteration
+    - .xls: no streaming reader exists; read with pandas and re-chunked
+    """
+    name = filename.lower()
+    if name.endswith(".csv"):
+        with _open_binary(source) as f:
+            for chunk in pd.read_csv(f, chunksize=chunk_size):
+                yield chunk.to_dict("records")
+    elif name.endswith(".xlsx"):
+        yield from _iter_xlsx_chunks(source, chunk_size)
+    else:
+        logger.warning(f"{filename}: legacy Excel format is read in one piece")
+        with _open_binary(source) as f:
+            df = pd.read_excel(f)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size].to_dict("records")
+
+
+def _iter_xlsx_chunks(source: FileSource, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    from openpyxl import load_workbook
+
+    with _open_binary(source) as f:
+        workbook = load_workbook(f, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(cell).strip() if cell is not None else "" for cell in next(rows, ())]
+            chunk: List[Dict[str, Any]] = []
+            for values in rows:
+                if values is None or all(value is None for value in values):
+                    continue
+                chunk.append(dict(zip(header, values)))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+        finally:
+            workbook.close()
+
+
+def count_records(source: FileSource, filename: str) -> Optional[int]:
+    """
+    Cheap data-row count for progress reporting, without parsing values.
+    Returns None when the format offers no cheap count.
+    """
+    name = filename.lower()
+    try:
+        if name.endswith(".csv"):
+            with _open_binary(source) as f:
+                text = io.TextIOWrapper(f, encoding="utf-8", newline="")
+                rows = sum(1 for row in csv.reader(text) if any(cell.strip() for cell in row))
+            return max(rows - 1, 0)
+        if name.endswith(".xlsx"):
+            from openpyxl import load_workbook
+
+            with _open_binary(source) as f:
+                workbook = load_workbook(f, read_only=True)
+                try:
+                    max_row = workbook.active.max_row
+                finally:
+                    workbook.close()
+            return max(max_row - 1, 0) if max_row else None
+    except Exception as e:
+        logger.warning(f"Could not count records in {filename}: {e}")
+    return None
+
+
+async def aiter_records(source: FileSource, filename: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> AsyncIterator[Tuple[int, Dict[str, Any]]]:
+    """
+    Async generator of (row_index, record); chunks are parsed in a worker
+    thread so the event loop keeps serving LLM calls while reading.
+    """
+    chunks = iter_record_chunks(source, filename, chunk_size)
+    row_index = 0
+    try:
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                return
+            for record in chunk:
+                yield row_index, record
+                row_index += 1
+    finally:
+        try:
+            chunks.close()
+        except ValueError:
+            # Cancelled while a worker thread is still inside the parser
+            pass
@@ -5,8 +5,9 @@ Manages tree-structured examination ontology in Neo4j.
 
 from typing import List, Dict, Any, Optional
 import logging
+from app.core.concurrency import single_flight
 from app.core.kg import neo4j_service
-import logging
+from app.services.examination_ontology_snapshot import OntologySnapshot, OntologySnapshotStore
 # from neo4j import AsyncGraphDatabase, AsyncDriver # Removed direct dependency
 import os
 from dotenv import load_dotenv
@@ -17,6 +18,11 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 
+def _read_key(self, *args, **kwargs):
+    # The generation keeps reads started after a write from joining older ones
+    return (self, self.generation, args, tuple(sorted(kwargs.items())))
+
+
 class ExaminationKGService:
     """
     Service for managing examination ontology in Neo4j knowledge graph.
@@ -35,6 +41,9 @@ class ExaminationKGService:
     
     def __init__(self):
         self.neo4j = neo4j_service
+        self.snapshots = OntologySnapshotStore(self)
+        # Bumped after writes; part of every read's single-flight key
+        self.generation = 0
     
     async def initialize(self):
         """Initialize Neo4j connection."""
@@ -59,9 +68,13 @@ class ExaminationKGService:
         await self.neo4j.close()
     
     # ==================== Query Methods ====================
+    # Read queries are single-flight: concurrent identical calls share one
+    # Neo4j round trip (and one result object; do not mutate it). Calls made
+    # after `invalidate_reads()` never join a read started before it.
     
     async def get_all_level1_parts(self) -> List[str]:
         """Get all level 1 body parts."""
+    @single_flight("kg.get_all_level1_parts", key=_read_key)
     async def get_all_level1_parts(self) -> List[str]:
         """Get all level 1 body parts."""
         query = "MATCH (n:BodyPartLevel1) RETURN n.name as name ORDER BY name"
@@ -78,6 +91,7 @@ class ExaminationKGService:
         Returns:
             List of level 2 part names
         """
+    @single_flight("kg.get_level2_parts", key=_read_key)
     async def get_level2_parts(self, level1: Optional[str] = None) -> List[str]:
         """Get level 2 body parts."""
         if level1:
@@ -105,6 +119,7 @@ class ExaminationKGService:
         Returns:
             List of method names
         """
+    @single_flight("kg.get_methods_for_part", key=_read_key)
     async def get_methods_for_part(self, level2: str) -> List[str]:
         """Get examination methods supported by a level 2 body part."""
         query = """
@@ -118,6 +133,7 @@ class ExaminationKGService:
     
     async def get_all_methods(self) -> List[str]:
         """Get all examination methods."""
+    @single_flight("kg.get_all_methods", key=_read_key)
     async def get_all_methods(self) -> List[str]:
         """Get all examination methods."""
         query = "MATCH (n:ExaminationMethod) RETURN n.name as name ORDER BY name"
@@ -126,6 +142,7 @@ class ExaminationKGService:
     
     async def get_all_modalities(self) -> List[str]:
         """Get all modalities."""
+    @single_flight("kg.get_all_modalities", key=_read_key)
     async def get_all_modalities(self) -> List[str]:
         """Get all modalities."""
         query = "MATCH (n:Modality) RETURN n.name as name ORDER BY name"
@@ -144,6 +161,7 @@ class ExaminationKGService:
         Returns:
             True if path exists, False otherwise
         """
+    @single_flight("kg.validate_path", key=_read_key)
     async def validate_path(self, level1: str, level2: str, method: str) -> bool:
         """Validate if a complete path exists in the graph."""
         query = """
@@ -170,6 +188,7 @@ class ExaminationKGService:
         Returns:
             Level 1 body part name or None
         """
+    @single_flight("kg.find_level1_by_level2", key=_read_key)
     async def find_level1_by_level2(self, level2: str) -> Optional[str]:
         """Find level 1 body part by level 2 part."""
         query = """
@@ -188,6 +207,7 @@ class ExaminationKGService:
         Returns:
             Nested dict: {level1: {level2: [methods]}}
         """
+    @single_flight("kg.get_complete_tree", key=_read_key)
     async def get_complete_tree(self) -> Dict[str, Dict[str, List[str]]]:
         """Get complete tree structure."""
         query = """
@@ -222,6 +242,7 @@ class ExaminationKGService:
         Returns:
             List of dicts with level1, level2, method
         """
+    @single_flight("kg.get_sample_paths", key=_read_key)
     async def get_sample_paths(self, limit: int = 5) -> List[Dict[str, str]]:
         """Get sample valid paths for Few-shot examples."""
         query = """
@@ -239,6 +260,7 @@ class ExaminationKGService:
         Returns:
             Dict with counts of nodes and relationships
         """
+    @single_flight("kg.get_graph_stats", key=_read_key)
     async def get_graph_stats(self) -> Dict[str, int]:
         """Get graph statistics."""
         query = """
@@ -284,6 +306,7 @@ class ExaminationKGService:
         Returns:
             True if path exists, False otherwise
         """
+    @single_flight("kg.validate_standardization_path", key=_read_key)
     async def validate_standardization_path(self, level1: str, level2: str, method: str) -> bool:
         """Validate if a standardization path exists in the KG."""
         query = """
@@ -298,6 +321,54 @@ class ExaminationKGService:
         })
         return records[0]["exists"] if records else False
 
+    async def validate_paths_bulk(
+        self,
+        triples: List[List[str]],
+        offline: bool = False
+    ) -> List[bool]:
+        """
+        Validate many standardization paths in a single round trip.
+        
+        Args:
+            triples: List of [level1, level2, method]
+            offline: Validate against the in-memory snapshot instead of Neo4j
+            
+        Returns:
+            One boolean per input triple, in input order
+        """
+        keys = [
+            tuple(triple) if isinstance(triple, (list, tuple)) and len(triple) == 3 else None
+            for triple in triples
+        ]
+        candidates = sorted({key for key in keys if key is not None})
+        if not candidates:
+            return [False] * len(keys)
+
+        if offline:
+            snapshot = await self.get_snapshot()
+            valid = {key for key in candidates if snapshot.has_path(*key)}
+        else:
+            query = """
+            UNWIND $paths as path
+            OPTIONAL MATCH (l1:BodyPartLevel1 {name: path.level1})
+                  -[:HAS_SUBPART]->(l2:BodyPartLevel2 {name: path.level2})
+                  -[:SUPPORTS_METHOD]->(m:ExaminationMethod {name: path.method})
+            RETURN path.level1 as level1, path.level2 as level2, path.method as method,
+                   count(m) > 0 as exists
+            """
+            records = await self.neo4j.execute_query(query, {
+                "paths": [
+                    {"level1": l1, "level2": l2, "method": method}
+                    for l1, l2, method in candidates
+                ]
+            })
+            valid = {
+                (record["level1"], record["level2"], record["method"])
+                for record in records if record["exists"]
+            }
+
+        return [key in valid if key is not None else False for key in keys]
+
     async def get_methods_by_modality(self, modality: str) -> List[str]:
         """
         Get all examination methods supported by a specific modality.
@@ -308,6 +379,7 @@ class ExaminationKGService:
         Returns:
             List of method names
         """
+    @single_flight("kg.get_methods_by_modality", key=_read_key)
     async def get_methods_by_modality(self, modality: str) -> List[str]:
         """Get all examination methods supported by a specific modality."""
         query = """
@@ -318,6 +390,32 @@ class ExaminationKGService:
         
         records = await self.neo4j.execute_query(query, {"modality": modality})
         return [record["m.name"] for record in records]
-        
+
+    @single_flight("kg.get_method_modalities", key=_read_key)
+    async def get_method_modalities(self) -> Dict[str, List[str]]:
+        """Get modalities for every examination method: {method: [modalities]}."""
+        query = """
+        MATCH (m:ExaminationMethod)-[:USES_MODALITY]->(mod:Modality)
+        RETURN m.name as method, collect(DISTINCT mod.name) as modalities
+        ORDER BY method
+        """
+        records = await self.neo4j.execute_query(query)
+        return {record["method"]: record["modalities"] for record in records}
+
+    # ==================== Snapshot ====================
+
+    async def get_snapshot(self) -> OntologySnapshot:
+        """Get the in-memory ontology snapshot, loading it once on first use."""
+        return await self.snapshots.get()
+
+    def invalidate_reads(self) -> None:
+        """Stop new reads from joining in-flight ones that predate a write."""
+        self.generation += 1
+
+    async def refresh_snapshot(self) -> OntologySnapshot:
+        """Reload the ontology snapshot; call after an ontology import."""
+        self.invalidate_reads()
+        return await self.snapshots.refresh()
+
 # Singleton instance
 examination_kg_service = ExaminationKGService()
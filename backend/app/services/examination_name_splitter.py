@@ -0,0 +1,59 @@
+"""
+Examination Name Splitter
+Deterministic pre-stage that breaks compound exam names ("颈椎正侧位片，胸椎正侧片")
+into single-exam fragments, so each fragment is standardized (and cached)
+on its own and the triples are merged back per row.
+"""
+
+from typing import Any, List
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+# Separators between whole exams seen in uploads. "+" is not one: it joins
+# techniques of one exam ("胸部CT平扫+能量成像", "泌尿系CTA+CTU"). Inside
+# brackets they enumerate parts of one exam ("右上肢（手、腕、肘）") and are kept.
+SEPARATORS = frozenset("，,、|;；")
+OPENING_BRACKETS = frozenset("（(")
+CLOSING_BRACKETS = frozenset("）)")
+
+# Bracketed notes that carry no standardization meaning: hospital site
+# ("（总院）"), scanner spec ("(64排)") and empty brackets
+ANNOTATIONS = re.compile(r"[（(]\s*(?:[^（）()]*(?:院|门诊)[^（）()]*|\d+\s*排)?\s*[）)]")
+
+
+def split_exam_name(name: Any) -> List[str]:
+    """
+    Fragments of an exam name, annotation-free and in order; duplicates dropped.
+
+    Idempotent: a fragment splits into itself. A name that would vanish
+    entirely is returned stripped, as a single fragment.
+    """
+    text = str(name).strip()
+    cleaned = ANNOTATIONS.sub("", text)
+    fragments = [part.strip() for part in _split_top_level(cleaned)]
+    fragments = list(dict.fromkeys(part for part in fragments if part))
+    return fragments or [text]
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split at SEPARATORS outside brackets (unbalanced closers are ignored)."""
+    parts, current, depth = [], [], 0
+    for char in text:
+        if char in OPENING_BRACKETS:
+            depth += 1
+        elif char in CLOSING_BRACKETS:
+            depth = max(0, depth - 1)
+        elif char in SEPARATORS and depth == 0:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    return parts
+
+
+def is_compound(name: Any) -> bool:
+    """True if the name standardizes as something other than itself."""
+    return split_exam_name(name) != [name]
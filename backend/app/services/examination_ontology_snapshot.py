@@ -0,0 +1,262 @@
+"""
+Examination Ontology Snapshot
+Immutable in-memory view of the BodyPartLevel1 -> BodyPartLevel2 ->
+ExaminationMethod -> Modality tree, so hot paths avoid Neo4j round trips.
+"""
+
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Tuple, FrozenSet, Iterable
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class OntologySnapshot:
+    """
+    Read-only snapshot of the examination ontology.
+
+    All lookups are plain dict/set hits. A new snapshot is built for every
+    reload; readers holding an old reference keep a consistent view.
+    """
+
+    version: str
+    tree: Mapping[str, Mapping[str, Tuple[str, ...]]]
+    method_modalities: Mapping[str, Tuple[str, ...]]
+    loaded_at: float = field(default_factory=time.time)
+
+    level1_parts: Tuple[str, ...] = ()
+    all_level2_parts: Tuple[str, ...] = ()
+    all_methods: Tuple[str, ...] = ()
+    all_modalities: Tuple[str, ...] = ()
+    level2_by_level1: Mapping[str, Tuple[str, ...]] = field(default_factory=dict)
+    level1_by_level2: Mapping[str, Tuple[str, ...]] = field(default_factory=dict)
+    methods_by_modality: Mapping[str, Tuple[str, ...]] = field(default_factory=dict)
+    paths: FrozenSet[Tuple[str, str, str]] = frozenset()
+
+    @classmethod
+    def build(
+        cls,
+        tree: Dict[str, Dict[str, List[str]]],
+        method_modalities: Optional[Dict[str, List[str]]] = None,
+    ) -> "OntologySnapshot":
+        """
+        Build a snapshot from `get_complete_tree()` output.
+
+        Args:
+            tree: Nested dict {level1: {level2: [methods]}}
+            method_modalities: Optional {method: [modalities]}
+        """
+        method_modalities = method_modalities or {}
+
+        frozen_tree = {}
+        level1_by_level2: Dict[str, List[str]] = {}
+        methods = set()
+        paths = set()
+        for level1 in sorted(tree):
+            level2_map = {}
+            for level2 in sorted(tree[level1]):
+                level2_methods = tuple(sorted(set(tree[level1][level2])))
+                level2_map[level2] = level2_methods
+                level1_by_level2.setdefault(level2, []).append(level1)
+                for method in level2_methods:
+                    methods.add(method)
+                    paths.add((level1, level2, method))
+            frozen_tree[level1] = MappingProxyType(level2_map)
+
+        frozen_modalities = {
+            method: tuple(sorted(set(mods)))
+            for method, mods in sorted(method_modalities.items())
+        }
+        methods_by_modality: Dict[str, List[str]] = {}
+        for method, mods in frozen_modalities.items():
+            for modality in mods:
+                methods_by_modality.setdefault(modality, []).append(method)
+
+        return cls(
+            version=cls.compute_version(tree, method_modalities),
+            tree=MappingProxyType(frozen_tree),
+            method_modalities=MappingProxyType(frozen_modalities),
+            level1_parts=tuple(frozen_tree.keys()),
+            all_level2_parts=tuple(sorted(level1_by_level2)),
+            all_methods=tuple(sorted(methods)),
+            all_modalities=tuple(sorted(methods_by_modality)),
+            level2_by_level1=MappingProxyType({
+                level1: tuple(level2_map.keys()) for level1, level2_map in frozen_tree.items()
+            }),
+            level1_by_level2=MappingProxyType({
+                level2: tuple(parents) for level2, parents in level1_by_level2.items()
+            }),
+            methods_by_modality=MappingProxyType({
+                modality: tuple(sorted(items)) for modality, items in methods_by_modality.items()
+            }),
+            paths=frozenset(paths),
+        )
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Dict[str, str]]) -> "OntologySnapshot":
+        """
+        Build a snapshot from ontology CSV rows
+        (一级部位, 二级部位, 检查方法, 检查模态), e.g. data/examination_ontology.csv.
+        """
+        tree: Dict[str, Dict[str, List[str]]] = {}
+        method_modalities: Dict[str, List[str]] = {}
+        for row in rows:
+            level1 = str(row.get("一级部位") or "").strip()
+            level2 = str(row.get("二级部位") or "").strip()
+            method = str(row.get("检查方法") or "").strip()
+            modality = str(row.get("检查模态") or "").strip()
+            if not (level1 and level2 and method):
+                continue
+            tree.setdefault(level1, {}).setdefault(level2, []).append(method)
+            if modality:
+                method_modalities.setdefault(method, []).append(modality)
+        return cls.build(tree, method_modalities)
+
+    @staticmethod
+    def compute_version(
+        tree: Dict[str, Dict[str, List[str]]],
+        method_modalities: Optional[Dict[str, List[str]]] = None,
+    ) -> str:
+        """Content hash of the ontology; stable across processes."""
+        canonical = {
+            "tree": {
+                l1: {l2: sorted(set(methods)) for l2, methods in l2_map.items()}
+                for l1, l2_map in tree.items()
+            },
+            "modalities": {
+                method: sorted(set(mods)) for method, mods in (method_modalities or {}).items()
+            },
+        }
+        payload = json.dumps(canonical, ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+
+    @property
+    def is_empty(self) -> bool:
+        return not self.paths
+
+    def get_level2_parts(self, level1: Optional[str] = None) -> List[str]:
+        """Level 2 parts, optionally restricted to one level 1 part."""
+        if level1:
+            return list(self.level2_by_level1.get(level1, ()))
+        return list(self.all_level2_parts)
+
+    def get_methods_for_part(self, level2: str) -> List[str]:
+        """Methods supported by a level 2 part under any level 1 part."""
+        methods = set()
+        for level1 in self.level1_by_level2.get(level2, ()):
+            methods.update(self.tree[level1][level2])
+        return sorted(methods)
+
+    def get_methods_by_modality(self, modality: str) -> List[str]:
+        """Methods that use the given modality."""
+        return list(self.methods_by_modality.get(modality, ()))
+
+    def find_level1_by_level2(self, level2: str) -> Optional[str]:
+        """First level 1 part containing the level 2 part."""
+        parents = self.level1_by_level2.get(level2, ())
+        return parents[0] if parents else None
+
+    def has_path(self, level1: str, level2: str, method: str) -> bool:
+        """Whether level1 -> level2 -> method exists."""
+        return (level1, level2, method) in self.paths
+
+    def to_tree(self) -> Dict[str, Dict[str, List[str]]]:
+        """Plain-dict copy in `get_complete_tree()` shape."""
+        return {
+            level1: {level2: list(methods) for level2, methods in level2_map.items()}
+            for level1, level2_map in self.tree.items()
+        }
+
+    def to_compact_text(self, modality: Optional[str] = None) -> str:
+        """
+        One line per level 1 part, e.g. "上肢: 手指[正位/侧位]; 手掌[正位]",
+        for embedding the ontology in a prompt. With a known modality only
+        its methods (and the parts that have them) are kept.
+        """
+        allowed = set(self.methods_by_modality.get(modality, ())) if modality else set()
+        lines = []
+        for level1, level2_map in self.tree.items():
+            parts = []
+            for level2, methods in level2_map.items():
+                kept = [m for m in methods if m in allowed] if allowed else list(methods)
+                if kept:
+                    parts.append(f"{level2}[{'/'.join(kept)}]")
+            if parts:
+                lines.append(f"{level1}: {'; '.join(parts)}")
+        return "\n".join(lines)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "level1_count": len(self.level1_parts),
+            "level2_count": len(self.all_level2_parts),
+            "method_count": len(self.all_methods),
+            "modality_count": len(self.all_modalities),
+            "total_paths": len(self.paths),
+        }
+
+
+class OntologySnapshotStore:
+    """
+    Holds the current snapshot and swaps it atomically on refresh.
+
+    The first `get()` loads from the KG; concurrent callers share that load.
+    An empty load (e.g. Neo4j unavailable) is retried after
+    `empty_retry_seconds` instead of on every call.
+    """
+
+    def __init__(self, kg_service, empty_retry_seconds: float = 30.0):
+        self.kg = kg_service
+        self.empty_retry_seconds = empty_retry_seconds
+        self._snapshot: Optional[OntologySnapshot] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def current(self) -> Optional[OntologySnapshot]:
+        """Current snapshot without triggering a load."""
+        return self._snapshot
+
+    async def get(self) -> OntologySnapshot:
+        """Return the current snapshot, loading it on first use."""
+        snapshot = self._snapshot
+        if snapshot is not None and not self._needs_retry(snapshot):
+            return snapshot
+
+        async with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and not self._needs_retry(snapshot):
+                return snapshot
+            return await self._load()
+
+    async def refresh(self) -> OntologySnapshot:
+        """Reload from the KG and swap in the new snapshot (e.g. after an import)."""
+        async with self._lock:
+            return await self._load()
+
+    def install(self, snapshot: OntologySnapshot) -> None:
+        """Swap in a prebuilt snapshot (offline tools, tests)."""
+        self._snapshot = snapshot
+        logger.info(f"Installed ontology snapshot {snapshot.version}: {snapshot.get_stats()}")
+
+    def _needs_retry(self, snapshot: OntologySnapshot) -> bool:
+        return snapshot.is_empty and time.time() - snapshot.loaded_at >= self.empty_retry_seconds
+
+    async def _load(self) -> OntologySnapshot:
+        try:
+            tree = await self.kg.get_complete_tree()
+            method_modalities = await self.kg.get_method_modalities()
+            snapshot = OntologySnapshot.build(tree, method_modalities)
+        except Exception as e:
+            logger.error(f"Failed to load ontology snapshot: {e}")
+            snapshot = OntologySnapshot.build({})
+
+        previous = self._snapshot
+        self._snapshot = snapshot
+        if previous is None or previous.version != snapshot.version:
+            logger.info(f"Loaded ontology snapshot {snapshot.version}: {snapshot.get_stats()}")
+        return snapshot
@@ -0,0 +1,272 @@
+"""
+Examination Standardization Result Cache
+Persistent (normalized_name, modality, ontology_version) -> triples, status
+cache with an in-process LRU front. DB round trips run in a worker thread so
+lookups never block the event loop.
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+import unicodedata
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.db.base import SessionLocal
+from app.db.models import StandardizationCacheEntry
+from app.services.examination_dictionary_matcher import normalize_modality
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r"\s+")
+
+# LRU entry for keys known to be absent from the DB: (_MISSING, expires at)
+_MISSING = object()
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE; others fall back to
+# select-then-write with a retry on a lost insert race
+_UPSERT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def normalize_exam_name(name: Any) -> str:
+    """
+    Normalize an exam name for cache/dedup keys.
+    Full-width characters are folded (NFKC), whitespace removed, ASCII upper-cased.
+    """
+    if name is None:
+        return ""
+    text = unicodedata.normalize("NFKC", str(name))
+    return _WHITESPACE.sub("", text).upper()
+
+
+def normalize_modality_key(modality: Any) -> str:
+    """Normalize the modality column for cache/dedup keys ("MR" and "MRI" share a key)."""
+    if modality is None or str(modality).strip().lower() == "nan":
+        return ""
+    return normalize_modality(modality)
+
+
+class StandardizationResultCache:
+    """
+    Two-level cache of standardization results.
+
+    - LRU (in-process) in front of the `standardization_cache` table.
+    - Manual corrections (source="manual") override LLM entries and are never
+      replaced by later LLM results.
+    - Misses are remembered for `miss_ttl` seconds only, so entries written
+      by another worker (or a reviewer) are picked up afterwards.
+    """
+
+    def __init__(self, max_entries: int = 20000, miss_ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.miss_ttl = miss_ttl
+        self._lru: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(name: str, modality: str, ontology_version: str) -> str:
+        raw = f"{normalize_exam_name(name)}|{normalize_modality_key(modality)}|{ontology_version}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, name: str, modality: str, ontology_version: str,
+                  record: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Look up a cached result.
+
+        Args:
+            record: False for read-only lookups (estimates): hit/miss counters,
+                LRU order and contents are left untouched
+
+        Returns:
+            { "result": [...], "status": ..., "source": "cache" } or None
+        """
+        key = self.make_key(name, modality, ontology_version)
+        entry = self._lru_get(key, touch=record)
+
+        if entry is None:
+            entry = await asyncio.to_thread(self._load, key)
+            # A put that finished while we were loading is newer than what we read
+            if record and entry is not None:
+                self._lru_put(key, entry, replace=False)
+            elif record and self.miss_ttl > 0:
+                self._lru_put(key, (_MISSING, time.monotonic() + self.miss_ttl), replace=False)
+
+        if entry is None or entry[0] is _MISSING:
+            if record:
+                self.misses += 1
+            return None
+
+        if record:
+            self.hits += 1
+        triples, status, source = entry
+        return {
+            "result": [list(triple) for triple in triples],
+            "status": status,
+            "source": "cache",
+            "cached_source": source
+        }
+
+    async def put(
+        self,
+        name: str,
+        modality: str,
+        ontology_version: str,
+        triples: List[List[str]],
+        status: str,
+        source: str = "llm"
+    ) -> bool:
+        """
+        Store a result. Non-manual writes never replace a manual correction.
+
+        Returns:
+            True if the entry was written
+        """
+        key = self.make_key(name, modality, ontology_version)
+        written = await asyncio.to_thread(self._write, key, name, modality, ontology_version, triples, status, source)
+        if written:
+            self._lru_put(key, (self._freeze(triples), status, source))
+        return written
+
+    async def put_manual(self, name: str, modality: str, ontology_version: str, triples: List[List[str]],
+                         status: str = "success") -> bool:
+        """Store a reviewer correction; it overrides any cached LLM result."""
+        return await self.put(name, modality, ontology_version, triples, status, source="manual")
+
+    def clear_memory(self):
+        """Drop the in-process LRU (the DB table is kept)."""
+        with self._lock:
+            self._lru.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "memory_entries": len(self._lru)
+        }
+
+    # ==================== Internals ====================
+
+    @staticmethod
+    def _freeze(triples: List[List[str]]) -> Tuple[Tuple[str, ...], ...]:
+        return tuple(tuple(triple) for triple in triples)
+
+    def _lru_get(self, key: str, touch: bool = True):
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is None:
+                return None
+            if entry[0] is _MISSING and entry[1] <= time.monotonic():
+                if touch:
+                    del self._lru[key]
+                return None
+            if touch:
+                self._lru.move_to_end(key)
+            return entry
+
+    @staticmethod
+    def _is_manual(entry) -> bool:
+        return entry[0] is not _MISSING and entry[2] == "manual"
+
+    def _lru_put(self, key: str, entry, replace: bool = True):
+        with self._lock:
+            current = self._lru.get(key)
+            # Concurrent puts may land out of order; a manual entry still wins
+            if current is not None and (not replace or self._is_manual(current) and not self._is_manual(entry)):
+                return
+            self._lru[key] = entry
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _write(self, key: str, name: str, modality: str, ontology_version: str,
+               triples: List[List[str]], status: str, source: str) -> bool:
+        values = {
+            "id": key,
+            "normalized_name": normalize_exam_name(name),
+            "modality": normalize_modality_key(modality),
+            "ontology_version": ontology_version,
+            "triples": json.dumps(triples, ensure_ascii=False),
+            "status": status,
+            "source": source,
+        }
+        db = SessionLocal()
+        try:
+            insert = _UPSERT_INSERTS.get(db.get_bind().dialect.name)
+            written = self._upsert(db, insert, values) if insert else self._select_and_write(db, values)
+            db.commit()
+            return written
+        except Exception as e:
+            logger.error(f"Failed to write standardization cache entry: {e}")
+            db.rollback()
+            return False
+        finally:
+            db.close()
+
+    @staticmethod
+    def _upsert(db, insert, values: Dict[str, Any]) -> bool:
+        """Single-statement insert-or-update; a manual row only yields to another manual write."""
+        table = StandardizationCacheEntry.__table__
+        stmt = insert(table).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={
+                "triples": stmt.excluded.triples,
+                "status": stmt.excluded.status,
+                "source": stmt.excluded.source,
+                "updated_at": func.now(),
+            },
+            where=(table.c.source != "manual") | (stmt.excluded.source == "manual"),
+        )
+        return db.execute(stmt).rowcount > 0
+
+    @staticmethod
+    def _select_and_write(db, values: Dict[str, Any]) -> bool:
+        """Portable fallback: if a concurrent insert wins, retry as an update."""
+        for attempt in range(2):
+            entry = db.query(StandardizationCacheEntry).filter(StandardizationCacheEntry.id == values["id"]).first()
+            if entry and entry.source == "manual" and values["source"] != "manual":
+                return False
+            if entry is None:
+                db.add(StandardizationCacheEntry(**values))
+            else:
+                entry.triples = values["triples"]
+                entry.status = values["status"]
+                entry.source = values["source"]
+            try:
+                db.flush()
+                return True
+            except IntegrityError:
+                db.rollback()
+                if attempt:
+                    raise
+        return False
+
+    def _load(self, key: str):
+        db = SessionLocal()
+        try:
+            entry = db.query(StandardizationCacheEntry).filter(StandardizationCacheEntry.id == key).first()
+            if not entry:
+                return None
+            return (self._freeze(json.loads(entry.triples or "[]")), entry.status, entry.source)
+        except Exception as e:
+            logger.warning(f"Standardization cache lookup failed: {e}")
+            return None
+        finally:
+            db.close()
+
+
+# Singleton instance
+standardization_result_cache = StandardizationResultCache(miss_ttl=settings.STANDARDIZATION_CACHE_MISS_TTL)
@@ -0,0 +1,175 @@
+"""
+Examination Result Exporter
+Streams standardization results as CSV or XLSX bytes, consuming the
+results lazily so memory stays flat and the first bytes go out at once
+regardless of task size.
+"""
+
+from typing import Any, Dict, Iterable, Iterator, List
+import csv
+import io
+import json
+import logging
+import re
+import zipfile
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger(__name__)
+
+EXPORT_HEADERS = ["行号", "检查项目名", "检查标准模态", "标准化结果", "三元组(JSON)", "状态", "来源"]
+
+CSV_FLUSH_BYTES = 64 * 1024
+XLSX_FLUSH_BYTES = 64 * 1024
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def export_row(result: Dict[str, Any]) -> List[Any]:
+    """Flatten one result dict into EXPORT_HEADERS order."""
+    triples = result.get("standardized") or []
+    row_index = result.get("row_index")
+    return [
+        row_index + 1 if isinstance(row_index, int) else "",
+        result.get("original_name", ""),
+        result.get("modality", ""),
+        "; ".join("-".join(str(part) for part in triple) for triple in triples),
+        json.dumps(triples, ensure_ascii=False) if triples else "",
+        result.get("status", ""),
+        result.get("source") or ""
+    ]
+
+
+def iter_csv(results: Iterable[Dict[str, Any]], flush_bytes: int = CSV_FLUSH_BYTES) -> Iterator[bytes]:
+    """
+    Yield UTF-8 CSV (with BOM, so Excel detects the encoding) in chunks of
+    roughly `flush_bytes`. The header is yielded before any result is read.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_HEADERS)
+    yield ("\ufeff" + buffer.getvalue()).encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+
+    for result in results:
+        writer.writerow(export_row(result))
+        if buffer.tell() >= flush_bytes:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_xlsx(results: Iterable[Dict[str, Any]], chunk_size: int = XLSX_FLUSH_BYTES) -> Iterator[bytes]:
+    """
+    Yield a single-sheet XLSX file while the results are being read.
+
+    openpyxl's write-only mode keeps memory flat but can only zip the package
+    after the last row, so nothing reaches the client until the export is
+    complete. Here the worksheet XML is deflated straight into a zip stream
+    (zipfile writes data descriptors for unseekable outputs) and compressed
+    bytes are yielded every `chunk_size` bytes.
+    """
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_DEFLATED) as package:
+        for name, xml in _XLSX_PARTS.items():
+            package.writestr(name, xml)
+        yield sink.drain()
+
+        with package.open("xl/worksheets/sheet1.xml", "w") as sheet:
+            sheet.write(_XLSX_SHEET_HEAD)
+            sheet.write(_xlsx_row(1, EXPORT_HEADERS))
+            for number, result in enumerate(results, start=2):
+                sheet.write(_xlsx_row(number, export_row(result)))
+                if sink.size >= chunk_size:
+                    yield sink.drain()
+            sheet.write(_XLSX_SHEET_TAIL)
+    yield sink.drain()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable write target that hands written bytes back in chunks."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        self.size = 0
+        return data
+
+
+_ILLEGAL_XML_CHARS = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_XLSX_COLUMNS = [chr(ord("A") + i) for i in range(len(EXPORT_HEADERS))]
+
+
+def _xlsx_row(number: int, values: List[Any]) -> bytes:
+    cells = []
+    for column, value in zip(_XLSX_COLUMNS, values):
+        ref = f"{column}{number}"
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c r="{ref}"><v>{value}</v></c>')
+        elif value not in (None, ""):
+            text = escape(_ILLEGAL_XML_CHARS.sub("", str(value)))
+            cells.append(f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>')
+    return f'<row r="{number}">{"".join(cells)}</row>'.encode("utf-8")
+
+
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+_REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+_PACKAGE_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_XLSX_PARTS = {
+    "[Content_Types].xml": _XML_DECLARATION + (
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    "_rels/.rels": _XML_DECLARATION + (
+        f'<Relationships xmlns="{_PACKAGE_REL_NS}">'
+        f'<Relationship Id="rId1" Type="{_REL_NS}/officeDocument" Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/workbook.xml": _XML_DECLARATION + (
+        f'<workbook xmlns="{_MAIN_NS}" xmlns:r="{_REL_NS}">'
+        '<sheets><sheet name="标准化结果" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    "xl/_rels/workbook.xml.rels": _XML_DECLARATION + (
+        f'<Relationships xmlns="{_PACKAGE_REL_NS}">'
+        f'<Relationship Id="rId1" Type="{_REL_NS}/worksheet" Target="worksheets/sheet1.xml"/>'
+        f'<Relationship Id="rId2" Type="{_REL_NS}/styles" Target="styles.xml"/>'
+        '</Relationships>'
+    ),
+    "xl/styles.xml": _XML_DECLARATION + (
+        f'<styleSheet xmlns="{_MAIN_NS}">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+        '<fill><patternFill patternType="gray125"/></fill></fills>'
+        '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+        '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+        '<cellXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/></cellXfs>'
+        '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+        '</styleSheet>'
+    ),
+}
+_XLSX_SHEET_HEAD = (_XML_DECLARATION + f'<worksheet xmlns="{_MAIN_NS}"><sheetData>').encode("utf-8")
+_XLSX_SHEET_TAIL = b"</sheetData></worksheet>"
@@ -3,10 +3,8 @@ Examination Standardization Service
 Standardizes non-standard examination names using LLM + Knowledge Graph.
 """
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, AsyncIterator
 from fastapi import UploadFile
-import pandas as pd
-import io
 import uuid
 import json
 import logging
@@ -14,32 +12,70 @@ from datetime import datetime
 from dotenv import load_dotenv
 import os
 import asyncio
+import shutil
+import tempfile
+import time
 
 # Load environment variables from .env file
 load_dotenv()
 
 from app.services.examination_kg_service import examination_kg_service
+from app.services.examination_kg_initializer import examination_kg
+from app.services.examination_dictionary_matcher import DictionaryMatcher
+from app.services.examination_file_reader import FileSource, aiter_records, count_records
+from app.services.examination_result_exporter import iter_csv, iter_xlsx
+from app.services.examination_cost_estimator import CostEstimate, TokenCounter, get_token_counter
+from app.services.examination_correction_memory import correction_memory
+from app.services.examination_std_term_writer import std_term_writer
+from app.services.examination_name_splitter import is_compound, split_exam_name
+from app.services.file_storage_service import file_storage
+from app.services.examination_result_cache import (
+    standardization_result_cache,
+    normalize_exam_name,
+    normalize_modality_key,
+)
 from app.core.llm import llm_service
+from app.core.config import settings
+from app.core.concurrency import SlidingWindowScheduler
+from app.core.events import task_events
+from app.core.exceptions import LLMOverloadedError
 from app.db.base import SessionLocal
-from app.db.models import StandardizationTask
+from sqlalchemy import func
+from app.db.models import StandardizationTask, StandardizationResult, Tenant
 
 logger = logging.getLogger(__name__)
 
+# Standardization modes: two LLM calls per name (level 1, then detail) or one
+# call with the modality-filtered ontology tree in the prompt
+MODE_TWO_STAGE = "two_stage"
+MODE_SINGLE_PASS = "single_pass"
+STANDARDIZATION_MODES = (MODE_TWO_STAGE, MODE_SINGLE_PASS)
+
 class ExaminationStandardizationService:
     """
     Service for standardizing medical examination names.
     
     Workflow:
     1. Parse uploaded file (CSV/Excel)
-    2. For each record, use LLM + KG to standardize
-    3. Validate results against knowledge graph
-    4. Return standardized results
+    2. For each record, try the deterministic dictionary matcher first
+    3. Otherwise use LLM + KG to standardize
+    4. Validate results against knowledge graph
+    5. Return standardized results
     """
     
     
     def __init__(self):
         self.kg = examination_kg_service
+        self.result_cache = standardization_result_cache
+        self.correction_memory = correction_memory
         self._kg_initialized = False
+        self._matcher: Optional[DictionaryMatcher] = None
+        self._running: set = set()  # task ids being processed in this process
+        # Interactive LLM jobs in flight, shared by requests for the same name
+        self._jobs_by_key: Dict[tuple, asyncio.Task] = {}
+        # Jobs past their request deadline: ticket id -> {"job", "expires"}
+        self._tickets: Dict[str, Dict[str, Any]] = {}
+        self._ticket_by_key: Dict[tuple, str] = {}
 
 
 
@@ -49,8 +85,13 @@ class ExaminationStandardizationService:
             # Add initialization logic if needed
             self._kg_initialized = True
 
-    def create_task(self, filename: str, user: str = "system") -> str:
-        """Create a new standardization task."""
+    def create_task(self, filename: str, user: str = "system", options: Optional[Dict] = None) -> str:
+        """
+        Create a new standardization task.
+        
+        Args:
+            options: Per-task pipeline options, e.g. {"batch_size": 10, "mode": "single_pass"}
+        """
         db = SessionLocal()
         try:
             task = StandardizationTask(
@@ -58,7 +99,8 @@ class ExaminationStandardizationService:
                 filename=filename,
                 user=user,
                 status="processing",
-                results=json.dumps([])
+                results=json.dumps([]),
+                options=json.dumps(options or {}, ensure_ascii=False)
             )
             db.add(task)
             db.commit()
@@ -70,6 +112,25 @@ class ExaminationStandardizationService:
         finally:
             db.close()
 
+    async def save_upload(self, task_id: str, file: UploadFile) -> str:
+        """Spool an uploaded file to disk and record its path on the task."""
+        db = SessionLocal()
+        try:
+            task = db.query(StandardizationTask).filter(StandardizationTask.id == task_id).first()
+            if not task:
+                raise ValueError(f"Task {task_id} not found")
+            file_path = await file_storage.save_file(
+                file=file,
+                category="examination",
+                tenant_id=task.tenant_id or "system",
+                prefix=task_id
+            )
+            task.file_path = file_path
+            db.commit()
+            return file_path
+        finally:
+            db.close()
+
     def get_task(self, task_id: str) -> Optional[Dict]:
         """Get task status and info."""
         db = SessionLocal()
@@ -89,25 +150,88 @@ class ExaminationStandardizationService:
                 "success_count": task.success_count,
                 "failed_count": task.failed_count,
                 "error_message": task.error_message,
+                "stats": json.loads(task.stats) if task.stats else {},
+                "options": json.loads(task.options) if task.options else {},
+                "kag_sync": json.loads(task.kag_sync) if task.kag_sync else None,
                 "created_at": task.created_at.isoformat() if task.created_at else None,
                 "completed_at": task.completed_at.isoformat() if task.completed_at else None
             }
         finally:
             db.close()
 
-    def get_task_results(self, task_id: str) -> List[Dict]:
-        """Get processed results for a task."""
+    def get_task_results(
+        self,
+        task_id: str,
+        offset: int = 0,
+        limit: Optional[int] = None,
+        status: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Get processed results for a task, in file order.
+        
+        Args:
+            offset: Rows to skip
+            limit: Max rows to return (None = all)
+            status: Only rows with this status (success, review_required, failed)
+        """
         db = SessionLocal()
         try:
-            task = db.query(StandardizationTask).filter(StandardizationTask.id == task_id).first()
-            if not task or not task.results:
-                return []
-            return json.loads(task.results)
+            if not self._has_result_rows(db, task_id):
+                # Tasks created before row-level storage keep a JSON blob
+                rows = self._legacy_results(db, task_id, status)
+                return rows[offset:offset + limit if limit is not None else None]
+            
+            query = self._results_query(db, task_id, status).offset(offset)
+            if limit is not None:
+                query = query.limit(limit)
+            return [self._result_to_dict(row) for row in query]
+        finally:
+            db.close()
+
+    def count_task_results(self, task_id: str, status: Optional[str] = None) -> int:
+        """Number of result rows for a task (optionally with one status)."""
+        db = SessionLocal()
+        try:
+            if not self._has_result_rows(db, task_id):
+                return len(self._legacy_results(db, task_id, status))
+            return self._results_query(db, task_id, status).count()
         finally:
             db.close()
 
-    def update_task_results(self, task_id: str, results: List[Dict]) -> bool:
-        """Update processed results for a task (Manual Correction)."""
+    def iter_task_results(self, task_id: str, status: Optional[str] = None, page_size: int = 1000) -> Iterator[Dict]:
+        """Yield all results of a task in file order, one page of rows in memory at a time."""
+        last_index = -1
+        while True:
+            db = SessionLocal()
+            try:
+                if not self._has_result_rows(db, task_id):
+                    yield from self._legacy_results(db, task_id, status)
+                    return
+                page = [
+                    self._result_to_dict(row) for row in
+                    self._results_query(db, task_id, status)
+                    .filter(StandardizationResult.row_index > last_index)
+                    .limit(page_size)
+                ]
+            finally:
+                db.close()
+            yield from page
+            if len(page) < page_size:
+                return
+            last_index = page[-1]["row_index"]
+
+    async def update_task_results(self, task_id: str, results: List[Dict]) -> bool:
+        """
+        Update processed results for a task (Manual Correction).
+        `results` holds rows as returned by `get_task_results` (any page or
+        filter); each is matched on its `row_index`, and the whole update is
+        rejected if an index does not exist. Only changed rows are written.
+        Changed rows are also stored in the result cache as manual entries,
+        so later uploads of the same exam name reuse them.
+        
+        Legacy blob tasks have no `row_index` in their rows; there `results`
+        without indexes must be the full list in file order.
+        """
         db = SessionLocal()
         try:
             task = db.query(StandardizationTask).filter(StandardizationTask.id == task_id).first()
@@ -115,11 +239,45 @@ class ExaminationStandardizationService:
                 return False
             
             # Verify structure (basic check)
-            if not isinstance(results, list):
+            if not isinstance(results, list) or not all(isinstance(row, dict) for row in results):
                 return False
-                
-            task.results = json.dumps(results, ensure_ascii=False)
+            
+            corrections = []
+            if self._has_result_rows(db, task_id):
+                indexes = [row.get("row_index") for row in results]
+                if not all(type(index) is int for index in indexes):
+                    logger.warning(f"Result update for task {task_id} rejected: rows without row_index")
+                    return False
+                stored_rows = self._stored_rows(db, task_id, set(indexes))
+                unknown = set(indexes) - stored_rows.keys()
+                if unknown:
+                    logger.warning(f"Result update for task {task_id} rejected: unknown row_index {sorted(unknown)[:10]}")
+                    return False
+                for row in results:
+                    stored = stored_rows[row["row_index"]]
+                    if self._is_correction(self._result_to_dict(stored), row):
+                        self._apply_correction(stored, row.get("standardized"), row.get("status"))
+                        corrections.append(self._result_to_dict(stored))
+            else:
+                previous = json.loads(task.results) if task.results else []
+                if any("row_index" in row for row in results):
+                    positions = [row.get("row_index") for row in results]
+                    if not all(type(index) is int and 0 <= index < len(previous) for index in positions):
+                        return False
+                elif previous and len(results) != len(previous):
+                    return False
+                else:
+                    positions = range(len(results))
+                rows = previous if previous else list(results)
+                for index, row in zip(positions, results):
+                    before = previous[index] if index < len(previous) and isinstance(previous[index], dict) else {}
+                    if self._is_correction(before, row):
+                        corrections.append(row)
+                    rows[index] = {key: value for key, value in row.items() if key != "row_index"}
+                task.results = json.dumps(rows, ensure_ascii=False)
             db.commit()
+            
+            await self._remember_corrections(corrections)
             return True
         except Exception as e:
             logger.error(f"Failed to update task results: {e}")
@@ -128,6 +286,54 @@ class ExaminationStandardizationService:
         finally:
             db.close()
 
+    async def update_task_result(
+        self,
+        task_id: str,
+        row_index: int,
+        standardized: List[List[str]],
+        status: Optional[str] = None
+    ) -> Optional[Dict]:
+        """
+        Correct a single result row (Manual Correction).
+        Returns the updated row, or None if the task or row does not exist.
+        """
+        db = SessionLocal()
+        try:
+            stored = self._results_query(db, task_id).filter(StandardizationResult.row_index == row_index).first()
+            if stored is not None:
+                row = self._result_to_dict(self._apply_correction(stored, standardized, status))
+            else:
+                # Legacy blob: row_index is the position in the list
+                task = db.query(StandardizationTask).filter(StandardizationTask.id == task_id).first()
+                rows = json.loads(task.results) if task and task.results else []
+                if self._has_result_rows(db, task_id) or not 0 <= row_index < len(rows):
+                    return None
+                row = {**rows[row_index], "standardized": standardized,
+                       "status": status or ("success" if standardized else "failed")}
+                rows[row_index] = row
+                task.results = json.dumps(rows, ensure_ascii=False)
+            db.commit()
+            
+            await self._remember_corrections([row])
+            return row
+        except Exception as e:
+            logger.error(f"Failed to update result {row_index} of task {task_id}: {e}")
+            db.rollback()
+            return None
+        finally:
+            db.close()
+
+    def export_results(self, task_id: str, format: str = "csv") -> Optional[Iterator[bytes]]:
+        """
+        Stream a task's results as CSV ('csv') or XLSX ('excel') bytes.
+        Rows are read page by page while the export is consumed.
+        Returns None if the task does not exist.
+        """
+        if not self.get_task(task_id):
+            return None
+        results = self.iter_task_results(task_id)
+        return iter_csv(results) if format == "csv" else iter_xlsx(results)
+
     def delete_task(self, task_id: str) -> bool:
         """Delete a standardization task."""
         db = SessionLocal()
@@ -135,6 +341,11 @@ class ExaminationStandardizationService:
             task = db.query(StandardizationTask).filter(StandardizationTask.id == task_id).first()
             if not task:
                 return False
+            db.query(StandardizationResult).filter(
+                StandardizationResult.task_id == task_id
+            ).delete(synchronize_session=False)
+            if task.file_path:
+                file_storage.delete_file(task.file_path)
             db.delete(task)
             db.commit()
             return True
@@ -167,8 +378,23 @@ class ExaminationStandardizationService:
         finally:
             db.close()
 
-    async def process_file(self, task_id: str, content: bytes, filename: str):
-        """Process uploaded file in background."""
+    async def process_file(self, task_id: str, source: FileSource, filename: str):
+        """
+        Process uploaded file in background.
+        
+        Result rows are committed as they complete and act as checkpoints: if
+        the task already has stored rows (an interrupted earlier run), those
+        rows are skipped and counters restart from them. The spooled upload
+        is deleted once the task completes; a failed or interrupted task keeps
+        it for a resume until the task is deleted.
+        
+        Live progress and per-row results are published to `task_events`
+        under the task id (see GET /examination/tasks/{id}/events).
+        
+        Args:
+            source: Path of the spooled upload (or the raw file content)
+        """
+        self._running.add(task_id)
         db = SessionLocal()
         try:
             # Update status
@@ -176,111 +402,235 @@ class ExaminationStandardizationService:
             if not task:
                 return
             
-            # Parse file
-            if filename.endswith('.csv'):
-                df = pd.read_csv(io.BytesIO(content))
-            else:
-                df = pd.read_excel(io.BytesIO(content))
-                
-            records = df.to_dict('records')
-            
-            task.total_records = len(records)
+            if isinstance(source, str):
+                source = file_storage.get_file_path(source) or source
+            task.total_records = await asyncio.to_thread(count_records, source, filename) or 0
             db.commit()
+            logger.info(f"Task {task_id}: streaming {task.total_records} records from {filename}")
+            
+            checkpoint = self._checkpoint(db, task_id)
+            task.success_count = checkpoint["success"]
+            task.failed_count = checkpoint["failed"]
+            task.processed_records = checkpoint["rows"]
+            if checkpoint["rows"]:
+                logger.info(f"Task {task_id}: resuming after {checkpoint['rows']} checkpointed rows")
+            
+            source_counts: Dict[str, int] = dict(checkpoint["sources"])
+            pending_rows: List[Dict[str, Any]] = []
             
-            logger.info(f"Parsed {len(records)} records from {filename}")
+            concurrency = self._resolve_concurrency(task.tenant_id)
+            options = json.loads(task.options) if task.options else {}
+            batch_size = max(1, int(options.get("batch_size") or settings.STANDARDIZATION_BATCH_SIZE))
+            mode = options.get("mode") or settings.STANDARDIZATION_MODE
+            if mode not in STANDARDIZATION_MODES:
+                logger.warning(f"Task {task_id}: unknown mode '{mode}', using {MODE_TWO_STAGE}")
+                mode = MODE_TWO_STAGE
+            progress_interval = settings.STANDARDIZATION_PROGRESS_INTERVAL
+            last_commit = time.monotonic()
+            started = last_commit
+            last_event = 0.0
+            logger.info(f"Task {task_id}: standardizing with {concurrency} requests in flight")
             
-            results_list = []
+            requeued = 0
+            batch_stats = {"llm_batches": 0, "batch_fallbacks": 0}
             
-            # Process in batches
-            BATCH_SIZE = 10
+            # Streaming dedup on normalized (exam name, modality): each distinct key is
+            # standardized once. Rows of a key still in flight wait in `pending`; rows
+            # of a finished key are written straight from its outcome in `resolved`.
+            pending: Dict[tuple, Dict[str, Any]] = {}
+            resolved: Dict[tuple, tuple] = {}
+            rows_to_standardize = checkpoint["rows"]
+            split_keys = 0
+            correction_keys = 0
             
-            for i in range(0, len(records), BATCH_SIZE):
-                batch_records = records[i:i + BATCH_SIZE]
-                tasks = []
-                batch_indices = []
+            def flush_rows():
+                # Bulk insert finished rows; committed with the progress counters
+                if pending_rows:
+                    db.bulk_insert_mappings(StandardizationResult, pending_rows)
+                    pending_rows.clear()
+            
+            def publish_progress(force: bool = False):
+                nonlocal last_event
+                now = time.monotonic()
+                if force or now - last_event >= settings.STANDARDIZATION_EVENT_INTERVAL:
+                    last_event = now
+                    task_events.publish(task_id, "progress", self._progress_event(
+                        task, task.processed_records - checkpoint["rows"], now - started
+                    ))
+            
+            def write_rows(rows: List[tuple], outcome: tuple):
+                nonlocal last_commit
+                triples, status, source_name = outcome
+                for row_index, exam_name, modality in rows:
+                    pending_rows.append({
+                        "task_id": task_id,
+                        "row_index": row_index,
+                        "original_name": exam_name,
+                        "modality": modality,
+                        "triples": triples,
+                        "status": status,
+                        "source": source_name
+                    })
+                
+                # review_required counts as processed successfully; only the status differs
+                if status in ("success", "review_required"):
+                    task.success_count += len(rows)
+                else:
+                    task.failed_count += len(rows)
+                if source_name:
+                    source_counts[source_name] = source_counts.get(source_name, 0) + len(rows)
+                task.processed_records += len(rows)
                 
-                # Prepare tasks
-                for batch_idx, record in enumerate(batch_records):
-                    global_idx = i + batch_idx
+                if task_events.has_subscribers(task_id):
+                    standardized = json.loads(triples) if triples else None
+                    task_events.publish(task_id, "results", {"rows": [
+                        {"row_index": row_index, "original_name": exam_name, "modality": modality,
+                         "standardized": standardized, "status": status, "source": source_name}
+                        for row_index, exam_name, modality in rows
+                    ]})
+                publish_progress()
+                
+                # Commit progress on a timer (or a full buffer) rather than per result.
+                # Inserts are committed right away: an open write transaction would
+                # lock SQLite for the result cache's own sessions.
+                if (len(pending_rows) >= settings.STANDARDIZATION_FLUSH_ROWS
+                        or time.monotonic() - last_commit >= progress_interval):
+                    flush_rows()
+                    db.commit()
+                    last_commit = time.monotonic()
+            
+            async def distinct_keys():
+                nonlocal rows_to_standardize, split_keys
+                # Merge-walk the checkpointed row indexes (both ascending) to skip done rows
+                stored = self._iter_stored_row_indexes(task_id, checkpoint["max_row_index"])
+                next_stored = next(stored, None)
+                async for row_index, record in aiter_records(source, filename):
+                    while next_stored is not None and next_stored < row_index:
+                        next_stored = next(stored, None)
+                    if next_stored == row_index:
+                        continue
+                    
                     exam_name = record.get("检查项目名", record.get("exam_name", ""))
                     modality = record.get("检查标准模态", record.get("modality", ""))
                     
-                    if not exam_name:
-                        logger.warning(f"Record {global_idx} missing exam name, skipping")
+                    if not self._has_value(exam_name):
+                        logger.warning(f"Record {row_index} missing exam name, skipping")
                         task.failed_count += 1
                         task.processed_records += 1
                         continue
-                        
-                    tasks.append(self._standardize_single(exam_name, modality))
-                    batch_indices.append(global_idx) # Keep track of which record this is
-                
-                if not tasks:
-                    continue
-                    
-                # Execute batch concurrently
-                try:
-                    batch_results = await asyncio.gather(*tasks, return_exceptions=True)
                     
-                    # Process results
-                    for res_idx, result in enumerate(batch_results):
-                        original_record = batch_records[batch_indices[res_idx] - i] # Get original record
-                        exam_name = original_record.get("检查项目名", original_record.get("exam_name", ""))
-                        modality = original_record.get("检查标准模态", original_record.get("modality", ""))
-                        
-                        if isinstance(result, Exception):
-                            logger.error(f"Error processing record {batch_indices[res_idx]}: {result}")
-                            task.failed_count += 1
-                            result_data = None
-                            status = "failed"
-                        elif result is None:
-                            task.failed_count += 1
-                            result_data = None
-                            status = "failed"
+                    rows_to_standardize += 1
+                    key = self._dedup_key(exam_name, modality)
+                    row = (row_index, self._cell(exam_name), self._cell(modality))
+                    if key in resolved:
+                        write_rows([row], resolved[key])
+                    elif key in pending:
+                        pending[key]["rows"].append(row)
+                    else:
+                        pending[key] = {"input": (exam_name, modality), "rows": [row]}
+                        split_keys += is_compound(exam_name)
+                        yield key
+            
+            async def with_requeue(call):
+                nonlocal requeued
+                for attempt in range(settings.STANDARDIZATION_MAX_REQUEUES + 1):
+                    try:
+                        return await call()
+                    except LLMOverloadedError as e:
+                        # Rate limited: keep the record in the pipeline instead of failing it
+                        if attempt == settings.STANDARDIZATION_MAX_REQUEUES:
+                            raise
+                        requeued += 1
+                        await asyncio.sleep(e.retry_after or settings.LLM_RETRY_BASE_DELAY * (2 ** attempt))
+            
+            async def standardize_key(key: tuple) -> Optional[Dict]:
+                exam_name, modality = pending[key]["input"]
+                return await with_requeue(lambda: self._standardize_cached(exam_name, modality, mode=mode))
+            
+            async def standardize_batch(batch: List[tuple]) -> Dict[tuple, Optional[Dict]]:
+                items = [(key, *pending[key]["input"]) for key in batch]
+                results, fallbacks = await with_requeue(lambda: self._standardize_batch(items, mode=mode))
+                batch_stats["llm_batches"] += 1
+                batch_stats["batch_fallbacks"] += fallbacks
+                return results
+            
+            def on_key_done(key: tuple, result: Optional[Dict], error: Optional[BaseException]):
+                nonlocal correction_keys
+                if error is not None:
+                    logger.error(f"Error processing exam '{key[0]}': {error}")
+                    result = None
+                
+                if result is None:
+                    outcome = (None, "failed", None)
+                else:
+                    # Result is a dict with {result, status, source}
+                    result_data = result.get("result")
+                    outcome = (
+                        json.dumps(result_data, ensure_ascii=False) if result_data is not None else None,
+                        result.get("status", "success"),
+                        result.get("source", "llm")
+                    )
+                resolved[key] = outcome
+                if outcome[2] == "correction":
+                    correction_keys += 1
+                write_rows(pending.pop(key)["rows"], outcome)
+            
+            # Sliding window: a slot is refilled as soon as any request finishes
+            scheduler = SlidingWindowScheduler(concurrency)
+            if batch_size > 1:
+                # Cache / dictionary hits need no prompt; the rest go K names per prompt
+                async def llm_keys():
+                    async for key in distinct_keys():
+                        hit = await self._resolve_without_llm(*pending[key]["input"])
+                        if hit:
+                            on_key_done(key, hit, None)
                         else:
-                            # Result is a dict with {result, status}
-                            result_data = result.get("result")
-                            status = result.get("status", "success")
-                            
-                            if status == "success":
-                                task.success_count += 1
-                            elif status == "review_required":
-                                # Treat as success for counting? Or separate? 
-                                # For now count as success (processed) but status differs
-                                task.success_count += 1
-                            else:
-                                task.failed_count += 1
-                            
-                        results_list.append({
-                            "original_name": exam_name,
-                            "modality": modality,
-                            "standardized": result_data,
-                            "status": status
-                        })
-                        
-                        task.processed_records += 1
-                        
-                    # Periodic commit after each batch
-                    db.commit()
-                    
-                except Exception as e:
-                    logger.error(f"Batch processing error at index {i}: {e}")
-                    # If batch fails catastrophically, we might lose some progress updates, 
-                    # but we try to continue or just log.
-                    # Ideally we should shouldn't hit this with return_exceptions=True
+                            yield key
+                
+                def on_batch_done(batch: List[tuple], results: Optional[Dict], error: Optional[BaseException]):
+                    for key in batch:
+                        on_key_done(key, (results or {}).get(key), error)
+                
+                await scheduler.run(self._batch_by_modality(llm_keys(), batch_size), standardize_batch, on_batch_done)
+            else:
+                await scheduler.run(distinct_keys(), standardize_key, on_key_done)
+            flush_rows()
+            db.commit()
+            
+            dedup_stats = self._dedup_stats(rows_to_standardize, len(resolved))
+            logger.info(f"Task {task_id}: {dedup_stats['distinct_keys']} distinct exam names "
+                        f"for {dedup_stats['rows_to_standardize']} rows")
             
-            # Final update
+            # Final update; a completed task cannot be resumed, so its spooled upload goes
+            task.total_records = max(task.total_records or 0, task.processed_records)
             task.status = "completed"
             task.completed_at = datetime.utcnow()
-            task.results = json.dumps(results_list, ensure_ascii=False)
+            spooled_upload, task.file_path = task.file_path, None
+            task.stats = json.dumps({
+                **dedup_stats,
+                **self._source_stats(source_counts, dedup_stats["rows_to_standardize"]),
+                **(batch_stats if batch_size > 1 else {}),
+                "batch_size": batch_size,
+                "mode": mode,
+                "llm_requeued": requeued,
+                "split_names": split_keys,
+                "correction_keys": correction_keys,
+                "llm_calls_saved": self._llm_calls_saved(correction_keys, mode, batch_size),
+                "resumed_rows": checkpoint["rows"]
+            }, ensure_ascii=False)
             db.commit()
+            if spooled_upload:
+                file_storage.delete_file(spooled_upload)
+            publish_progress(force=True)
             
-            logger.info(f"Task {task_id} completed: {task.success_count} success, {task.failed_count} failed")
+            logger.info(f"Task {task_id} completed: {task.success_count} success, {task.failed_count} failed, "
+                        f"sources: {source_counts}")
             
-            # Sync to KAG
+            # Graph sync runs on the task queue with its own progress and retries
             try:
-                await self.sync_task_to_kag(task_id, results_list)
+                self.schedule_kag_sync(task_id)
             except Exception as e:
-                logger.error(f"Failed to sync task {task_id} to KAG: {e}")
+                logger.error(f"Failed to schedule graph sync of task {task_id}: {e}")
             
         except Exception as e:
             logger.error(f"Task {task_id} failed: {e}")
@@ -291,55 +641,890 @@ class ExaminationStandardizationService:
                 task.status = "failed"
                 task.error_message = str(e)
                 db.commit()
+                task_events.publish(task_id, "progress", {
+                    **self._progress_event(task, 0, 0), "error_message": task.error_message
+                })
+        finally:
+            self._running.discard(task_id)
+            task_events.close(task_id)
+            db.close()
+
+    async def estimate_upload(self, file: UploadFile, options: Optional[Dict] = None) -> Dict[str, Any]:
+        """Dry run of an upload: spooled to a temp file, estimated, then removed."""
+        suffix = os.path.splitext(file.filename or "")[1]
+        spool = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+        try:
+            with spool:
+                await asyncio.to_thread(shutil.copyfileobj, file.file, spool)
+            return await self.estimate_file(spool.name, file.filename, options)
+        finally:
+            os.remove(spool.name)
+
+    async def estimate_file(self, source: FileSource, filename: str, options: Optional[Dict] = None,
+                            tenant_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Dry run of `process_file`: streams the file through dedup, splitting,
+        the result cache and the dictionary matcher, then projects the LLM
+        calls, prompt / completion tokens and wall time of the rest. The LLM
+        is never called and nothing is stored.
+        
+        Stage 2 prompts depend on the stage 1 answer; they are sized for the
+        level-1 parts the dictionary recognizes in the name (the widest
+        level-1 part if none). Batch answers are assumed to parse, so
+        single-mode fallbacks are not counted.
+        """
+        options = options or {}
+        batch_size = max(1, int(options.get("batch_size") or settings.STANDARDIZATION_BATCH_SIZE))
+        mode = options.get("mode") or settings.STANDARDIZATION_MODE
+        if mode not in STANDARDIZATION_MODES:
+            mode = MODE_TWO_STAGE
+        
+        rows = skipped = split_keys = 0
+        key_sources: Dict[tuple, str] = {}
+        source_counts: Dict[str, int] = {}
+        llm_inputs: Dict[tuple, tuple] = {}  # name / fragment key -> (name, modality)
+        async for _, record in aiter_records(source, filename):
+            exam_name = record.get("检查项目名", record.get("exam_name", ""))
+            modality = record.get("检查标准模态", record.get("modality", ""))
+            if not self._has_value(exam_name):
+                skipped += 1
+                continue
+            
+            rows += 1
+            key = self._dedup_key(exam_name, modality)
+            if key not in key_sources:
+                exam_name, modality = self._cell(exam_name), self._cell(modality) or ""
+                hit = await self._resolve_without_llm(exam_name, modality, record=False)
+                key_sources[key] = hit.get("source", "llm") if hit else "llm"
+                split_keys += is_compound(exam_name)
+                if not hit:
+                    for fragment in split_exam_name(exam_name):
+                        fragment_key = self._dedup_key(fragment, modality)
+                        if fragment_key not in llm_inputs and not await self._resolve_without_llm(
+                                fragment, modality, record=False):
+                            llm_inputs[fragment_key] = (fragment, modality)
+            source_name = key_sources[key]
+            source_counts[source_name] = source_counts.get(source_name, 0) + 1
+        
+        counter = await get_token_counter(llm_service.get_model_name())
+        estimate = await self._estimate_llm_work(llm_inputs, mode, batch_size, counter)
+        latency = llm_service.limiter.latency_ewma or settings.STANDARDIZATION_ESTIMATE_CALL_LATENCY
+        concurrency = self._resolve_concurrency(tenant_id)
+        
+        return {
+            "rows": rows,
+            "skipped_rows": skipped,
+            **self._dedup_stats(rows, len(key_sources)),
+            **self._source_stats(source_counts, rows),
+            "split_names": split_keys,
+            "llm_inputs": len(llm_inputs),
+            "batch_size": batch_size,
+            "mode": mode,
+            "tokenizer": counter.name,
+            "latency_source": "observed" if llm_service.limiter.latency_ewma else "configured",
+            **estimate.projection(latency, concurrency, int(llm_service.limiter.limit))
+        }
+
+    def is_running(self, task_id: str) -> bool:
+        """Whether this process is currently standardizing the task."""
+        return task_id in self._running
+
+    def check_resumable(self, task_id: str, reserve: bool = False) -> Optional[str]:
+        """
+        Reason why a task cannot be resumed, or None if it can.
+        
+        With `reserve`, a resumable task is marked running before returning,
+        so a second resume (or the startup sweep) racing this one is refused;
+        pass `reserved=True` to `resume_task` afterwards.
+        """
+        db = SessionLocal()
+        try:
+            task = db.query(StandardizationTask).filter(StandardizationTask.id == task_id).first()
+            if not task:
+                return "Task not found"
+            if self.is_running(task_id):
+                return "Task is already running"
+            if task.status == "completed":
+                return "Task is already completed"
+            if not task.file_path or not file_storage.get_file_path(task.file_path):
+                return "Uploaded file is no longer available"
+            if reserve:
+                # No await between the check and the reservation: atomic on the event loop
+                self._running.add(task_id)
+            return None
+        finally:
+            db.close()
+
+    async def resume_task(self, task_id: str, reserved: bool = False) -> bool:
+        """
+        Re-dispatch the rows of an interrupted or failed task that have no stored result.
+        
+        Args:
+            reserved: The caller already reserved the task with `check_resumable(task_id, reserve=True)`
+        """
+        if not reserved:
+            reason = self.check_resumable(task_id, reserve=True)
+            if reason:
+                logger.warning(f"Task {task_id} not resumed: {reason}")
+                return False
+        
+        db = SessionLocal()
+        try:
+            task = db.query(StandardizationTask).filter(StandardizationTask.id == task_id).first()
+            task.status = "processing"
+            task.error_message = None
+            file_path, filename = task.file_path, task.filename
+            db.commit()
+        except BaseException:
+            self._running.discard(task_id)
+            raise
         finally:
             db.close()
+        
+        await self.process_file(task_id, file_path, filename)
+        return True
 
-    async def sync_task_to_kag(self, task_id: str, results: List[Dict]):
-        """Sync standardized results to KAG/OpenSPG."""
-        from app.services.graph_service import graph_service
-        from app.services.schema_service import schema_service
+    def recover_interrupted_tasks(self) -> Dict[str, int]:
+        """
+        Startup sweep: tasks left in "processing" by a previous process are
+        orphans. Resume them on `resume_queue` (STANDARDIZATION_RESUME_WORKERS
+        at a time) when their upload is still on disk and
+        STANDARDIZATION_RESUME_ON_STARTUP is set, otherwise fail them.
+        """
+        from app.core.task_queue import resume_queue
         
-        # Ensure schema exists
-        await schema_service.ensure_standardization_schema()
+        db = SessionLocal()
+        try:
+            orphans = db.query(StandardizationTask).filter(StandardizationTask.status == "processing").all()
+            task_ids = [task.id for task in orphans if task.id not in self._running]
+        finally:
+            db.close()
         
-        for item in results:
-            if item.get("status") != "success":
+        summary = {"resumed": 0, "failed": 0}
+        for task_id in task_ids:
+            resume = settings.STANDARDIZATION_RESUME_ON_STARTUP
+            reason = self.check_resumable(task_id, reserve=resume)
+            if resume and reason is None:
+                resume_queue.submit("resume_standardization", self.resume_task, task_id, reserved=True)
+                summary["resumed"] += 1
                 continue
-                
-            original = item.get("original_name")
-            modality = item.get("modality")
-            std_res = json.dumps(item.get("standardized"), ensure_ascii=False)
-            
-            # ID Strategy: Hash of original name + modality to allow lookups
-            # Or just use original name if unique enough. Let's use MD5.
-            import hashlib
-            node_id = hashlib.md5(f"{original}_{modality}".encode()).hexdigest()
-            
-            node_def = {
-                "type": "StdTerm",
-                "id": node_id,
-                "properties": {
-                    "original_name": original,
-                    "modality": modality or "",
-                    "standard_json": std_res,
-                    "status": "active"
-                }
-            }
             
-            await graph_service.add_node(node_def)
+            db = SessionLocal()
+            try:
+                task = db.query(StandardizationTask).filter(StandardizationTask.id == task_id).first()
+                task.status = "failed"
+                task.error_message = f"Interrupted by server restart ({reason or 'resume on startup disabled'})"
+                db.commit()
+                summary["failed"] += 1
+            finally:
+                db.close()
         
-        logger.info(f"Synced task {task_id} results to KAG.")
+        if task_ids:
+            logger.info(f"Interrupted standardization tasks: {summary}")
+        return summary
 
-    async def _standardize_single(self, exam_name: str, modality: str) -> Optional[Dict]:
+    async def standardize_one(self, exam_name: str, modality: str = "", deadline: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Standardize a single exam name interactively.
+        
+        Cache and dictionary answers (both in memory once warm) return at once.
+        Otherwise the LLM path of the batch pipeline runs, writing into the
+        same result cache, for at most `deadline` seconds
+        (STANDARDIZATION_SYNC_DEADLINE by default). Past the deadline the call
+        keeps running in the background and a "pending" ticket is returned;
+        poll it with `get_ticket`. Tickets exist only for such deferred jobs
+        and stay readable for STANDARDIZATION_TICKET_TTL seconds after the job
+        finishes. Concurrent requests for the same name share one LLM job.
+        """
+        hit = await self._resolve_without_llm(exam_name, modality)
+        if hit:
+            return self._single_item_response(hit)
+        
+        self._prune_tickets()
+        key = self._dedup_key(exam_name, modality)
+        job = self._jobs_by_key.get(key)
+        if job is None:
+            job = asyncio.create_task(self._standardize_cached(exam_name, modality))
+            
+            def finish(done: asyncio.Task):
+                self._jobs_by_key.pop(key, None)
+                ticket_id = self._ticket_by_key.pop(key, None)
+                if ticket_id in self._tickets:
+                    # Finished tickets stay readable for the TTL from now
+                    self._tickets[ticket_id]["expires"] = time.monotonic() + settings.STANDARDIZATION_TICKET_TTL
+                if not done.cancelled() and done.exception():
+                    logger.warning(f"Interactive standardization of '{exam_name}' failed: {done.exception()}")
+            
+            job.add_done_callback(finish)
+            self._jobs_by_key[key] = job
+        
+        if deadline is None:
+            deadline = settings.STANDARDIZATION_SYNC_DEADLINE
+        try:
+            await asyncio.wait_for(asyncio.shield(job), timeout=deadline)
+        except asyncio.TimeoutError:
+            if not job.done():
+                return {"status": "pending", "ticket": self._ticket_for(key, job)}
+        except Exception:
+            pass  # reported by _job_outcome
+        return self._job_outcome(job)
+
+    def get_ticket(self, ticket_id: str) -> Optional[Dict[str, Any]]:
+        """Outcome of a `standardize_one` ticket; None if unknown or expired."""
+        ticket = self._tickets.get(ticket_id)
+        if ticket is None:
+            return None
+        if not ticket["job"].done():
+            return {"status": "pending", "ticket": ticket_id}
+        return self._job_outcome(ticket["job"])
+
+    def _ticket_for(self, key: tuple, job: asyncio.Task) -> str:
+        """Ticket of a job past its deadline; requests sharing the job share the ticket."""
+        ticket_id = self._ticket_by_key.get(key)
+        if ticket_id is None:
+            ticket_id = str(uuid.uuid4())
+            self._tickets[ticket_id] = {"job": job, "expires": None}  # set when the job finishes
+            self._ticket_by_key[key] = ticket_id
+        return ticket_id
+
+    def _job_outcome(self, job: asyncio.Task) -> Dict[str, Any]:
+        if job.cancelled():
+            return {"status": "failed", "standardized": None, "source": None, "error": "cancelled"}
+        if job.exception() is not None:
+            error = job.exception()
+            if isinstance(error, LLMOverloadedError):
+                raise error
+            return {"status": "failed", "standardized": None, "source": None, "error": str(error)}
+        return self._single_item_response(job.result())
+
+    def _prune_tickets(self):
+        now = time.monotonic()
+        expired = [tid for tid, ticket in self._tickets.items()
+                   if ticket["expires"] is not None and ticket["expires"] < now]
+        for ticket_id in expired:
+            del self._tickets[ticket_id]
+
+    @staticmethod
+    def _single_item_response(result: Optional[Dict]) -> Dict[str, Any]:
+        if not result:
+            return {"status": "failed", "standardized": None, "source": None}
+        return {
+            "status": result.get("status", "success"),
+            "standardized": result.get("result"),
+            "source": result.get("source")
+        }
+
+    def schedule_kag_sync(self, task_id: str) -> str:
+        """Queue the StdTerm graph sync of a task; returns the queue job id."""
+        from app.core.task_queue import task_queue
+        
+        self._save_kag_sync(task_id, {"status": "pending"})
+        return task_queue.submit("std_term_sync", self.sync_task_to_kag, task_id)
+
+    async def sync_task_to_kag(self, task_id: str) -> Dict[str, Any]:
+        """
+        Sync successful results to the graph as StdTerm nodes.
+        
+        Rows are de-duplicated on the node id, sent in STD_TERM_SYNC_BATCH_SIZE
+        UNWIND MERGE batches and each batch is retried with backoff. Progress
+        is stored on the task (`kag_sync`) after every batch.
+        """
+        progress = {"status": "running", "rows": 0, "terms": 0, "written": 0, "unchanged": 0,
+                    "batches": 0, "retries": 0, "error": None}
+        self._save_kag_sync(task_id, progress)
+        
+        seen = set()
+        batch: List[Dict[str, Any]] = []
+        try:
+            for item in self.iter_task_results(task_id, status="success"):
+                progress["rows"] += 1
+                term = std_term_writer.build_term(item)
+                if term["id"] in seen:
+                    continue
+                seen.add(term["id"])
+                batch.append(term)
+                if len(batch) >= settings.STD_TERM_SYNC_BATCH_SIZE:
+                    await self._write_terms(batch, progress)
+                    self._save_kag_sync(task_id, progress)
+                    batch = []
+            if batch:
+                await self._write_terms(batch, progress)
+            progress["status"] = "completed"
+            logger.info(f"Synced task {task_id} to the graph: {progress['written']} written, "
+                        f"{progress['unchanged']} unchanged StdTerm nodes")
+        except Exception as e:
+            progress["status"] = "failed"
+            progress["error"] = str(e)
+            logger.error(f"StdTerm sync of task {task_id} failed: {e}")
+        self._save_kag_sync(task_id, progress)
+        return progress
+
+    async def _write_terms(self, terms: List[Dict[str, Any]], progress: Dict[str, Any]):
+        """Write one StdTerm batch, retrying with exponential backoff."""
+        for attempt in range(settings.STD_TERM_SYNC_MAX_RETRIES + 1):
+            try:
+                counts = await std_term_writer.write_batch(terms)
+                break
+            except Exception as e:
+                if attempt == settings.STD_TERM_SYNC_MAX_RETRIES:
+                    raise
+                progress["retries"] += 1
+                logger.warning(f"StdTerm batch of {len(terms)} failed ({e}), retrying")
+                await asyncio.sleep(settings.STD_TERM_SYNC_RETRY_BASE_DELAY * (2 ** attempt))
+        progress["terms"] += len(terms)
+        progress["written"] += counts["written"]
+        progress["unchanged"] += counts["unchanged"]
+        progress["batches"] += 1
+
+    def _save_kag_sync(self, task_id: str, progress: Dict[str, Any]):
+        db = SessionLocal()
+        try:
+            task = db.query(StandardizationTask).filter(StandardizationTask.id == task_id).first()
+            if task:
+                task.kag_sync = json.dumps({**progress, "updated_at": datetime.utcnow().isoformat()},
+                                           ensure_ascii=False)
+                db.commit()
+        finally:
+            db.close()
+
+    async def _standardize_cached(self, exam_name: str, modality: str, mode: str = MODE_TWO_STAGE) -> Optional[Dict]:
+        """
+        Standardize with the persistent result cache in front of `_standardize_single`.
+        LLM results are written back; dictionary hits are cheap and not cached.
+        Compound names are standardized (and cached) per fragment and merged;
+        a cache entry for the whole name, e.g. a manual correction, still wins.
+        """
+        snapshot = await self.kg.get_snapshot()
+        cached = await self.result_cache.get(exam_name, modality, snapshot.version)
+        if cached:
+            return cached
+        
+        if is_compound(exam_name):
+            fragments = await asyncio.gather(*(
+                self._standardize_cached(fragment, modality, mode=mode) for fragment in split_exam_name(exam_name)
+            ))
+            return self._merge_fragments(fragments)
+        
+        result = await self._standardize_single(exam_name, modality, mode=mode)
+        if result and result.get("source") == "llm" and result.get("result"):
+            await self.result_cache.put(
+                exam_name, modality, snapshot.version,
+                result["result"], result.get("status", "success")
+            )
+        return result
+
+    async def _resolve_without_llm(self, exam_name: str, modality: str, record: bool = True) -> Optional[Dict]:
+        """
+        Result cache, then dictionary matcher; None if only the LLM can answer.
+        `record=False` (estimates) leaves cache and correction metrics untouched.
+        """
+        snapshot = await self.kg.get_snapshot()
+        cached = await self.result_cache.get(exam_name, modality, snapshot.version, record=record)
+        if cached:
+            return cached
+        
+        if is_compound(exam_name):
+            fragments = []
+            for fragment in split_exam_name(exam_name):
+                hit = await self._resolve_without_llm(fragment, modality, record)
+                if hit is None:
+                    return None
+                fragments.append(hit)
+            return self._merge_fragments(fragments)
+        
+        matched = self._get_matcher(snapshot).match(exam_name, modality)
+        if matched:
+            return {"result": matched, "status": "success", "source": "dictionary"}
+        return self._match_correction(exam_name, modality, snapshot, record)
+
+    async def _standardize_batch(self, items: List[tuple], mode: str = MODE_TWO_STAGE) -> tuple:
+        """
+        Batch-mode entry: compound names are split first; their fragments are
+        resolved from the cache / dictionary where possible, otherwise batched
+        like any other name (deduplicated within the batch), then merged back
+        per item.
+        
+        Args:
+            items: (key, exam_name, modality) tuples
+            mode: MODE_TWO_STAGE or MODE_SINGLE_PASS
+            
+        Returns:
+            ({key: result}, number of names that fell back to single mode)
+        """
+        fragments_of: Dict[Any, List[tuple]] = {}
+        resolved: Dict[tuple, Optional[Dict]] = {}
+        to_llm: Dict[tuple, tuple] = {}
+        for key, exam_name, modality in items:
+            if not is_compound(exam_name):
+                fragments_of[key] = [key]
+                to_llm[key] = (key, exam_name, modality)
+                continue
+            fragments_of[key] = []
+            for fragment in split_exam_name(exam_name):
+                fragment_key = self._dedup_key(fragment, modality)
+                fragments_of[key].append(fragment_key)
+                if fragment_key in resolved or fragment_key in to_llm:
+                    continue
+                hit = await self._resolve_without_llm(fragment, modality)
+                if hit:
+                    resolved[fragment_key] = hit
+                else:
+                    to_llm[fragment_key] = (fragment_key, fragment, modality)
+        
+        fallbacks = 0
+        if to_llm:
+            results, fallbacks = await self._standardize_name_batch(list(to_llm.values()), mode=mode)
+            resolved.update(results)
+        return {
+            key: self._merge_fragments([resolved.get(fragment_key) for fragment_key in fragment_keys])
+            for key, fragment_keys in fragments_of.items()
+        }, fallbacks
+
+    async def _standardize_name_batch(self, items: List[tuple], mode: str = MODE_TWO_STAGE) -> tuple:
+        """
+        Standardize several exam names with shared prompts (batch mode).
+        
+        Stage 1 asks for the level-1 parts of every item in one prompt; stage 2
+        sends one prompt per (level-1 parts, modality) group. In single-pass
+        mode stage 1 is skipped and each batch gets one ontology-tree prompt.
+        Items missing from or unparseable in a batch answer fall back to
+        `_standardize_cached`.
+        
+        Args:
+            items: (key, exam_name, modality) tuples
+            mode: MODE_TWO_STAGE or MODE_SINGLE_PASS
+            
+        Returns:
+            ({key: result}, number of items that fell back to single mode)
+        """
+        snapshot = await self.kg.get_snapshot()
+        level1_parts = list(snapshot.level1_parts)
+        rows = {str(index + 1): item for index, item in enumerate(items)}
+        results: Dict[Any, Optional[Dict]] = {}
+        fallback: List[str] = []
+        
+        groups: Dict[tuple, List[str]] = {}
+        if mode == MODE_SINGLE_PASS:
+            # Batches never mix modalities, so the whole batch shares one tree prompt
+            groups[((), normalize_modality_key(items[0][2]) if items else "")] = list(rows)
+        else:
+            # --- Stage 1: level-1 parts for all items ---
+            try:
+                prompt1 = self._build_level1_batch_prompt(
+                    [(row_id, name) for row_id, (_, name, _) in rows.items()], level1_parts
+                )
+                answers = self._parse_batch_response(
+                    await self._call_llm(prompt1, max_tokens=self._batch_max_tokens(len(rows), 40),
+                                         site="examination.batch_level1", json_mode=True)
+                )
+            except LLMOverloadedError:
+                raise
+            except Exception as e:
+                logger.warning(f"Batch stage 1 failed for {len(rows)} items: {e}")
+                answers = {}
+            
+            for row_id, (_, _, modality) in rows.items():
+                value = answers.get(row_id)
+                text = ",".join(str(v) for v in value) if isinstance(value, list) else str(value or "")
+                identified = self._parse_level1_response(text, level1_parts)
+                if not identified:
+                    fallback.append(row_id)
+                    continue
+                groups.setdefault((tuple(sorted(identified)), normalize_modality_key(modality)), []).append(row_id)
+        
+        # --- Stage 2: one prompt per shared (level-1, modality) group ---
+        async def run_group(level1_list: List[str], row_ids: List[str]):
+            modality = rows[row_ids[0]][2]
+            batch_items = [(row_id, rows[row_id][1]) for row_id in row_ids]
+            try:
+                if mode == MODE_SINGLE_PASS:
+                    prompt2 = self._build_single_pass_batch_prompt(batch_items, modality, snapshot)
+                else:
+                    level2_candidates = sorted({l2 for l1 in level1_list for l2 in snapshot.get_level2_parts(l1)})
+                    prompt2 = await self._build_detailed_batch_prompt(
+                        batch_items, modality, level1_list, level2_candidates
+                    )
+                parsed = self._parse_batch_response(
+                    await self._call_llm(prompt2, max_tokens=self._batch_max_tokens(len(row_ids), 120),
+                                         site="examination.batch_single_pass" if mode == MODE_SINGLE_PASS
+                                         else "examination.batch_detail", json_mode=True)
+                )
+            except LLMOverloadedError:
+                raise
+            except Exception as e:
+                logger.warning(f"Batch stage 2 failed for {len(row_ids)} items: {e}")
+                parsed = {}
+            
+            for row_id in row_ids:
+                key, exam_name, modality = rows[row_id]
+                triples = self._coerce_triples(parsed.get(row_id))
+                if not triples:
+                    fallback.append(row_id)
+                    continue
+                status = "success" if await self._validate_against_kg(triples) else "review_required"
+                results[key] = {"result": triples, "status": status, "source": "llm"}
+                await self.result_cache.put(exam_name, modality, snapshot.version, triples, status)
+        
+        await asyncio.gather(*(run_group(list(level1), row_ids) for (level1, _), row_ids in groups.items()))
+        
+        # --- Fallback: single-item mode ---
+        if fallback:
+            logger.info(f"Batch fallback to single mode for {len(fallback)}/{len(rows)} items")
+            singles = await asyncio.gather(*(
+                self._standardize_cached(rows[row_id][1], rows[row_id][2], mode=mode) for row_id in fallback
+            ))
+            for row_id, result in zip(fallback, singles):
+                results[rows[row_id][0]] = result
+        
+        return results, len(fallback)
+
+    async def _estimate_llm_work(self, inputs: Dict[tuple, tuple], mode: str, batch_size: int,
+                                 counter: TokenCounter) -> CostEstimate:
+        """
+        Build (but do not send) the prompts `inputs` would need and count their
+        tokens. Prompts are sized as a per-template count plus the per-item
+        text, so each template is tokenized once.
+        """
+        snapshot = await self.kg.get_snapshot()
+        level1_parts = list(snapshot.level1_parts)
+        templates: Dict[tuple, int] = {}
+        estimate = CostEstimate()
+        
+        async def template_tokens(signature: tuple, build) -> int:
+            if signature not in templates:
+                prompt = build()
+                templates[signature] = counter.count(await prompt if asyncio.iscoroutine(prompt) else prompt)
+            return templates[signature]
+        
+        def answer_tokens(answer: Any) -> int:
+            return counter.count(answer if isinstance(answer, str) else json.dumps(answer, ensure_ascii=False))
+        
+        def level2_candidates(level1_list: List[str]) -> List[str]:
+            return sorted({l2 for l1 in level1_list for l2 in snapshot.get_level2_parts(l1)})
+        
+        if batch_size == 1:
+            for exam_name, modality in inputs.values():
+                level1_list, triples = self._guess_answer(exam_name, snapshot)
+                name_tokens = counter.count(exam_name)
+                if mode == MODE_SINGLE_PASS:
+                    template = await template_tokens(
+                        ("single_pass", normalize_modality_key(modality)),
+                        lambda: self._build_single_pass_prompt("", modality, snapshot)
+                    )
+                    estimate.add_call(template + name_tokens, answer_tokens(triples))
+                    estimate.rounds += 1
+                    continue
+                template = await template_tokens(("level1",), lambda: self._build_level1_prompt("", level1_parts))
+                estimate.add_call(template + name_tokens, answer_tokens(", ".join(level1_list)))
+                template = await template_tokens(
+                    ("detailed", modality, tuple(level1_list)),
+                    lambda: self._build_detailed_prompt("", modality, level1_list, level2_candidates(level1_list))
+                )
+                estimate.add_call(template + name_tokens, answer_tokens(triples))
+                estimate.rounds += 2
+            return estimate
+        
+        async def keys():
+            for key in inputs:
+                yield key
+        
+        async for batch in self._batch_by_modality(keys(), batch_size):
+            modality = inputs[batch[0]][1]
+            items = [(str(index + 1), inputs[key][0]) for index, key in enumerate(batch)]
+            guesses = {row_id: self._guess_answer(name, snapshot) for row_id, name in items}
+            line_tokens = {row_id: counter.count(f'"{row_id}": {name}\n') for row_id, name in items}
+            
+            if mode == MODE_SINGLE_PASS:
+                template = await template_tokens(
+                    ("single_pass_batch", modality),
+                    lambda: self._build_single_pass_batch_prompt([], modality, snapshot)
+                )
+                estimate.add_call(template + sum(line_tokens.values()),
+                                  answer_tokens({row_id: guess[1] for row_id, guess in guesses.items()}))
+                estimate.rounds += 1
+                continue
+            
+            template = await template_tokens(("level1_batch",), lambda: self._build_level1_batch_prompt([], level1_parts))
+            estimate.add_call(template + sum(line_tokens.values()),
+                              answer_tokens({row_id: guess[0] for row_id, guess in guesses.items()}))
+            groups: Dict[tuple, List[str]] = {}
+            for row_id, (level1_list, _) in guesses.items():
+                groups.setdefault(tuple(sorted(level1_list)), []).append(row_id)
+            for level1_list, row_ids in groups.items():
+                template = await template_tokens(
+                    ("detailed_batch", modality, level1_list),
+                    lambda: self._build_detailed_batch_prompt(
+                        [], modality, list(level1_list), level2_candidates(list(level1_list))
+                    )
+                )
+                estimate.add_call(template + sum(line_tokens[row_id] for row_id in row_ids),
+                                  answer_tokens({row_id: guesses[row_id][1] for row_id in row_ids}))
+            estimate.rounds += 2
+        return estimate
+
+    def _guess_answer(self, exam_name: str, snapshot) -> tuple:
+        """
+        Likely (level-1 parts, triples) answer for a name, for sizing dry-run
+        prompts and completions: the parts the dictionary recognizes, one
+        triple each; the widest level-1 part if nothing is recognized.
+        """
+        parts, _ = self._ontology_terms(exam_name, snapshot)
+        triples = [
+            [snapshot.find_level1_by_level2(part), part, (snapshot.get_methods_for_part(part) or [""])[0]]
+            for part in parts
+        ]
+        level1_list = list(dict.fromkeys(triple[0] for triple in triples))
+        if not level1_list and snapshot.level1_parts:
+            widest = max(snapshot.level1_parts, key=lambda l1: len(snapshot.get_level2_parts(l1)))
+            level1_list = [widest]
+            level2 = snapshot.get_level2_parts(widest)
+            part = level2[0] if level2 else ""
+            triples = [[widest, part, (snapshot.get_methods_for_part(part) or [""])[0]]]
+        return level1_list, triples
+
+    def _ontology_terms(self, exam_name: str, snapshot) -> tuple:
+        """Level-2 parts and methods the dictionary recognizes in a name, in order."""
+        automaton = self._get_matcher(snapshot).automaton
+        parts: List[str] = []
+        methods: List[str] = []
+        for _, _, pattern in automaton.find_longest(str(exam_name).upper()):
+            kind, payload = automaton.payloads[pattern]
+            if kind == "part" and payload not in parts:
+                parts.append(payload)
+            elif kind == "method":
+                methods.extend(method for method in payload if method not in methods)
+        return parts, methods
+
+    def _match_correction(self, exam_name: str, modality: str, snapshot, record: bool = True) -> Optional[Dict]:
+        """
+        Reuse the nearest reviewer correction of a close variant of the name.
+        A candidate must name the same ontology parts and methods (so 腕关节正位
+        never borrows 腕关节侧位's correction) and its triples must still exist
+        in the ontology.
+        """
+        matches = self.correction_memory.nearest(
+            exam_name, modality, settings.STANDARDIZATION_CORRECTION_SIMILARITY, record=record
+        )
+        if not matches:
+            return None
+        
+        terms = self._ontology_terms(exam_name, snapshot)
+        for match in matches:
+            if self._ontology_terms(match["name"], snapshot) != terms:
+                continue
+            if not all(len(triple) == 3 and snapshot.has_path(*triple) for triple in match["triples"]):
+                continue
+            if record:
+                self.correction_memory.record_hit()
+            return {
+                "result": match["triples"],
+                "status": match["status"],
+                "source": "correction",
+                "matched_name": match["name"],
+                "similarity": match["similarity"]
+            }
+        return None
+
+    @staticmethod
+    def _llm_calls_saved(names: int, mode: str, batch_size: int) -> float:
+        """LLM calls `names` would have cost: 2 per name in two-stage mode, 1 single-pass; shared in batches."""
+        calls = names * (1 if mode == MODE_SINGLE_PASS else 2)
+        return calls if batch_size == 1 else round(calls / batch_size, 1)
+
+    @staticmethod
+    def _merge_fragments(results: List[Optional[Dict]]) -> Optional[Dict]:
+        """
+        Merge per-fragment results of a compound name into one row result.
+        The row is "success" only if every fragment is; a fragment without an
+        answer leaves the row's partial triples for review.
+        """
+        if len(results) == 1:
+            return results[0]
+        answered = [result for result in results if result and result.get("result")]
+        if not answered:
+            return None
+        
+        triples = list(dict.fromkeys(tuple(triple) for result in answered for triple in result["result"]))
+        complete = len(answered) == len(results) and all(r.get("status") == "success" for r in answered)
+        sources = {result.get("source") for result in answered}
+        return {
+            "result": [list(triple) for triple in triples],
+            "status": "success" if complete else "review_required",
+            # Most expensive stage that contributed
+            "source": next((s for s in ("llm", "cache", "correction", "dictionary") if s in sources),
+                           answered[0].get("source"))
+        }
+
+    async def _remember_corrections(self, corrections: List[Dict]):
+        """Store corrected rows as manual cache entries and in the correction memory."""
+        snapshot = await self.kg.get_snapshot()
+        for row in corrections:
+            triples = row.get("standardized")
+            if not triples or not isinstance(triples, list):
+                continue
+            status = row.get("status") if row.get("status") in ("success", "review_required") else "success"
+            await self.result_cache.put_manual(
+                row.get("original_name", ""),
+                row.get("modality", ""),
+                snapshot.version,
+                triples,
+                status=status
+            )
+            self.correction_memory.add(row.get("original_name", ""), row.get("modality") or "", triples, status)
+
+    # --- Row-level result storage ---
+
+    @staticmethod
+    def _results_query(db, task_id: str, status: Optional[str] = None):
+        query = db.query(StandardizationResult).filter(StandardizationResult.task_id == task_id)
+        if status:
+            query = query.filter(StandardizationResult.status == status)
+        return query.order_by(StandardizationResult.row_index)
+
+    @classmethod
+    def _stored_rows(cls, db, task_id: str, indexes: set, chunk_size: int = 500) -> Dict[int, StandardizationResult]:
+        """Stored result rows of a task by row_index (missing indexes are left out)."""
+        ordered = sorted(indexes)
+        rows = {}
+        for start in range(0, len(ordered), chunk_size):
+            chunk = ordered[start:start + chunk_size]
+            for row in cls._results_query(db, task_id).filter(StandardizationResult.row_index.in_(chunk)):
+                rows[row.row_index] = row
+        return rows
+
+    @staticmethod
+    def _has_result_rows(db, task_id: str) -> bool:
+        return db.query(StandardizationResult.id).filter(StandardizationResult.task_id == task_id).first() is not None
+
+    @staticmethod
+    def _progress_event(task: StandardizationTask, rows_this_run: int, elapsed: float) -> Dict[str, Any]:
+        """Progress counters plus throughput and ETA of the current run."""
+        rate = rows_this_run / elapsed if elapsed > 0 else 0.0
+        remaining = max((task.total_records or 0) - task.processed_records, 0)
+        return {
+            "task_id": task.id,
+            "status": task.status,
+            "total_records": task.total_records,
+            "processed_records": task.processed_records,
+            "success_count": task.success_count,
+            "failed_count": task.failed_count,
+            "rows_per_second": round(rate, 2),
+            "eta_seconds": round(remaining / rate, 1) if rate > 0 and task.status == "processing" else None
+        }
+
+    @staticmethod
+    def _checkpoint(db, task_id: str) -> Dict[str, Any]:
+        """Counters of the result rows already stored for a task."""
+        checkpoint = {"rows": 0, "success": 0, "failed": 0, "sources": {}, "max_row_index": -1}
+        grouped = db.query(
+            StandardizationResult.status,
+            StandardizationResult.source,
+            func.count(StandardizationResult.id),
+            func.max(StandardizationResult.row_index)
+        ).filter(StandardizationResult.task_id == task_id).group_by(
+            StandardizationResult.status, StandardizationResult.source
+        )
+        for status, source, count, max_row_index in grouped:
+            checkpoint["rows"] += count
+            checkpoint["success" if status in ("success", "review_required") else "failed"] += count
+            if source:
+                checkpoint["sources"][source] = checkpoint["sources"].get(source, 0) + count
+            checkpoint["max_row_index"] = max(checkpoint["max_row_index"], max_row_index)
+        return checkpoint
+
+    @staticmethod
+    def _iter_stored_row_indexes(task_id: str, up_to: int, page_size: int = 10000) -> Iterator[int]:
+        """Ascending row indexes (<= up_to) already stored for a task, paged by keyset."""
+        last_index = -1
+        while last_index < up_to:
+            db = SessionLocal()
+            try:
+                page = [row_index for (row_index,) in db.query(StandardizationResult.row_index).filter(
+                    StandardizationResult.task_id == task_id,
+                    StandardizationResult.row_index > last_index,
+                    StandardizationResult.row_index <= up_to
+                ).order_by(StandardizationResult.row_index).limit(page_size)]
+            finally:
+                db.close()
+            yield from page
+            if len(page) < page_size:
+                return
+            last_index = page[-1]
+
+    @staticmethod
+    def _legacy_results(db, task_id: str, status: Optional[str] = None) -> List[Dict]:
+        """Results of a task stored as a JSON blob on the task row."""
+        task = db.query(StandardizationTask).filter(StandardizationTask.id == task_id).first()
+        rows = json.loads(task.results) if task and task.results else []
+        return [row for row in rows if not status or row.get("status") == status]
+
+    @staticmethod
+    def _result_to_dict(row: StandardizationResult) -> Dict:
+        return {
+            "row_index": row.row_index,
+            "original_name": row.original_name,
+            "modality": row.modality,
+            "standardized": json.loads(row.triples) if row.triples else None,
+            "status": row.status,
+            "source": row.source
+        }
+
+    @staticmethod
+    def _is_correction(before: Dict, after: Dict) -> bool:
+        """A row is corrected if its triples changed, or its status was explicitly changed."""
+        if before.get("standardized") != after.get("standardized"):
+            return True
+        return "status" in after and after.get("status") != before.get("status")
+
+    @staticmethod
+    def _apply_correction(stored: StandardizationResult, standardized: Any, status: Optional[str]) -> StandardizationResult:
+        stored.triples = json.dumps(standardized, ensure_ascii=False) if standardized is not None else None
+        stored.status = status or ("success" if standardized else "failed")
+        stored.source = "manual"
+        return stored
+
+    async def _standardize_single(self, exam_name: str, modality: str, mode: str = MODE_TWO_STAGE) -> Optional[Dict]:
         """
         Standardize a single examination name.
-        Returns dict: { "result": [...], "status": "success" | "review_required" }
+        Returns dict: { "result": [...], "status": "success" | "review_required",
+                        "source": "dictionary" | "correction" | "llm" }
         """
         try:
+            # Ontology lookups below are in-memory snapshot hits, not Cypher queries
+            snapshot = await self.kg.get_snapshot()
+
+            # --- Stage 0: Deterministic dictionary match (no LLM) ---
+            matched = self._get_matcher(snapshot).match(exam_name, modality)
+            if matched:
+                logger.info(f"Dictionary matched: {matched} for '{exam_name}'")
+                return {
+                    "result": matched,
+                    "status": "success",
+                    "source": "dictionary"
+                }
+
+            # --- Stage 0b: Close variant of a reviewer correction (no LLM) ---
+            corrected = self._match_correction(exam_name, modality, snapshot)
+            if corrected:
+                logger.info(f"Correction matched: '{corrected['matched_name']}' for '{exam_name}'")
+                return corrected
+
+            if mode == MODE_SINGLE_PASS:
+                # --- Single pass: whole (modality-filtered) tree in one prompt ---
+                response = await self._call_llm(self._build_single_pass_prompt(exam_name, modality, snapshot),
+                                                site="examination.single_pass")
+                parsed_result = self._parse_llm_response(response)
+                status = "success" if await self._validate_against_kg(parsed_result) else "review_required"
+                return {
+                    "result": parsed_result,
+                    "status": status,
+                    "source": "llm"
+                }
+
             # --- Stage 1: Identify Level 1 Body Part(s) ---
-            level1_parts = await self.kg.get_all_level1_parts()
+            level1_parts = list(snapshot.level1_parts)
             prompt1 = self._build_level1_prompt(exam_name, level1_parts)
-            response1 = await self._call_llm(prompt1)
+            response1 = await self._call_llm(prompt1, site="examination.level1")
             
             # Parse multiple level 1 parts
             identified_level1_list = self._parse_level1_response(response1, level1_parts)
@@ -354,8 +1539,7 @@ class ExaminationStandardizationService:
             # Fetch specific Level 2 parts for ALL identified Level 1s
             all_level2_candidates = []
             for l1 in identified_level1_list:
-                l2_parts = await self.kg.get_level2_parts(l1)
-                all_level2_candidates.extend(l2_parts)
+                all_level2_candidates.extend(snapshot.get_level2_parts(l1))
             
             # Remove duplicates just in case
             all_level2_candidates = list(set(all_level2_candidates))
@@ -367,7 +1551,7 @@ class ExaminationStandardizationService:
                 all_level2_candidates
             )
             
-            response2 = await self._call_llm(prompt2)
+            response2 = await self._call_llm(prompt2, site="examination.detail")
             parsed_result = self._parse_llm_response(response2)
             
             # Validate against KG
@@ -377,13 +1561,113 @@ class ExaminationStandardizationService:
             
             return {
                 "result": parsed_result,
-                "status": status
+                "status": status,
+                "source": "llm"
             }
             
+        except LLMOverloadedError:
+            # Provider is throttling us; let the pipeline requeue the record
+            raise
         except Exception as e:
             logger.error(f"Standardization failed for {exam_name}: {e}")
             return None
+
+    def _get_matcher(self, snapshot) -> DictionaryMatcher:
+        """Dictionary matcher for the current snapshot, rebuilt when the ontology changes."""
+        if self._matcher is None or self._matcher.version != snapshot.version:
+            self._matcher = DictionaryMatcher(snapshot, examination_kg.get_aliases())
+        return self._matcher
+
+    def _resolve_concurrency(self, tenant_id: Optional[str]) -> int:
+        """
+        Requests in flight for a task: the tenant's `standardization_concurrency`
+        (Tenant.config) or the global default, capped by the LLM provider limit.
+        """
+        concurrency = settings.STANDARDIZATION_CONCURRENCY
+        
+        if tenant_id:
+            db = SessionLocal()
+            try:
+                tenant = db.query(Tenant).filter(Tenant.id == tenant_id).first()
+                tenant_config = json.loads(tenant.config) if tenant and tenant.config else {}
+                if tenant_config.get("standardization_concurrency"):
+                    concurrency = int(tenant_config["standardization_concurrency"])
+            except Exception as e:
+                logger.warning(f"Failed to read concurrency for tenant {tenant_id}: {e}")
+            finally:
+                db.close()
+        
+        provider_limit = settings.LLM_PROVIDER_CONCURRENCY.get(llm_service.get_provider_name())
+        if provider_limit:
+            concurrency = min(concurrency, int(provider_limit))
+        
+        return max(1, concurrency)
+
+    @staticmethod
+    def _has_value(value: Any) -> bool:
+        """False for empty cells (None, "", NaN)."""
+        if value is None:
+            return False
+        if isinstance(value, float) and value != value:
+            return False
+        return str(value).strip() != ""
+
+    @classmethod
+    def _cell(cls, value: Any) -> Optional[str]:
+        """Cell value as stored in result rows (None for empty / NaN)."""
+        return str(value) if cls._has_value(value) else None
+
+    @staticmethod
+    def _dedup_key(exam_name: Any, modality: Any) -> tuple:
+        """Row grouping key: normalized (检查项目名, 检查标准模态)."""
+        return (normalize_exam_name(exam_name), normalize_modality_key(modality))
+
+    @staticmethod
+    def _dedup_stats(rows: int, distinct_keys: int) -> Dict[str, Any]:
+        """Intra-file deduplication statistics."""
+        return {
+            "rows_to_standardize": rows,
+            "distinct_keys": distinct_keys,
+            "duplicate_rows": rows - distinct_keys,
+            "dedup_ratio": round(1 - distinct_keys / rows, 4) if rows else 0.0
+        }
+
+    @staticmethod
+    def _source_stats(source_counts: Dict[str, int], total: int) -> Dict[str, Any]:
+        """Per-task counts and hit rates of the cache, dictionary and correction stages."""
+        def rate(count: int) -> float:
+            return round(count / total, 4) if total else 0.0
+        
+        cache_hits = source_counts.get("cache", 0)
+        dictionary_hits = source_counts.get("dictionary", 0)
+        correction_hits = source_counts.get("correction", 0)
+        return {
+            "cache_hits": cache_hits,
+            "cache_hit_rate": rate(cache_hits),
+            "dictionary_hits": dictionary_hits,
+            "dictionary_hit_rate": rate(dictionary_hits),
+            "correction_hits": correction_hits,
+            "correction_hit_rate": rate(correction_hits),
+            "llm_records": source_counts.get("llm", 0)
+        }
     
+    @staticmethod
+    async def _batch_by_modality(keys: AsyncIterator[tuple], batch_size: int) -> AsyncIterator[List[tuple]]:
+        """Group a stream of keys into batches of `batch_size`, never mixing modalities in a batch."""
+        open_batches: Dict[str, List[tuple]] = {}
+        async for key in keys:
+            batch = open_batches.setdefault(key[1], [])
+            batch.append(key)
+            if len(batch) >= batch_size:
+                yield open_batches.pop(key[1])
+        for batch in open_batches.values():
+            yield batch
+
+    @staticmethod
+    def _batch_max_tokens(items: int, per_item: int) -> int:
+        """Completion budget for a batch answer."""
+        return min(4000, 100 + items * per_item)
+
     def _build_level1_prompt(self, exam_name: str, level1_candidates: List[str]) -> str:
         """Build prompt for Stage 1: Level 1 Identification."""
         return f"""你是一个医学专家。请判断以下检查项目属于哪些"一级检查部位"。
@@ -395,6 +1679,23 @@ class ExaminationStandardizationService:
 1. 输出所有匹配的一级部位名称,用逗号分隔。
 2. 如果包含多个部位(如"头胸腹CT"),请输出"头颈部, 胸部, 腹部"。
 3. 如果不确定,输出"Unknown"。
+"""
+
+    def _build_level1_batch_prompt(self, items: List[tuple], level1_candidates: List[str]) -> str:
+        """Build prompt for Stage 1 in batch mode: items are (row_id, exam_name)."""
+        lines = "\n".join(f'"{row_id}": {exam_name}' for row_id, exam_name in items)
+        return f"""你是一个医学专家。请判断以下每个检查项目属于哪些"一级检查部位"。
+
+候选一级部位: {', '.join(level1_candidates)}
+
+输入 (编号: 检查项目):
+{lines}
+
+规则:
+1. 对每个编号输出所有匹配的一级部位名称列表。
+2. 如果包含多个部位(如"头胸腹CT"),输出多个部位。
+3. 如果不确定,输出空列表。
+4. 只输出一个JSON对象,键为编号,例如: {{"1": ["胸部"], "2": ["头部", "颈部"]}}
 """
 
     def _parse_level1_response(self, response: str, candidates: List[str]) -> List[str]:
@@ -410,11 +1711,11 @@ class ExaminationStandardizationService:
         """Build prompt for Stage 2: Detailed Parsing."""
         
         # Get methods relevant to input modality
+        snapshot = await self.kg.get_snapshot()
         if modality:
-            methods = await self.kg.get_methods_by_modality(modality)
+            methods = snapshot.get_methods_by_modality(modality)
         else:
-            methods = await self.kg.get_all_methods()
-            methods = methods[:20] 
+            methods = list(snapshot.all_methods[:20])
         
         level1_str = ", ".join(level1_list)
         
@@ -458,18 +1759,120 @@ class ExaminationStandardizationService:
 """
         return prompt
 
-    async def _call_llm(self, prompt: str) -> str:
-        """Call LLM API."""
-        client = llm_service.get_client()
-        if not client:
+    async def _build_detailed_batch_prompt(self, items: List[tuple], modality: str, level1_list: List[str], level2_candidates: List[str]) -> str:
+        """Build prompt for Stage 2 in batch mode: items are (row_id, exam_name) sharing level-1 parts and modality."""
+        snapshot = await self.kg.get_snapshot()
+        if modality:
+            methods = snapshot.get_methods_by_modality(modality)
+        else:
+            methods = list(snapshot.all_methods[:20])
+        
+        lines = "\n".join(f'"{row_id}": {exam_name}' for row_id, exam_name in items)
+        return f"""你是一个医学影像检查项目标准化专家。请将以下每个非标准的检查项目名称解析为标准三元组格式。
+
+# 已知信息
+涉及的一级部位: {", ".join(level1_list)}
+模态: {modality}
+
+# 候选二级部位 (限制在此范围内)
+{', '.join(level2_candidates)}
+
+# 候选检查方法
+{', '.join(methods)}...
+
+# 示例
+
+输入:
+"1": 单手指正侧位片
+"2": 左手正位
+输出: {{"1": [["上肢", "手指", "正位"], ["上肢", "手指", "侧位"]], "2": [["上肢", "手掌", "正位"]]}}
+
+# 规则
+1. 如果名称中包含"正侧位"、"正斜位"等组合方法,拆分为多个三元组
+2. "双"、"单"、"左"、"右"等修饰词不影响标准化结果
+3. 二级部位必须属于对应的一级部位
+4. 如果无法确定具体部位,选择最可能的部位
+5. 只输出一个JSON对象,键为编号,值为三元组数组,不要其他解释
+
+输入:
+{lines}
+输出:
+"""
+
+    def _ontology_prompt_text(self, modality: str, snapshot) -> str:
+        """Compact ontology tree for the prompt, filtered by modality when it is known."""
+        modality_key = normalize_modality_key(modality)
+        if modality_key in snapshot.methods_by_modality:
+            return snapshot.to_compact_text(modality_key)
+        return snapshot.to_compact_text()
+
+    def _build_single_pass_prompt(self, exam_name: str, modality: str, snapshot) -> str:
+        """Build prompt for single-pass mode: ontology tree + name -> triples in one call."""
+        return f"""你是一个医学影像检查项目标准化专家。请将非标准的检查项目名称解析为标准三元组 [一级部位, 二级部位, 检查方法]。
+
+# 标准本体 (一级部位: 二级部位[检查方法/...])
+{self._ontology_prompt_text(modality, snapshot)}
+
+# 示例
+
+输入: 单手指正侧位片, 模态: DR
+输出: [["上肢", "手指", "正位"], ["上肢", "手指", "侧位"]]
+
+输入: 腰椎正侧位, 模态: DR
+输出: [["脊柱", "腰椎", "正位"], ["脊柱", "腰椎", "侧位"]]
+
+# 规则
+1. 三元组必须是上面本体中存在的路径
+2. 如果名称中包含"正侧位"、"正斜位"等组合方法,拆分为多个三元组
+3. 如果包含多个部位,为每个部位输出三元组
+4. "双"、"单"、"左"、"右"等修饰词不影响标准化结果
+5. 只输出JSON数组,不要其他解释
+
+输入: {exam_name}, 模态: {modality}
+输出:
+"""
+
+    def _build_single_pass_batch_prompt(self, items: List[tuple], modality: str, snapshot) -> str:
+        """Build prompt for single-pass batch mode: items are (row_id, exam_name) sharing one modality."""
+        lines = "\n".join(f'"{row_id}": {exam_name}' for row_id, exam_name in items)
+        return f"""你是一个医学影像检查项目标准化专家。请将以下每个非标准的检查项目名称解析为标准三元组 [一级部位, 二级部位, 检查方法]。
+
+# 标准本体 (一级部位: 二级部位[检查方法/...])
+{self._ontology_prompt_text(modality, snapshot)}
+模态: {modality}
+
+# 示例
+
+输入:
+"1": 单手指正侧位片
+"2": 左手正位
+输出: {{"1": [["上肢", "手指", "正位"], ["上肢", "手指", "侧位"]], "2": [["上肢", "手掌", "正位"]]}}
+
+# 规则
+1. 三元组必须是上面本体中存在的路径
+2. 如果名称中包含"正侧位"、"正斜位"等组合方法,拆分为多个三元组
+3. 如果包含多个部位,为每个部位输出三元组
+4. "双"、"单"、"左"、"右"等修饰词不影响标准化结果
+5. 只输出一个JSON对象,键为编号,值为三元组数组,不要其他解释
+
+输入:
+{lines}
+输出:
+"""
+
+    async def _call_llm(self, prompt: str, max_tokens: int = 500, site: str = "examination",
+                        json_mode: bool = False) -> str:
+        """Call LLM API through the gateway; `site` labels the call in the LLM metrics."""
+        if not llm_service.get_client():
             raise ValueError("LLM client not initialized. Please set OPENAI_API_KEY.")
 
         try:
-            response = await client.chat.completions.create(
-                model=llm_service.get_model_name(),
+            response = await llm_service.chat_completion(
                 messages=[{"role": "user", "content": prompt}],
+                site=site,
+                json_mode=json_mode,
                 temperature=0.1,
-                max_tokens=500
+                max_tokens=max_tokens
             )
             
             return response.choices[0].message.content
@@ -478,19 +1881,24 @@ class ExaminationStandardizationService:
             logger.error(f"LLM call failed: {str(e)}")
             raise
     
+    @staticmethod
+    def _strip_code_fence(response: str) -> str:
+        """Remove markdown code block markers around a JSON answer."""
+        response = response.strip()
+        if response.startswith("```"):
+            lines = response.split("\n")
+            if lines[0].startswith("```"):
+                lines = lines[1:]
+            if lines and lines[-1].startswith("```"):
+                lines = lines[:-1]
+            response = "\n".join(lines)
+        return response
+
     def _parse_llm_response(self, response: str) -> List[List[str]]:
         """Parse LLM JSON response."""
         try:
             # Extract JSON from response (handle markdown code blocks)
-            response = response.strip()
-            if response.startswith("```"):
-                # Remove markdown code block markers
-                lines = response.split("\n")
-                if lines[0].startswith("```"):
-                    lines = lines[1:]
-                if lines[-1].startswith("```"):
-                    lines = lines[:-1]
-                response = "\n".join(lines)
+            response = self._strip_code_fence(response)
             
             # Parse JSON
             parsed = json.loads(response)
@@ -510,27 +1918,54 @@ class ExaminationStandardizationService:
             logger.warning(f"Failed to parse LLM response: {e}")
             return []
 
+    def _parse_batch_response(self, response: str) -> Dict[str, Any]:
+        """
+        Parse a batch answer: a JSON object keyed by row id.
+        Tolerates code fences and text around the object; returns {} if no object can be read.
+        """
+        response = self._strip_code_fence(response or "")
+        try:
+            parsed = json.loads(response)
+        except ValueError:
+            start, end = response.find("{"), response.rfind("}")
+            if start < 0 or end <= start:
+                logger.warning("Failed to parse batch LLM response: no JSON object")
+                return {}
+            try:
+                parsed = json.loads(response[start:end + 1])
+            except ValueError as e:
+                logger.warning(f"Failed to parse batch LLM response: {e}")
+                return {}
+        if not isinstance(parsed, dict):
+            return {}
+        return {str(key).strip(): value for key, value in parsed.items()}
+
+    @staticmethod
+    def _coerce_triples(value: Any) -> List[List[str]]:
+        """Keep the well-formed [level1, level2, method] triples of one batch item."""
+        if not isinstance(value, list):
+            return []
+        if len(value) == 3 and all(isinstance(part, str) for part in value):
+            value = [value]
+        return [
+            [str(part) for part in item] for item in value
+            if isinstance(item, list) and len(item) == 3 and all(isinstance(part, str) for part in item)
+        ]
+
     async def _validate_against_kg(self, triples: List[List[str]]) -> bool:
         """Validate triples against KG. Returns True if ALL triples are valid."""
         if not triples:
             return False
-            
-        all_valid = True
-        for triple in triples:
-            if len(triple) != 3:
-                all_valid = False
-                continue
-                
-            level1, level2, method = triple
-            
-            # Use KG service to validate path
-            exists = await self.kg.validate_standardization_path(level1, level2, method)
-            
+
+        # One bulk check per row; offline against the snapshot once it is loaded
+        snapshot = await self.kg.get_snapshot()
+        flags = await self.kg.validate_paths_bulk(triples, offline=not snapshot.is_empty)
+
+        for triple, exists in zip(triples, flags):
             if not exists:
                 logger.warning(f"Validation failed for path: {triple}")
-                all_valid = False
-                
-        return all_valid
+
+        return all(flags)
 
 
 examination_service = ExaminationStandardizationService()
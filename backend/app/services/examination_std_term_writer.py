@@ -0,0 +1,69 @@
+"""
+StdTerm Bulk Writer
+Writes standardized examination terms to Neo4j as StdTerm nodes in
+UNWIND MERGE batches.
+"""
+
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import logging
+
+from app.core.kg import neo4j_service
+
+logger = logging.getLogger(__name__)
+
+# Nodes whose standard_json is unchanged are matched but not written
+MERGE_TERMS_QUERY = """
+UNWIND $terms AS term
+MERGE (t:StdTerm {id: term.id})
+WITH t, term
+WHERE t.standard_json IS NULL OR t.standard_json <> term.standard_json
+SET t.original_name = term.original_name,
+    t.modality = term.modality,
+    t.standard_json = term.standard_json,
+    t.status = 'active'
+RETURN count(t) AS written
+"""
+
+CONSTRAINT_QUERY = "CREATE CONSTRAINT std_term_id IF NOT EXISTS FOR (t:StdTerm) REQUIRE t.id IS UNIQUE"
+
+
+class StdTermWriter:
+    """Batched StdTerm upserts keyed on md5(original_name, modality)."""
+
+    def __init__(self):
+        self._constraint_ready = False
+
+    @staticmethod
+    def term_id(original_name: str, modality: Optional[str]) -> str:
+        return hashlib.md5(f"{original_name}_{modality}".encode()).hexdigest()
+
+    def build_term(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """StdTerm properties for one result row."""
+        original = result.get("original_name")
+        modality = result.get("modality")
+        return {
+            "id": self.term_id(original, modality),
+            "original_name": original,
+            "modality": modality or "",
+            "standard_json": json.dumps(result.get("standardized"), ensure_ascii=False)
+        }
+
+    async def ensure_constraint(self):
+        """Uniqueness on StdTerm.id, which also backs the MERGE lookups."""
+        if self._constraint_ready:
+            return
+        await neo4j_service.execute_write(CONSTRAINT_QUERY)
+        self._constraint_ready = True
+
+    async def write_batch(self, terms: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Upsert one batch; returns written and unchanged node counts."""
+        await self.ensure_constraint()
+        records = await neo4j_service.execute_write(MERGE_TERMS_QUERY, {"terms": terms})
+        written = records[0]["written"] if records else 0
+        return {"written": written, "unchanged": len(terms) - written}
+
+
+# Singleton instance
+std_term_writer = StdTermWriter()
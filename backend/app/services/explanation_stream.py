@@ -0,0 +1,122 @@
+"""
+Explanation Stream
+Event sequencing for the streaming policy Q&A: the "thinking" and answer
+completions run one after the other, or concurrently with the answer either
+held back until thinking ends or interleaved with it. The concurrent modes
+(the default is buffered) run both completions at once, so a request holds
+two LLM limiter slots instead of one while thinking is streamed.
+"""
+
+from typing import AsyncIterator, Callable, Optional, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+STREAM_SEQUENTIAL = "sequential"    # thinking, then start the answer
+STREAM_BUFFERED = "buffered"        # both at once; answer chunks held until thinking_done
+STREAM_INTERLEAVED = "interleaved"  # both at once; answer chunks sent as they arrive
+STREAM_MODES = (STREAM_SEQUENTIAL, STREAM_BUFFERED, STREAM_INTERLEAVED)
+
+THINKING_ON = "on"
+THINKING_OFF = "off"
+THINKING_AUTO = "auto"  # skipped while the LLM is busy
+THINKING_OPTIONS = (THINKING_ON, THINKING_OFF, THINKING_AUTO)
+
+THINKING_SITE = "explanation.thinking"
+ANSWER_SITE = "explanation.answer"
+
+_END = object()
+
+Event = Tuple[str, Optional[str]]
+
+
+async def stream_thinking_and_answer(
+    generate_stream: Callable[..., AsyncIterator[str]],
+    thinking_prompt: Optional[str],
+    answer_prompt: str,
+    mode: str = STREAM_BUFFERED
+) -> AsyncIterator[Event]:
+    """
+    Yield (event type, content) pairs using the SSE event types of
+    /query-stream: thinking_start, thinking, thinking_done, answer_start, chunk.
+
+    Args:
+        generate_stream: `generate_stream(prompt, site=...)`, an async iterator of text
+        thinking_prompt: None to answer without a thinking phase
+        answer_prompt: Prompt of the answer completion
+        mode: STREAM_SEQUENTIAL, STREAM_BUFFERED or STREAM_INTERLEAVED
+
+    In the concurrent modes a failed thinking completion only ends the
+    thinking phase; a failed answer completion is raised.
+    """
+    if thinking_prompt is None or mode == STREAM_SEQUENTIAL:
+        if thinking_prompt is not None:
+            yield "thinking_start", None
+            async for chunk in generate_stream(thinking_prompt, site=THINKING_SITE):
+                yield "thinking", chunk
+            yield "thinking_done", None
+        yield "answer_start", None
+        async for chunk in generate_stream(answer_prompt, site=ANSWER_SITE):
+            yield "chunk", chunk
+        return
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def pump(kind: str, prompt: str, site: str):
+        try:
+            async for chunk in generate_stream(prompt, site=site):
+                await queue.put((kind, chunk))
+            await queue.put((kind, _END))
+        except Exception as e:
+            await queue.put((kind, e))
+
+    tasks = [
+        asyncio.create_task(pump("thinking", thinking_prompt, THINKING_SITE)),
+        asyncio.create_task(pump("answer", answer_prompt, ANSWER_SITE))
+    ]
+    thinking_open = answer_open = True
+    answer_started = False
+    held = []
+    try:
+        yield "thinking_start", None
+        while thinking_open or answer_open:
+            kind, item = await queue.get()
+            if kind == "thinking":
+                if isinstance(item, Exception):
+                    logger.warning(f"Thinking generation failed, continuing with the answer: {item}")
+                    item = _END
+                if item is not _END:
+                    yield "thinking", item
+                    continue
+                thinking_open = False
+                yield "thinking_done", None
+                if not answer_started:
+                    answer_started = True
+                    yield "answer_start", None
+                for chunk in held:
+                    yield "chunk", chunk
+                held.clear()
+                continue
+
+            if isinstance(item, Exception):
+                raise item
+            if item is _END:
+                answer_open = False
+            elif thinking_open and mode == STREAM_BUFFERED:
+                held.append(item)
+            else:
+                if not answer_started:
+                    answer_started = True
+                    yield "answer_start", None
+                yield "chunk", item
+    finally:
+        # Client gone or answer failed: stop both completions (frees their limiter slots)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def resolve_option(value: Optional[str], allowed: Tuple[str, ...], default: str) -> str:
+    """Request option if valid, else the configured default."""
+    return value if value in allowed else default
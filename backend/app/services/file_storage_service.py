@@ -1,3 +1,4 @@
+import asyncio
 import os
 import shutil
 from datetime import datetime
@@ -34,14 +35,14 @@ class FileStorageService:
     async def save_file(self, file: UploadFile, category: str, tenant_id: str, prefix: str = "") -> str:
         """
         Save an uploaded file to the local file system.
+        The copy runs in a worker thread so large uploads do not block the event loop.
         Returns the relative path from base_dir.
         """
         filename = f"{prefix}_{file.filename}" if prefix else file.filename
         full_path = self._get_path(category, tenant_id, filename)
         
         try:
-            with open(full_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
+            await asyncio.to_thread(self._copy, file.file, full_path)
             
             # Return path relative to base_dir or project root?
             # Let's return the absolute path for now or path from root
@@ -50,6 +51,11 @@ class FileStorageService:
             logger.error(f"Failed to save file {filename}: {str(e)}")
             raise e
 
+    @staticmethod
+    def _copy(source, full_path: str):
+        with open(full_path, "wb") as buffer:
+            shutil.copyfileobj(source, buffer)
+
     def get_file_path(self, relative_path: str) -> Optional[str]:
         """Verify and return the full path of a file."""
         full_path = os.path.join(os.getcwd(), relative_path)
@@ -1,19 +1,31 @@
+import asyncio
 import json
 import os
 from typing import List, Dict, Any, Optional
 import uuid
+from app.core.concurrency import single_flight
 from app.db.base import SessionLocal
 from app.db.models import Rule as RuleModel, Terminology as TerminologyModel
 from app.services.cache_service import cache_service, cached
 
+CACHE_EXPIRE = 3600
+
 class KnowledgeStoreService:
     def __init__(self):
         # We'll use database sessions instead of JSON files
         pass
 
     # --- Rules Management ---
-    @cached("knowledge_rules", expire=3600)
+    # Concurrent reads of one tenant share a single cache lookup / query;
+    # the query runs off the event loop so those reads can overlap. Writes
+    # invalidate both the cache and the tenant's in-flight read, so a read
+    # after a write never joins one that started before it.
+    @single_flight("knowledge_store.get_all_rules", key=lambda self, tenant_id="default": (self, tenant_id))
+    @cached("knowledge_rules", expire=CACHE_EXPIRE)
     async def get_all_rules(self, tenant_id: str = "default") -> List[Dict]:
+        return await asyncio.to_thread(self._load_rules, tenant_id)
+
+    def _load_rules(self, tenant_id: str) -> List[Dict]:
         db = SessionLocal()
         try:
             rules = db.query(RuleModel).filter(RuleModel.tenant_id == tenant_id).all()
@@ -51,8 +63,7 @@ class KnowledgeStoreService:
             
             db.commit()
             
-            # Invalidate cache
-            await cache_service.clear_pattern(f"knowledge_rules:{tenant_id}*")
+            await self._invalidate_rules(tenant_id)
             
             return rule_data
         finally:
@@ -66,14 +77,21 @@ class KnowledgeStoreService:
                 tenant_id = rule.tenant_id
                 db.delete(rule)
                 db.commit()
-                # Invalidate cache
-                await cache_service.clear_pattern(f"knowledge_rules:{tenant_id}*")
+                await self._invalidate_rules(tenant_id)
         finally:
             db.close()
 
+    async def _invalidate_rules(self, tenant_id: str):
+        await cache_service.clear_pattern(f"knowledge_rules:{tenant_id}*")
+        self.get_all_rules.forget(self, tenant_id)
+
     # --- Terminology Management ---
-    @cached("knowledge_terms", expire=3600)
+    @single_flight("knowledge_store.get_all_terms", key=lambda self, tenant_id="default": (self, tenant_id))
+    @cached("knowledge_terms", expire=CACHE_EXPIRE)
     async def get_all_terms(self, tenant_id: str = "default") -> List[Dict]:
+        return await asyncio.to_thread(self._load_terms, tenant_id)
+
+    def _load_terms(self, tenant_id: str) -> List[Dict]:
         db = SessionLocal()
         try:
             terms = db.query(TerminologyModel).filter(TerminologyModel.tenant_id == tenant_id).all()
@@ -116,10 +134,12 @@ class KnowledgeStoreService:
             
             db.commit()
             
-            # Invalidate cache
-            await cache_service.clear_pattern(f"knowledge_terms:{tenant_id}*")
-            
-            return await self.get_all_terms(tenant_id)
+            await self._invalidate_terms(tenant_id)
+
+            # Load directly: this read must see the commit above
+            terms = await asyncio.to_thread(self._load_terms, tenant_id)
+            await cache_service.set(f"knowledge_terms:{tenant_id}", terms, expire=CACHE_EXPIRE)
+            return terms
         finally:
             db.close()
 
@@ -131,11 +151,14 @@ class KnowledgeStoreService:
                 TerminologyModel.raw_term == term_text
             ).delete()
             db.commit()
-            # Invalidate cache
-            await cache_service.clear_pattern(f"knowledge_terms:{tenant_id}*")
+            await self._invalidate_terms(tenant_id)
         finally:
             db.close()
 
+    async def _invalidate_terms(self, tenant_id: str):
+        await cache_service.clear_pattern(f"knowledge_terms:{tenant_id}*")
+        self.get_all_terms.forget(self, tenant_id)
+
     def _rule_to_dict(self, rule: RuleModel) -> Dict:
         return {
             "id": rule.id,
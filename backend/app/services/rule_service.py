@@ -1,8 +1,6 @@
 from typing import List, Dict, Any
 import logging
-from kag.interface.common.llm_client import LLMClient
-from kag.common.conf import KAG_CONFIG
-from app.core.config import settings
+from app.core.kag_llm import get_kag_llm
 
 logger = logging.getLogger(__name__)
 
@@ -14,16 +12,8 @@ class RuleCompiler:
     def __init__(self):
         """Initialize with real KAG LLM client."""
         try:
-            if not KAG_CONFIG._is_initialized:
-                import os
-                config_path = os.path.join(settings.PROJECT_ROOT, "config/kag_config.yaml")
-                KAG_CONFIG.initialize(prod=False, config_file=config_path)
-            
-            llm_config = KAG_CONFIG.all_config.get("chat_llm")
-            if not llm_config:
-                raise ValueError("chat_llm not found in config/kag_config.yaml")
-            
-            self.llm = LLMClient.from_config(llm_config)
+            # Shared async adapter: LLM calls no longer block the event loop
+            self.llm = get_kag_llm()
             logger.info("RuleCompiler initialized with real LLM")
         except Exception as e:
             logger.error(f"Failed to initialize RuleCompiler: {e}")
@@ -41,7 +31,7 @@ class RuleCompiler:
 - action: 执行动作
 - priority: 优先级(1-10)
 """
-            response = self.llm(prompt)
+            response = await self.llm(prompt, site="rule.compile")
             import json
             rule_def = json.loads(response)
             return {"status": "success", "rule": rule_def}
@@ -58,7 +48,7 @@ class RuleCompiler:
 
 请返回 "valid" 或 "invalid" 以及原因。
 """
-            response = self.llm(prompt)
+            response = await self.llm(prompt, site="rule.validate")
             return "valid" in response.lower()
         except Exception as e:
             logger.error(f"Rule validation failed: {e}")
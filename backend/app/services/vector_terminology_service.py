@@ -1,8 +1,6 @@
 from typing import List, Dict, Any, Optional
 import logging
-from kag.interface.common.llm_client import LLMClient
-from kag.common.conf import KAG_CONFIG
-from app.core.config import settings
+from app.core.kag_llm import get_kag_llm
 
 logger = logging.getLogger(__name__)
 
@@ -15,18 +13,8 @@ class VectorTerminologyService:
     def __init__(self):
         """Initialize with real KAG LLM."""
         try:
-            if not KAG_CONFIG._is_initialized:
-                import os
-                config_path = os.path.join(settings.PROJECT_ROOT, "config/kag_config.yaml")
-                KAG_CONFIG.initialize(prod=False, config_file=config_path)
-            
-            # Initialize LLM
-            llm_config = KAG_CONFIG.all_config.get("chat_llm")
-            if llm_config:
-                self.llm = LLMClient.from_config(llm_config)
-            else:
-                raise ValueError("chat_llm not found in config/kag_config.yaml")
-            
+            # Shared async adapter: LLM calls no longer block the event loop
+            self.llm = get_kag_llm()
             logger.info("VectorTerminologyService initialized with real LLM")
         except Exception as e:
             logger.error(f"Failed to initialize VectorTerminologyService: {e}")
@@ -43,7 +31,7 @@ class VectorTerminologyService:
 请以JSON格式返回:
 [{{"term": "术语", "similarity": 0.95, "category": "类别"}}]
 """
-            response = self.llm(prompt)
+            response = await self.llm(prompt, site="terminology.similar_terms")
             import json
             similar_terms = json.loads(response)
             return similar_terms[:top_k]
@@ -58,7 +46,7 @@ class VectorTerminologyService:
 
 请返回5-10个相关术语,用逗号分隔。
 """
-            response = self.llm(prompt)
+            response = await self.llm(prompt, site="terminology.expand_query")
             expanded_terms = [t.strip() for t in response.split(',')]
             return expanded_terms
         except Exception as e:
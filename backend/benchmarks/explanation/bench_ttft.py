@@ -0,0 +1,102 @@
+"""
+Time-to-first-answer-token benchmark for /explanation/query-stream.
+
+Replays the endpoint's thinking / answer sequencing
+(`stream_thinking_and_answer`) against simulated streaming completions:
+log-normal time to first token, then a fixed delay per chunk. Reports, per
+stream mode, when the client sees the first answer chunk and the last event.
+
+Usage (from backend/):
+    python -m benchmarks.explanation.bench_ttft --requests 50 --ttft-median 0.8 --chunk-delay 0.03
+"""
+
+import argparse
+import asyncio
+import math
+import random
+import statistics
+import time
+
+from app.services.explanation_stream import (
+    ANSWER_SITE,
+    STREAM_BUFFERED,
+    STREAM_INTERLEAVED,
+    STREAM_SEQUENTIAL,
+    stream_thinking_and_answer,
+)
+
+
+class SimulatedLLM:
+    """Streaming completions with a per-request time to first token."""
+
+    def __init__(self, args, seed: int):
+        self.args = args
+        self.seed = seed
+
+    async def generate_stream(self, prompt, site):
+        args = self.args
+        # Seeded per (request, completion) so every mode sees the same latencies
+        rng = random.Random(f"{self.seed}:{site}")
+        await asyncio.sleep(rng.lognormvariate(math.log(args.ttft_median), args.ttft_sigma) * args.time_scale)
+        chunks = args.answer_chunks if site == ANSWER_SITE else args.thinking_chunks
+        for index in range(chunks):
+            if index:
+                await asyncio.sleep(args.chunk_delay * args.time_scale)
+            yield "字"
+
+
+async def run_request(args, mode: str, thinking: bool, seed: int):
+    llm = SimulatedLLM(args, seed)
+    started = time.perf_counter()
+    first_answer = None
+    async for event_type, _ in stream_thinking_and_answer(
+        llm.generate_stream, "thinking" if thinking else None, "answer", mode=mode
+    ):
+        if event_type == "chunk" and first_answer is None:
+            first_answer = time.perf_counter() - started
+    total = time.perf_counter() - started
+    return first_answer / args.time_scale, total / args.time_scale
+
+
+def percentile(values, q: float) -> float:
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--ttft-median", type=float, default=0.8, help="median time to first token (s)")
+    parser.add_argument("--ttft-sigma", type=float, default=0.5, help="log-normal shape of the TTFT")
+    parser.add_argument("--chunk-delay", type=float, default=0.03, help="seconds between streamed chunks")
+    parser.add_argument("--thinking-chunks", type=int, default=150, help="~200 characters of thinking")
+    parser.add_argument("--answer-chunks", type=int, default=400)
+    parser.add_argument("--time-scale", type=float, default=0.1, help="multiply delays to keep runs short")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    variants = (
+        ("sequential", STREAM_SEQUENTIAL, True),
+        ("buffered", STREAM_BUFFERED, True),
+        ("interleaved", STREAM_INTERLEAVED, True),
+        ("no thinking", STREAM_BUFFERED, False),
+    )
+    print(f"requests={args.requests} ttft median={args.ttft_median}s chunk delay={args.chunk_delay}s "
+          f"thinking={args.thinking_chunks} chunks answer={args.answer_chunks} chunks "
+          f"(simulated, time-scale {args.time_scale})")
+    print(f"{'mode':<14}{'TTFA p50':>10}{'TTFA p95':>10}{'total p50':>11}{'vs seq':>8}")
+    baseline = None
+    for name, mode, thinking in variants:
+        results = await asyncio.gather(*(
+            run_request(args, mode, thinking, args.seed + i) for i in range(args.requests)
+        ))
+        first = [ttfa for ttfa, _ in results]
+        totals = [total for _, total in results]
+        median = statistics.median(first)
+        baseline = baseline or median
+        print(f"{name:<14}{median:>10.2f}{percentile(first, 0.95):>10.2f}"
+              f"{statistics.median(totals):>11.2f}{baseline / median:>7.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
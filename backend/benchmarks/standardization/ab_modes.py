@@ -0,0 +1,172 @@
+"""
+A/B comparison of two-stage vs single-pass standardization on real LLM calls.
+
+Runs both modes over the distinct (name, modality) pairs of a sample file
+against the ontology CSV (no Neo4j needed) and reports, per mode:
+
+- LLM calls, prompt / completion tokens (from the API `usage` field)
+- per-name latency p50 / p95 and wall time
+- KG validation pass rate (all triples exist in the ontology)
+- silver accuracy: exact match against the deterministic dictionary matcher
+  on the names it resolves (the sample has no gold labels; the dictionary
+  stage is bypassed for both modes so every name goes to the LLM)
+- agreement between the two modes
+
+The prompt cache and the correction memory are disabled, so reruns measure
+real LLM calls rather than cache hits or earlier reviewer corrections.
+
+Requires OPENAI_API_KEY / OPENAI_BASE_URL / OPENAI_MODEL.
+
+Usage (from backend/):
+    python -m benchmarks.standardization.ab_modes --limit 200 --concurrency 8
+"""
+
+import argparse
+import asyncio
+import csv
+import random
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from app.core.concurrency import SlidingWindowScheduler
+from app.core.config import settings
+from app.core.llm import llm_service
+from app.services.examination_kg_initializer import examination_kg
+from app.services.examination_dictionary_matcher import DictionaryMatcher
+from app.services.examination_ontology_snapshot import OntologySnapshot
+from app.services.examination_standardization_service import (
+    ExaminationStandardizationService,
+    MODE_SINGLE_PASS,
+    MODE_TWO_STAGE,
+)
+
+DATA_DIR = Path(__file__).resolve().parents[3] / "data"
+
+
+class NoMatch(DictionaryMatcher):
+    """Dictionary that never matches, so every name reaches the LLM; its other lookups still work."""
+
+    def match(self, exam_name, modality=None):
+        return None
+
+
+class NoCorrections:
+    """Correction memory stand-in with nothing remembered."""
+
+    def nearest(self, name, modality, threshold, record=True):
+        return []
+
+    def record_hit(self):
+        pass
+
+
+class UsageMeter:
+    """Wraps llm_service.chat_completion to count calls and tokens."""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._original = llm_service.chat_completion
+
+    async def chat_completion(self, messages, **kwargs):
+        response = await self._original(messages, **kwargs)
+        self.calls += 1
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+        return response
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))] if ordered else 0.0
+
+
+def as_set(triples):
+    return frozenset(tuple(t) for t in triples or [])
+
+
+def load_pairs(path: Path, limit: int, seed: int):
+    df = pd.read_csv(path)
+    pairs = list(dict.fromkeys(
+        (str(row["检查项目名"]), str(row["检查标准模态"]))
+        for _, row in df.iterrows() if pd.notna(row["检查项目名"])
+    ))
+    random.Random(seed).shuffle(pairs)
+    return pairs[:limit] if limit else pairs
+
+
+async def run_mode(service, pairs, mode: str, concurrency: int):
+    meter = UsageMeter()
+    llm_service.chat_completion = meter.chat_completion
+    outcomes, latencies = {}, []
+
+    async def worker(pair):
+        started = time.perf_counter()
+        try:
+            return await service._standardize_single(*pair, mode=mode)
+        finally:
+            latencies.append(time.perf_counter() - started)
+
+    def on_result(pair, result, error):
+        outcomes[pair] = result
+
+    started = time.perf_counter()
+    try:
+        await SlidingWindowScheduler(concurrency).run(pairs, worker, on_result)
+    finally:
+        llm_service.chat_completion = meter._original
+    return outcomes, latencies, time.perf_counter() - started, meter
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", type=Path, default=DATA_DIR / "示例数据.csv")
+    parser.add_argument("--ontology", type=Path, default=DATA_DIR / "examination_ontology.csv")
+    parser.add_argument("--limit", type=int, default=200, help="distinct names to sample (0 = all)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if not llm_service.get_client():
+        raise SystemExit("OPENAI_API_KEY is not set")
+    settings.LLM_PROMPT_CACHE_SITES = {}
+
+    with open(args.ontology, encoding="utf-8") as f:
+        snapshot = OntologySnapshot.from_rows(csv.DictReader(f))
+    service = ExaminationStandardizationService()
+    service.kg.snapshots.install(snapshot)
+
+    pairs = load_pairs(args.input, args.limit, args.seed)
+    dictionary = DictionaryMatcher(snapshot, examination_kg.get_aliases())
+    silver = {pair: as_set(dictionary.match(*pair)) for pair in pairs if dictionary.match(*pair)}
+    no_match = NoMatch(snapshot, examination_kg.get_aliases())
+    service._get_matcher = lambda snapshot: no_match
+    service.correction_memory = NoCorrections()
+
+    print(f"names={len(pairs)} silver={len(silver)} concurrency={args.concurrency} model={llm_service.get_model_name()}")
+    print(f"{'mode':<12}{'calls':>7}{'prompt tok':>12}{'compl tok':>11}{'p50 (s)':>9}{'p95 (s)':>9}"
+          f"{'wall (s)':>10}{'valid':>8}{'silver':>8}")
+    runs = {}
+    for mode in (MODE_TWO_STAGE, MODE_SINGLE_PASS):
+        outcomes, latencies, wall, meter = await run_mode(service, pairs, mode, args.concurrency)
+        runs[mode] = outcomes
+        valid = sum(1 for r in outcomes.values() if r and r.get("status") == "success")
+        correct = sum(1 for pair, expected in silver.items()
+                      if outcomes.get(pair) and as_set(outcomes[pair]["result"]) == expected)
+        print(f"{mode:<12}{meter.calls:>7}{meter.prompt_tokens:>12}{meter.completion_tokens:>11}"
+              f"{percentile(latencies, 0.5):>9.2f}{percentile(latencies, 0.95):>9.2f}{wall:>10.1f}"
+              f"{valid / len(pairs):>8.1%}{(correct / len(silver)) if silver else 0:>8.1%}")
+
+    both = [pair for pair in pairs if runs[MODE_TWO_STAGE].get(pair) and runs[MODE_SINGLE_PASS].get(pair)]
+    agree = sum(1 for pair in both
+                if as_set(runs[MODE_TWO_STAGE][pair]["result"]) == as_set(runs[MODE_SINGLE_PASS][pair]["result"]))
+    print(f"mode agreement: {agree}/{len(both)} names answered by both modes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
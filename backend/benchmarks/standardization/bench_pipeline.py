@@ -0,0 +1,199 @@
+"""
+Offline end-to-end benchmark of ExaminationStandardizationService.process_file.
+
+Replays the sample files through the real pipeline (streaming reader, dedup,
+cache, dictionary, LLM stages, result rows in a throwaway SQLite DB) against
+the deterministic mock OpenAI server (mock_llm.py, started as a subprocess so
+it does not count toward this process' memory) and the ontology CSV as the
+in-memory snapshot. No live LLM or Neo4j is needed; the graph sync is skipped.
+
+Reports rows/s, p50/p95/p99 per-row latency (row read -> result published),
+LLM calls per row and peak RSS. Use --json to keep results for comparing
+commits.
+
+Usage (from backend/):
+    python -m benchmarks.standardization.bench_pipeline
+    python -m benchmarks.standardization.bench_pipeline --repeat 20 --vary --concurrency 32 --json before.json
+    python -m benchmarks.standardization.bench_pipeline --mode single_pass --batch-size 10
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+DATA_DIR = BACKEND_DIR.parent / "data"
+DEFAULT_INPUTS = [DATA_DIR / "示例数据.csv", DATA_DIR / "test_examination_data.csv"]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[int(fraction * (len(ordered) - 1))] if ordered else 0.0
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def build_input(inputs, repeat: int, vary: bool, path: Path) -> int:
+    """Concatenate the input files `repeat` times; --vary makes repeated names distinct."""
+    rows = []
+    for input_path in inputs:
+        with open(input_path, encoding="utf-8") as f:
+            rows.extend((r["检查项目名"], r["检查标准模态"]) for r in csv.DictReader(f))
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["检查项目名", "检查标准模态"])
+        for copy in range(repeat):
+            for name, modality in rows:
+                writer.writerow([f"{name} {copy}" if vary and copy else name, modality])
+    return len(rows) * repeat
+
+
+def start_mock_server(args) -> subprocess.Popen:
+    server = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.standardization.mock_llm", "--port", str(args.port),
+         "--ontology", str(args.ontology), "--latency-median", str(args.latency_median),
+         "--latency-sigma", str(args.latency_sigma), "--rate-limit-every", str(args.rate_limit_every)],
+        cwd=BACKEND_DIR, stdout=subprocess.PIPE, text=True
+    )
+    server.stdout.readline()  # "mock LLM listening on ..."
+    return server
+
+
+def configure_environment(args, workdir: Path):
+    """Settings are read at import time, so this runs before any app import."""
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{workdir / 'bench.db'}",
+        "OPENAI_API_KEY": "mock",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{args.port}/v1",
+        "OPENAI_MODEL": "mock",
+        "STANDARDIZATION_CONCURRENCY": str(args.concurrency),
+        "LLM_INITIAL_CONCURRENCY": str(args.concurrency),
+        "LLM_MAX_CONCURRENCY": str(max(args.concurrency, 64)),
+    })
+
+
+async def run(args, input_path: Path):
+    import logging
+
+    from app.core.events import TopicBroker
+    from app.core.llm import llm_service
+    from app.db.base import Base, engine
+    from app.services import examination_standardization_service as service_module
+    from app.services.examination_ontology_snapshot import OntologySnapshot
+
+    logging.disable(logging.WARNING)
+    Base.metadata.create_all(bind=engine)
+
+    service = service_module.ExaminationStandardizationService()
+    with open(args.ontology, encoding="utf-8") as f:
+        service.kg.snapshots.install(OntologySnapshot.from_rows(csv.DictReader(f)))
+    service.schedule_kag_sync = lambda task_id: None
+
+    # Instrumentation: row read times, row publish times, LLM calls
+    read_at, done_at, calls = {}, {}, {"count": 0}
+    aiter_records = service_module.aiter_records
+
+    async def timed_records(*a, **kw):
+        async for row_index, record in aiter_records(*a, **kw):
+            read_at[row_index] = time.perf_counter()
+            yield row_index, record
+
+    class RecordingBroker(TopicBroker):
+        def has_subscribers(self, topic):
+            return True
+
+        def publish(self, topic, event, data):
+            if event == "results":
+                now = time.perf_counter()
+                for row in data["rows"]:
+                    done_at[row["row_index"]] = now
+
+    chat_completion = llm_service.chat_completion
+
+    async def counting_chat_completion(*a, **kw):
+        calls["count"] += 1
+        return await chat_completion(*a, **kw)
+
+    service_module.aiter_records = timed_records
+    service_module.task_events = RecordingBroker()
+    llm_service.chat_completion = counting_chat_completion
+
+    options = {"batch_size": args.batch_size, "mode": args.mode}
+    task_id = service.create_task(input_path.name, options=options)
+    started = time.perf_counter()
+    await service.process_file(task_id, str(input_path), input_path.name)
+    wall = time.perf_counter() - started
+
+    task = service.get_task(task_id)
+    latencies = [done_at[i] - read_at[i] for i in done_at if i in read_at]
+    rows = task["processed_records"]
+    return {
+        "rows": rows,
+        "distinct_keys": task["stats"].get("distinct_keys"),
+        "status": task["status"],
+        "wall_s": round(wall, 3),
+        "rows_per_s": round(rows / wall, 2) if wall else 0.0,
+        "latency_p50_s": round(percentile(latencies, 0.50), 4),
+        "latency_p95_s": round(percentile(latencies, 0.95), 4),
+        "latency_p99_s": round(percentile(latencies, 0.99), 4),
+        "llm_calls": calls["count"],
+        "llm_calls_per_row": round(calls["count"] / rows, 4) if rows else 0.0,
+        "success_rate": round(task["success_count"] / rows, 4) if rows else 0.0,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "limiter": llm_service.limiter.get_stats(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", type=Path, action="append", help="input CSV (repeatable; default: sample files)")
+    parser.add_argument("--ontology", type=Path, default=DATA_DIR / "examination_ontology.csv")
+    parser.add_argument("--repeat", type=int, default=1, help="concatenate the inputs N times")
+    parser.add_argument("--vary", action="store_true", help="make repeated names distinct (defeats dedup/cache)")
+    parser.add_argument("--mode", default="two_stage", choices=["two_stage", "single_pass"])
+    parser.add_argument("--batch-size", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--latency-median", type=float, default=0.8, help="mock LLM median latency (s)")
+    parser.add_argument("--latency-sigma", type=float, default=0.6)
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="mock answers every Nth call with 429")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--json", type=Path, help="also write the report to this file")
+    args = parser.parse_args()
+
+    server = start_mock_server(args)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            workdir = Path(workdir)
+            input_path = workdir / "bench.csv"
+            build_input(args.input or DEFAULT_INPUTS, args.repeat, args.vary, input_path)
+            configure_environment(args, workdir)
+            report = asyncio.run(run(args, input_path))
+    finally:
+        server.terminate()
+        server.wait()
+
+    report["config"] = json.loads(json.dumps(vars(args), default=str))
+    print(f"rows={report['rows']} distinct={report['distinct_keys']} mode={args.mode} "
+          f"batch_size={args.batch_size} concurrency={args.concurrency} status={report['status']}")
+    print(f"{'rows/s':>10}{'p50 (s)':>10}{'p95 (s)':>10}{'p99 (s)':>10}{'calls/row':>11}{'success':>9}{'peak RSS':>11}")
+    print(f"{report['rows_per_s']:>10.1f}{report['latency_p50_s']:>10.2f}{report['latency_p95_s']:>10.2f}"
+          f"{report['latency_p99_s']:>10.2f}{report['llm_calls_per_row']:>11.3f}{report['success_rate']:>9.1%}"
+          f"{report['peak_rss_mb']:>9.0f}MB")
+    if args.json:
+        args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+
+
+if __name__ == "__main__":
+    main()
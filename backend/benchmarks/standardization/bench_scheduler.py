@@ -0,0 +1,81 @@
+"""
+Scheduler benchmark: fixed BATCH_SIZE barriers vs sliding-window concurrency.
+
+Simulates LLM calls with a heavy-tailed (log-normal) latency distribution and
+compares throughput of the old `asyncio.gather` chunking against
+SlidingWindowScheduler at the same number of requests in flight.
+
+Usage (from backend/):
+    python -m benchmarks.standardization.bench_scheduler --records 500 --concurrency 10
+"""
+
+import argparse
+import math
+import asyncio
+import random
+import statistics
+import time
+
+from app.core.concurrency import SlidingWindowScheduler
+
+
+def make_latencies(count: int, median: float, sigma: float, seed: int):
+    """Deterministic log-normal latencies (seconds)."""
+    rng = random.Random(seed)
+    mu = math.log(median)
+    return [rng.lognormvariate(mu, sigma) for _ in range(count)]
+
+
+async def fake_llm_call(latency: float):
+    await asyncio.sleep(latency)
+    return latency
+
+
+async def run_batch_barrier(latencies, batch_size: int) -> float:
+    """Old behaviour: each chunk waits for its slowest call."""
+    started = time.perf_counter()
+    for i in range(0, len(latencies), batch_size):
+        await asyncio.gather(*(fake_llm_call(lat) for lat in latencies[i:i + batch_size]))
+    return time.perf_counter() - started
+
+
+async def run_sliding_window(latencies, concurrency: int) -> float:
+    """New behaviour: a slot is refilled as soon as any call finishes."""
+    started = time.perf_counter()
+    await SlidingWindowScheduler(concurrency).run(latencies, fake_llm_call)
+    return time.perf_counter() - started
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--median", type=float, default=1.5, help="median simulated LLM latency (s)")
+    parser.add_argument("--sigma", type=float, default=0.8, help="log-normal shape; larger = heavier tail")
+    parser.add_argument("--time-scale", type=float, default=0.02, help="multiply latencies to keep runs short")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    latencies = [
+        lat * args.time_scale
+        for lat in make_latencies(args.records, args.median, args.sigma, args.seed)
+    ]
+    ordered = sorted(latencies)
+    p99 = ordered[int(0.99 * (len(ordered) - 1))]
+
+    barrier = await run_batch_barrier(latencies, args.concurrency)
+    window = await run_sliding_window(latencies, args.concurrency)
+    ideal = sum(latencies) / args.concurrency
+
+    print(f"records={args.records} concurrency={args.concurrency} "
+          f"latency median={statistics.median(latencies) / args.time_scale:.2f}s "
+          f"p99={p99 / args.time_scale:.2f}s (simulated, time-scale {args.time_scale})")
+    print(f"{'scheduler':<16}{'wall (s)':>10}{'rows/s':>10}{'vs ideal':>10}")
+    for name, wall in (("batch barrier", barrier), ("sliding window", window)):
+        print(f"{name:<16}{wall / args.time_scale:>10.1f}{args.records / (wall / args.time_scale):>10.2f}"
+              f"{wall / ideal:>10.2f}")
+    print(f"speedup: {barrier / window:.2f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
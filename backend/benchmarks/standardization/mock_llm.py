@@ -0,0 +1,167 @@
+"""
+Deterministic mock of the OpenAI chat-completions API for offline benchmarks.
+
+Answers the standardization prompts (stage 1, stage 2, single pass; single
+and batch variants) from the ontology CSV with a simple substring oracle, so
+the pipeline runs end to end without a real model. Latency per request is
+log-normal, seeded by the prompt text: the same prompt always gets the same
+delay and answer, whatever the request order.
+
+Usage (from backend/):
+    python -m benchmarks.standardization.mock_llm --port 8900 --latency-median 0.8 --latency-sigma 0.6
+"""
+
+import argparse
+import csv
+import hashlib
+import json
+import math
+import random
+import re
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, List, Optional
+
+DATA_DIR = Path(__file__).resolve().parents[3] / "data"
+
+# Combined view names split into the single methods the ontology lists
+METHOD_EXPANSIONS = {"正侧位": "正位侧位", "正斜位": "正位斜位", "双斜位": "斜位", "张口位": "开口位"}
+
+BATCH_LINE = re.compile(r'^"([^"]+)":\s*(.+)$')
+SINGLE_INPUT = re.compile(r"^输入:\s*(.+?)(?:,\s*模态:\s*(\S*))?\s*$")
+
+
+class Oracle:
+    """Substring matcher over the ontology rows standing in for the model."""
+
+    def __init__(self, rows: List[Dict[str, str]]):
+        self.rows = [(r["一级部位"], r["二级部位"], r["检查方法"], r["检查模态"]) for r in rows]
+        # Longest level-2 names first, so 膝关节 wins over 膝
+        self.level2 = sorted({row[1] for row in self.rows}, key=len, reverse=True)
+
+    def triples(self, exam_name: str, modality: Optional[str]) -> List[List[str]]:
+        name = exam_name
+        for combined, expanded in METHOD_EXPANSIONS.items():
+            name = name.replace(combined, expanded)
+        triples = []
+        for part in self.level2:
+            if part not in name:
+                continue
+            rows = [row for row in self.rows if row[1] == part and (not modality or row[3] == modality)]
+            matched = [row for row in rows if row[2] in name] or rows[:1]
+            triples.extend([row[0], row[1], row[2]] for row in matched)
+            name = name.replace(part, "")
+        return list(map(list, dict.fromkeys(map(tuple, triples))))
+
+    def level1(self, exam_name: str) -> List[str]:
+        return list(dict.fromkeys(triple[0] for triple in self.triples(exam_name, None)))
+
+
+def answer(prompt: str, oracle: Oracle) -> str:
+    """Reply in the format the prompt asks for."""
+    lines = prompt.strip().splitlines()
+    is_level1 = "一级检查部位" in prompt
+    modality_line = next((line for line in lines if line.startswith("模态:")), "")
+    batch_modality = modality_line.split(":", 1)[1].strip() if modality_line else None
+
+    # Batch items follow the last "输入...:" header (earlier ones belong to the few-shot examples)
+    header = max((i for i, line in enumerate(lines) if line.startswith("输入") and line.rstrip().endswith(":")),
+                 default=None)
+    batch_items = []
+    for line in lines[header + 1:] if header is not None else []:
+        match = BATCH_LINE.match(line.strip())
+        if not match:
+            break
+        batch_items.append(match.groups())
+    if batch_items:
+        if is_level1:
+            return json.dumps({key: oracle.level1(name) for key, name in batch_items}, ensure_ascii=False)
+        return json.dumps({key: oracle.triples(name, batch_modality) for key, name in batch_items},
+                          ensure_ascii=False)
+
+    for line in reversed(lines):
+        match = SINGLE_INPUT.match(line.strip())
+        if match:
+            name, modality = match.group(1), match.group(2)
+            if is_level1:
+                return ", ".join(oracle.level1(name)) or "Unknown"
+            return json.dumps(oracle.triples(name, modality), ensure_ascii=False)
+    return "Unknown"
+
+
+def latency_for(prompt: str, median: float, sigma: float) -> float:
+    seed = int(hashlib.md5(prompt.encode("utf-8")).hexdigest()[:16], 16)
+    return random.Random(seed).lognormvariate(math.log(median), sigma) if median > 0 else 0.0
+
+
+def make_handler(oracle: Oracle, median: float, sigma: float, rate_limit_every: int):
+    counter = {"requests": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+            counter["requests"] += 1
+            if rate_limit_every and counter["requests"] % rate_limit_every == 0:
+                return self._send(429, {"error": {"message": "rate limited", "type": "rate_limit"}},
+                                  {"retry-after": "0.5"})
+
+            time.sleep(latency_for(prompt, median, sigma))
+            content = answer(prompt, oracle)
+            self._send(200, {
+                "id": f"chatcmpl-{counter['requests']}",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "mock"),
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": content}}],
+                "usage": {"prompt_tokens": len(prompt) // 2, "completion_tokens": len(content) // 2,
+                          "total_tokens": (len(prompt) + len(content)) // 2}
+            })
+
+        def _send(self, status: int, payload: dict, headers: Optional[Dict[str, str]] = None):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(port: int, ontology: Path, median: float, sigma: float, rate_limit_every: int = 0) -> ThreadingHTTPServer:
+    with open(ontology, encoding="utf-8") as f:
+        oracle = Oracle(list(csv.DictReader(f)))
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(oracle, median, sigma, rate_limit_every))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--ontology", type=Path, default=DATA_DIR / "examination_ontology.csv")
+    parser.add_argument("--latency-median", type=float, default=0.8, help="median response time (s)")
+    parser.add_argument("--latency-sigma", type=float, default=0.6, help="log-normal shape; larger = heavier tail")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every Nth request with a 429")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.ontology, args.latency_median, args.latency_sigma, args.rate_limit_every)
+    print(f"mock LLM listening on http://127.0.0.1:{args.port}/v1", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
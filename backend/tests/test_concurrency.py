@@ -0,0 +1,383 @@
+"""
+Unit tests for core concurrency helpers
+"""
+
+import asyncio
+import httpx
+import openai
+import pytest
+from app.core import llm as llm_module
+from app.core.concurrency import AdaptiveConcurrencyLimiter, SingleFlight, SlidingWindowScheduler, single_flight
+from app.core.exceptions import LLMOverloadedError
+from app.core.llm import LLMService
+
+
+class TestSlidingWindowScheduler:
+    """Test the sliding-window worker pool."""
+
+    @pytest.mark.asyncio
+    async def test_bounded_in_flight(self):
+        in_flight = 0
+        peak = 0
+
+        async def worker(item):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.001 * (item % 3))
+            in_flight -= 1
+            return item * 2
+
+        results = {}
+        processed = await SlidingWindowScheduler(3).run(
+            range(20), worker, lambda item, result, error: results.__setitem__(item, result)
+        )
+
+        assert processed == 20
+        assert peak == 3
+        assert results == {i: i * 2 for i in range(20)}
+
+    @pytest.mark.asyncio
+    async def test_slow_item_does_not_block_others(self):
+        finished = []
+
+        async def worker(item):
+            await asyncio.sleep(0.2 if item == 0 else 0.001)
+            finished.append(item)
+
+        await SlidingWindowScheduler(2).run(range(10), worker)
+
+        # Without batch barriers, the fast items all finish while item 0 is still running
+        assert finished[-1] == 0
+
+    @pytest.mark.asyncio
+    async def test_async_iterable_and_errors(self):
+        async def items():
+            for i in range(4):
+                yield i
+
+        async def worker(item):
+            if item == 2:
+                raise ValueError("boom")
+            return item
+
+        errors = []
+
+        async def on_result(item, result, error):
+            if error:
+                errors.append((item, str(error)))
+
+        processed = await SlidingWindowScheduler(2).run(items(), worker, on_result)
+
+        assert processed == 4
+        assert errors == [(2, "boom")]
+
+
+def rate_limit_error(retry_after=None):
+    headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+    request = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+    response = httpx.Response(429, headers=headers, request=request)
+    return openai.RateLimitError("rate limited", response=response, body=None)
+
+
+class TestAdaptiveConcurrencyLimiter:
+    """Test AIMD limit adaptation."""
+
+    @pytest.mark.asyncio
+    async def test_additive_increase_when_healthy(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=4, latency_target=1.0)
+
+        for _ in range(10):
+            await limiter.acquire()
+            await limiter.release(latency=0.01)
+
+        assert 3 <= limiter.limit <= 4
+
+    @pytest.mark.asyncio
+    async def test_slow_calls_do_not_grow_limit(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, latency_target=0.5)
+
+        await limiter.acquire()
+        await limiter.release(latency=2.0)
+
+        assert limiter.limit == 2
+
+    @pytest.mark.asyncio
+    async def test_multiplicative_decrease_once_per_cooldown(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=16, cooldown=60)
+
+        for _ in range(3):
+            await limiter.acquire()
+            await limiter.release(overloaded=True)
+
+        # A burst of 429s from the same window halves the limit only once
+        assert limiter.limit == 8
+        assert limiter.get_stats()["total_overloads"] == 3
+
+    @pytest.mark.asyncio
+    async def test_limit_bounds_in_flight(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=2, latency_target=0)
+        in_flight = 0
+        peak = 0
+
+        async def call():
+            nonlocal in_flight, peak
+            await limiter.acquire()
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.005)
+            in_flight -= 1
+            await limiter.release(latency=1.0)
+
+        await asyncio.gather(*(call() for _ in range(8)))
+
+        assert peak == 2
+
+    @pytest.mark.asyncio
+    async def test_retry_after_pauses_acquisition(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+        loop = asyncio.get_running_loop()
+
+        await limiter.acquire()
+        await limiter.release(overloaded=True, retry_after=0.05)
+        started = loop.time()
+        await limiter.acquire()
+
+        assert loop.time() - started >= 0.04
+
+
+class TestLimiterBusy:
+    """Test the load signal used to shed optional LLM work."""
+
+    @pytest.mark.asyncio
+    async def test_busy_by_utilization(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+        for _ in range(3):
+            await limiter.acquire()
+
+        assert limiter.is_busy(0.75)
+        assert not limiter.is_busy(0.9)
+
+    @pytest.mark.asyncio
+    async def test_busy_while_paused_for_retry_after(self):
+        limiter = AdaptiveConcurrencyLimiter(initial_limit=4)
+        await limiter.acquire()
+        await limiter.release(overloaded=True, retry_after=5)
+
+        assert limiter.is_busy(1.0)
+
+
+class FakeCompletions:
+    def __init__(self, failures):
+        self.failures = list(failures)
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        if self.failures:
+            raise self.failures.pop(0)
+        return "ok"
+
+
+class FakeClient:
+    def __init__(self, failures):
+        self.chat = type("Chat", (), {})()
+        self.chat.completions = FakeCompletions(failures)
+
+
+class TestChatCompletion:
+    """Test LLMService.chat_completion retry behaviour."""
+
+    @pytest.fixture
+    def service(self, monkeypatch):
+        monkeypatch.setattr(llm_module.settings, "LLM_RETRY_BASE_DELAY", 0.001)
+        monkeypatch.setattr(llm_module.settings, "LLM_MAX_RETRIES", 2)
+        svc = object.__new__(LLMService)
+        svc.model = "test-model"
+        svc.limiter = AdaptiveConcurrencyLimiter(initial_limit=8, cooldown=0)
+        return svc
+
+    @pytest.mark.asyncio
+    async def test_retries_rate_limits_and_shrinks_limit(self, service):
+        service.client = FakeClient([rate_limit_error(0.01), rate_limit_error()])
+
+        response = await service.chat_completion(messages=[{"role": "user", "content": "hi"}])
+
+        assert response == "ok"
+        assert service.client.chat.completions.calls == 3
+        assert service.limiter.limit == 2
+        assert service.limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_raises_overloaded_after_retries(self, service):
+        service.client = FakeClient([rate_limit_error(0.01)] * 3)
+
+        with pytest.raises(LLMOverloadedError) as info:
+            await service.chat_completion(messages=[{"role": "user", "content": "hi"}])
+
+        assert info.value.retry_after == 0.01
+        assert service.limiter.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_other_errors_are_not_retried(self, service):
+        service.client = FakeClient([ValueError("bad request")])
+
+        with pytest.raises(ValueError):
+            await service.chat_completion(messages=[])
+
+        assert service.client.chat.completions.calls == 1
+        assert service.limiter.limit == 8
+
+
+class TestSingleFlight:
+    """Test request coalescing."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_callers_share_one_call(self):
+        flight = SingleFlight("test")
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {"value": calls}
+
+        results = await asyncio.gather(*(flight.do("k", fetch) for _ in range(5)))
+
+        assert calls == 1
+        assert all(result is results[0] for result in results)
+        assert flight.get_stats() == {"calls": 1, "coalesced": 4, "in_flight": 0}
+
+    @pytest.mark.asyncio
+    async def test_different_keys_and_later_calls_run_again(self):
+        flight = SingleFlight("test")
+        calls = []
+
+        async def fetch(key):
+            calls.append(key)
+            await asyncio.sleep(0)
+            return key
+
+        await asyncio.gather(flight.do("a", lambda: fetch("a")), flight.do("b", lambda: fetch("b")))
+        await flight.do("a", lambda: fetch("a"))
+
+        assert calls == ["a", "b", "a"]
+
+    @pytest.mark.asyncio
+    async def test_errors_reach_every_caller(self):
+        flight = SingleFlight("test")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*(flight.do("k", fail) for _ in range(3)), return_exceptions=True)
+
+        assert all(isinstance(result, ValueError) for result in results)
+        assert flight.get_stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_leaves_call_running_for_others(self):
+        flight = SingleFlight("test")
+
+        async def fetch():
+            await asyncio.sleep(0.02)
+            return "done"
+
+        first = asyncio.create_task(flight.do("k", fetch))
+        second = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        assert await second == "done"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    @pytest.mark.asyncio
+    async def test_call_is_cancelled_when_nobody_waits(self):
+        flight = SingleFlight("test")
+        finished = False
+
+        async def fetch():
+            nonlocal finished
+            await asyncio.sleep(0.05)
+            finished = True
+
+        caller = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        caller.cancel()
+        await asyncio.sleep(0.08)
+
+        assert not finished
+        assert flight.get_stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_join_timeout_only_bounds_joining_callers(self):
+        flight = SingleFlight("test")
+
+        async def fetch():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        leader = asyncio.create_task(flight.do("k", fetch, join_timeout=0.01))
+        await asyncio.sleep(0)
+        with pytest.raises(asyncio.TimeoutError):
+            await flight.do("k", fetch, join_timeout=0.01)
+
+        assert await leader == "done"
+
+    @pytest.mark.asyncio
+    async def test_decorator_keys_on_arguments(self):
+        calls = []
+
+        class Service:
+            @single_flight("test.lookup")
+            async def lookup(self, name):
+                calls.append(name)
+                await asyncio.sleep(0.01)
+                return name.upper()
+
+        service = Service()
+        results = await asyncio.gather(service.lookup("a"), service.lookup("a"), service.lookup("b"))
+
+        assert results == ["A", "A", "B"]
+        assert calls == ["a", "b"]
+
+    @pytest.mark.asyncio
+    async def test_forget_starts_a_new_call_for_later_callers(self):
+        flight = SingleFlight("test")
+        version = 1
+
+        async def fetch():
+            seen = version
+            await asyncio.sleep(0.02)
+            return seen
+
+        stale = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0.005)
+        version = 2
+        flight.forget("k")
+
+        assert await flight.do("k", fetch) == 2
+        assert await stale == 1
+        assert flight.get_stats()["in_flight"] == 0
+
+    @pytest.mark.asyncio
+    async def test_decorator_forget_uses_call_key(self):
+        calls = []
+
+        class Service:
+            @single_flight("test.forget", key=lambda self, name: name)
+            async def lookup(self, name):
+                calls.append(name)
+                await asyncio.sleep(0.01)
+                return name
+
+        service = Service()
+        first = asyncio.create_task(service.lookup("a"))
+        await asyncio.sleep(0)
+        service.lookup.forget(service, "a")
+        await asyncio.gather(first, service.lookup("a"))
+
+        assert calls == ["a", "a"]
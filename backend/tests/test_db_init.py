@@ -0,0 +1,109 @@
+"""
+Unit tests for init_db on databases created by earlier releases
+"""
+
+import json
+
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import ADDED_COLUMNS, init_db
+from app.services import examination_standardization_service as service_module
+from app.services.examination_standardization_service import ExaminationStandardizationService
+
+# standardization_tasks as created by the first release
+BASELINE_TASKS_TABLE = """
+CREATE TABLE standardization_tasks (
+    id VARCHAR NOT NULL PRIMARY KEY,
+    tenant_id VARCHAR NOT NULL,
+    filename VARCHAR NOT NULL,
+    status VARCHAR,
+    user VARCHAR,
+    total_records INTEGER,
+    processed_records INTEGER,
+    success_count INTEGER,
+    failed_count INTEGER,
+    results TEXT,
+    error_message TEXT,
+    created_at DATETIME DEFAULT (CURRENT_TIMESTAMP),
+    completed_at DATETIME
+)
+"""
+
+
+LEGACY_RESULTS = [
+    {"original_name": "胸部CT平扫", "modality": "CT", "standardized": [["胸部", "胸部", "平扫"]], "status": "success"},
+    {"original_name": "未知检查", "modality": "CT", "standardized": None, "status": "failed"},
+]
+
+
+def baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.db'}")
+    with engine.begin() as conn:
+        conn.execute(text(BASELINE_TASKS_TABLE))
+        conn.execute(
+            text("INSERT INTO standardization_tasks (id, tenant_id, filename, status, results) "
+                 "VALUES ('old', 'system', 'old.xlsx', 'completed', :results)"),
+            {"results": json.dumps(LEGACY_RESULTS, ensure_ascii=False)}
+        )
+        conn.execute(text(
+            "INSERT INTO standardization_tasks (id, tenant_id, filename, status) "
+            "VALUES ('orphan', 'system', 'orphan.xlsx', 'processing')"
+        ))
+    return engine
+
+
+def task_columns(engine):
+    return {column["name"] for column in inspect(engine).get_columns("standardization_tasks")}
+
+
+class TestInitDbMigration:
+    """Test that init_db brings an existing schema up to date."""
+
+    def test_adds_missing_columns(self, tmp_path):
+        engine = baseline_engine(tmp_path)
+
+        init_db(bind=engine)
+
+        assert set(ADDED_COLUMNS["standardization_tasks"]) <= task_columns(engine)
+        with engine.connect() as conn:
+            assert conn.execute(text("SELECT filename FROM standardization_tasks")).scalar() == "old.xlsx"
+
+    def test_is_idempotent(self, tmp_path):
+        engine = baseline_engine(tmp_path)
+
+        init_db(bind=engine)
+        init_db(bind=engine)
+
+        assert set(ADDED_COLUMNS["standardization_tasks"]) <= task_columns(engine)
+
+    def test_fresh_database(self, tmp_path):
+        engine = create_engine(f"sqlite:///{tmp_path / 'fresh.db'}")
+
+        init_db(bind=engine)
+
+        assert set(ADDED_COLUMNS["standardization_tasks"]) <= task_columns(engine)
+
+
+class TestServiceOnMigratedDatabase:
+    """Test task queries against a database created by the first release."""
+
+    def test_tasks_and_legacy_results_are_readable(self, tmp_path, monkeypatch):
+        engine = baseline_engine(tmp_path)
+        init_db(bind=engine)
+        monkeypatch.setattr(service_module, "SessionLocal", sessionmaker(bind=engine))
+        service = ExaminationStandardizationService()
+
+        assert {task["id"] for task in service.get_all_tasks()} == {"old", "orphan"}
+        assert service.get_task("old")["options"] == {}
+        assert service.get_task_results("old", status="failed")[0]["original_name"] == "未知检查"
+        assert service.count_task_results("old") == 2
+
+    def test_startup_sweep_fails_orphans_without_upload(self, tmp_path, monkeypatch):
+        engine = baseline_engine(tmp_path)
+        init_db(bind=engine)
+        monkeypatch.setattr(service_module, "SessionLocal", sessionmaker(bind=engine))
+        service = ExaminationStandardizationService()
+
+        assert service.recover_interrupted_tasks() == {"resumed": 0, "failed": 1}
+        assert service.get_task("orphan")["status"] == "failed"
@@ -0,0 +1,64 @@
+"""
+Unit tests for the reviewer-correction nearest-neighbor memory
+"""
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.services import examination_correction_memory as memory_module
+from app.services import examination_result_cache as cache_module
+from app.services.examination_correction_memory import CorrectionMemory, canonical_name, edit_similarity
+from app.services.examination_result_cache import StandardizationResultCache
+
+WRIST = [["上肢", "腕关节", "正位"], ["上肢", "腕关节", "侧位"]]
+
+
+@pytest.fixture
+def session_factory(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'memory.db'}")
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(memory_module, "SessionLocal", factory)
+    monkeypatch.setattr(cache_module, "SessionLocal", factory)
+    return factory
+
+
+class TestSimilarity:
+    """Test canonical names and edit similarity."""
+
+    def test_canonical_name_drops_laterality_and_film(self):
+        assert canonical_name("左腕关节正侧位片") == canonical_name("右腕关节 正侧位") == "腕关节正侧位"
+        assert canonical_name("双侧膝关节（负重）") == "膝关节负重"
+
+    def test_edit_similarity(self):
+        assert edit_similarity("腕关节正侧位", "腕关节正侧位") == 1.0
+        assert edit_similarity("腕关节正位", "腕关节侧位") == pytest.approx(0.8)
+        assert edit_similarity("", "腕关节") == 0.0
+
+
+class TestCorrectionMemory:
+    """Test indexing and lookup."""
+
+    def test_nearest_variant_same_modality_only(self, session_factory):
+        memory = CorrectionMemory()
+        memory.add("左腕关节正侧位片", "DR", WRIST)
+        memory.add("胸部CT平扫", "CT", [["胸部", "胸部", "平扫"]])
+
+        matches = memory.nearest("右腕关节正侧位", "DR", 0.85)
+        assert [m["triples"] for m in matches] == [WRIST]
+        assert matches[0]["similarity"] == 1.0
+        assert memory.nearest("右腕关节正侧位", "CT", 0.85) == []
+        assert memory.nearest("腕关节正侧位加拍", "DR", 0.85) == []
+        assert memory.get_stats()["lookups"] == 3
+
+    @pytest.mark.asyncio
+    async def test_loads_manual_cache_entries(self, session_factory):
+        cache = StandardizationResultCache()
+        await cache.put_manual("左腕关节正侧位片", "DR", "v1", WRIST)
+        await cache.put("腕关节正侧位加拍", "DR", "v1", WRIST, "success")  # LLM entry, not a correction
+
+        memory = CorrectionMemory()
+        assert memory.nearest("右腕关节正侧位", "DR", 0.85)[0]["triples"] == WRIST
+        assert memory.get_stats()["entries"] == 1
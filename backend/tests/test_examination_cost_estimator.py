@@ -0,0 +1,61 @@
+"""
+Unit tests for dry-run token counting and projections
+"""
+
+import threading
+
+import pytest
+
+from app.services import examination_cost_estimator as estimator_module
+from app.services.examination_cost_estimator import CostEstimate, TokenCounter, get_token_counter
+
+
+class TestTokenCounter:
+    """Test the tokenizer fallback."""
+
+    def test_heuristic_counts_cjk_per_character(self, monkeypatch):
+        monkeypatch.setattr(estimator_module, "HAS_TIKTOKEN", False)
+        counter = TokenCounter("gpt-4")
+
+        assert counter.name == "heuristic"
+        assert counter.count("") == 0
+        assert counter.count("胸部CT平扫") == 4 + 1
+        assert counter.count("（总院）") == 4
+
+    @pytest.mark.asyncio
+    async def test_shared_counter_is_built_once_off_the_event_loop(self, monkeypatch):
+        built = []
+
+        class RecordingCounter(TokenCounter):
+            def __init__(self, model=None):
+                built.append(threading.current_thread())
+                super().__init__(model)
+
+        monkeypatch.setattr(estimator_module, "HAS_TIKTOKEN", False)
+        monkeypatch.setattr(estimator_module, "TokenCounter", RecordingCounter)
+        monkeypatch.setattr(estimator_module, "_counters", {})
+
+        first = await get_token_counter("gpt-4")
+        second = await get_token_counter("gpt-4")
+
+        assert first is second
+        assert len(built) == 1
+        assert built[0] is not threading.main_thread()
+
+
+class TestCostEstimate:
+    """Test wall-time projection."""
+
+    def test_wall_time_bounded_by_slots_and_limiter(self):
+        estimate = CostEstimate()
+        for _ in range(100):
+            estimate.add_call(200, 20)
+        estimate.rounds = 100
+
+        projection = estimate.projection(2.0, concurrency=10, llm_limit=50)
+        assert projection["llm_calls"] == 100
+        assert projection["total_tokens"] == 22000
+        assert projection["estimated_wall_s"] == 20.0
+
+        # A tighter shared limiter dominates the task's own slots
+        assert estimate.projection(2.0, concurrency=10, llm_limit=4)["estimated_wall_s"] == 50.0
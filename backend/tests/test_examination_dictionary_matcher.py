@@ -0,0 +1,92 @@
+"""
+Unit tests for the deterministic examination dictionary matcher
+"""
+
+import pytest
+from app.services.examination_dictionary_matcher import AhoCorasick, DictionaryMatcher, normalize_modality
+from app.services.examination_kg_initializer import EXAMINATION_ONTOLOGY
+from app.services.examination_kg_service import ExaminationKGService
+from app.services.examination_ontology_snapshot import OntologySnapshot
+from app.services.examination_standardization_service import ExaminationStandardizationService
+
+
+TREE = {
+    "上肢": {"手指": ["正位", "侧位", "斜位"], "锁骨": ["正位"]},
+    "下肢": {"膝关节": ["正位", "侧位", "平扫"]},
+    "胸部": {"胸部": ["正位", "平扫"], "锁骨": ["正位"]},
+}
+METHOD_MODALITIES = {"正位": ["DR"], "侧位": ["DR"], "斜位": ["DR"], "平扫": ["CT", "MRI"]}
+
+
+def build_matcher():
+    snapshot = OntologySnapshot.build(TREE, METHOD_MODALITIES)
+    return DictionaryMatcher(snapshot, EXAMINATION_ONTOLOGY["aliases"])
+
+
+class TestAhoCorasick:
+    """Test the automaton itself."""
+
+    def test_find_all_overlapping(self):
+        automaton = AhoCorasick({"he": 1, "she": 1, "his": 1, "hers": 1})
+
+        assert automaton.find_all("ushers") == [(1, 4, "she"), (2, 4, "he"), (2, 6, "hers")]
+
+    def test_find_longest_prefers_alias(self):
+        automaton = AhoCorasick({"正侧位": 1, "侧位": 1, "正位": 1})
+
+        assert automaton.find_longest("手指正侧位片") == [(2, 5, "正侧位")]
+
+
+class TestDictionaryMatcher:
+    """Test unambiguous matching rules."""
+
+    def setup_method(self):
+        self.matcher = build_matcher()
+
+    def test_alias_expansion(self):
+        assert self.matcher.match("单手指正侧位片", "DR") == [
+            ["上肢", "手指", "正位"],
+            ["上肢", "手指", "侧位"],
+        ]
+
+    def test_modality_hint_in_name(self):
+        assert self.matcher.match("左膝关节CT平扫", "CT") == [["下肢", "膝关节", "平扫"]]
+
+    def test_modality_conflict_falls_through(self):
+        # 正位 is a DR-only method
+        assert self.matcher.match("膝关节正位", "CT") is None
+
+    def test_multiple_parts_fall_through(self):
+        assert self.matcher.match("手指正位、膝关节正位", "DR") is None
+
+    def test_ambiguous_level1_falls_through(self):
+        # 锁骨 belongs to both 上肢 and 胸部
+        assert self.matcher.match("锁骨正位", "DR") is None
+
+    def test_unexplained_text_falls_through(self):
+        assert self.matcher.match("手指正位（测骨龄）", "DR") is None
+
+    def test_normalize_modality(self):
+        assert normalize_modality("mr") == "MRI"
+        assert normalize_modality("CT") == "CT"
+        assert normalize_modality(None) == ""
+
+
+class TestDictionaryStage:
+    """Test the matcher runs before the LLM flow."""
+
+    @pytest.mark.asyncio
+    async def test_dictionary_hit_skips_llm(self):
+        service = ExaminationStandardizationService()
+        service.kg = ExaminationKGService()
+        service.kg.snapshots.install(OntologySnapshot.build(TREE, METHOD_MODALITIES))
+
+        async def fail_llm(prompt, **kwargs):
+            raise AssertionError("LLM must not be called for dictionary hits")
+        service._call_llm = fail_llm
+
+        result = await service._standardize_single("双膝关节正侧位", "DR")
+
+        assert result["source"] == "dictionary"
+        assert result["status"] == "success"
+        assert result["result"] == [["下肢", "膝关节", "正位"], ["下肢", "膝关节", "侧位"]]
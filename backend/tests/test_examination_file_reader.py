@@ -0,0 +1,66 @@
+"""
+Unit tests for the streaming examination file reader
+"""
+
+import pytest
+from openpyxl import Workbook
+
+from app.services.examination_file_reader import aiter_records, count_records, iter_record_chunks
+
+
+CSV = "检查项目名,检查标准模态\n手指正位,DR\n\"胸部CT,平扫\",CT\n\n腰椎正侧位,DR\n".encode("utf-8")
+
+
+@pytest.fixture
+def xlsx_path(tmp_path):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["检查项目名", "检查标准模态"])
+    sheet.append(["手指正位", "DR"])
+    sheet.append([None, None])
+    sheet.append(["胸部CT平扫", "CT"])
+    path = tmp_path / "exams.xlsx"
+    workbook.save(path)
+    return str(path)
+
+
+class TestIterRecordChunks:
+    """Test chunked parsing."""
+
+    def test_csv_chunks(self):
+        chunks = list(iter_record_chunks(CSV, "exams.CSV", chunk_size=2))
+
+        assert [len(chunk) for chunk in chunks] == [2, 1]
+        assert chunks[0][1] == {"检查项目名": "胸部CT,平扫", "检查标准模态": "CT"}
+
+    def test_xlsx_read_only(self, xlsx_path):
+        chunks = list(iter_record_chunks(xlsx_path, "exams.xlsx", chunk_size=10))
+
+        assert chunks == [[
+            {"检查项目名": "手指正位", "检查标准模态": "DR"},
+            {"检查项目名": "胸部CT平扫", "检查标准模态": "CT"},
+        ]]
+
+
+class TestCountRecords:
+    """Test cheap row counting."""
+
+    def test_csv_skips_blank_lines(self, tmp_path):
+        path = tmp_path / "exams.csv"
+        path.write_bytes(CSV)
+
+        assert count_records(str(path), "exams.csv") == 3
+
+    def test_xlsx_dimension(self, xlsx_path):
+        assert count_records(xlsx_path, "exams.xlsx") == 3
+
+
+class TestAiterRecords:
+    """Test the async record stream."""
+
+    @pytest.mark.asyncio
+    async def test_row_indexes_continue_across_chunks(self):
+        records = [item async for item in aiter_records(CSV, "exams.csv", chunk_size=1)]
+
+        assert [index for index, _ in records] == [0, 1, 2]
+        assert records[2][1]["检查项目名"] == "腰椎正侧位"
@@ -0,0 +1,112 @@
+"""
+Unit tests for Examination KG Service (no live Neo4j required)
+"""
+
+import asyncio
+import pytest
+from app.services.examination_kg_service import ExaminationKGService
+from app.services.examination_ontology_snapshot import OntologySnapshot
+
+
+class FakeNeo4j:
+    """Answers the bulk validation query from a fixed set of paths."""
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.queries = []
+
+    async def execute_query(self, query, params=None):
+        self.queries.append(query)
+        return [
+            {**path, "exists": (path["level1"], path["level2"], path["method"]) in self.paths}
+            for path in params["paths"]
+        ]
+
+
+class TestValidatePathsBulk:
+    """Test batched path validation."""
+
+    def setup_method(self):
+        self.service = ExaminationKGService()
+        self.triples = [
+            ["上肢", "手指", "正位"],
+            ["上肢", "手指", "轴位"],
+            ["上肢", "手指"],
+            ["上肢", "手指", "正位"],
+        ]
+
+    @pytest.mark.asyncio
+    async def test_single_round_trip(self):
+        self.service.neo4j = FakeNeo4j({("上肢", "手指", "正位")})
+
+        flags = await self.service.validate_paths_bulk(self.triples)
+
+        assert flags == [True, False, False, True]
+        assert len(self.service.neo4j.queries) == 1
+        assert "UNWIND" in self.service.neo4j.queries[0]
+
+    @pytest.mark.asyncio
+    async def test_offline_uses_snapshot(self):
+        self.service.neo4j = FakeNeo4j(set())
+        self.service.snapshots.install(OntologySnapshot.build({"上肢": {"手指": ["正位"]}}))
+
+        flags = await self.service.validate_paths_bulk(self.triples, offline=True)
+
+        assert flags == [True, False, False, True]
+        assert self.service.neo4j.queries == []
+
+    @pytest.mark.asyncio
+    async def test_empty_input(self):
+        self.service.neo4j = FakeNeo4j(set())
+
+        assert await self.service.validate_paths_bulk([]) == []
+        assert self.service.neo4j.queries == []
+
+
+class SlowTreeNeo4j:
+    """Answers the tree query after a short delay, counting round trips."""
+
+    def __init__(self):
+        self.queries = 0
+
+    async def execute_query(self, query, params=None):
+        self.queries += 1
+        await asyncio.sleep(0.01)
+        return [{"level1": "上肢", "level2": "手指", "methods": ["正位"]}]
+
+
+class TestSingleFlightReads:
+    """Test coalescing of concurrent read queries."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_tree_reads_share_one_query(self):
+        service = ExaminationKGService()
+        service.neo4j = SlowTreeNeo4j()
+
+        trees = await asyncio.gather(*(service.get_complete_tree() for _ in range(10)))
+
+        assert service.neo4j.queries == 1
+        assert all(tree == {"上肢": {"手指": ["正位"]}} for tree in trees)
+
+    @pytest.mark.asyncio
+    async def test_sequential_reads_are_not_cached(self):
+        service = ExaminationKGService()
+        service.neo4j = SlowTreeNeo4j()
+
+        await service.get_complete_tree()
+        await service.get_complete_tree()
+
+        assert service.neo4j.queries == 2
+
+    @pytest.mark.asyncio
+    async def test_refresh_after_write_does_not_join_older_read(self):
+        service = ExaminationKGService()
+        service.neo4j = SlowTreeNeo4j()
+
+        before_import = asyncio.create_task(service.get_complete_tree())
+        await asyncio.sleep(0)
+        await service.refresh_snapshot()
+        await before_import
+
+        # The refresh issued its own tree query instead of sharing the older one
+        assert service.neo4j.queries == 3
@@ -0,0 +1,36 @@
+"""
+Unit tests for compound exam-name splitting
+"""
+
+import pytest
+
+from app.services.examination_name_splitter import is_compound, split_exam_name
+
+
+class TestSplitExamName:
+    """Test separators, annotations and idempotence."""
+
+    @pytest.mark.parametrize("name, fragments", [
+        ("颈椎正侧位片，胸椎正侧片，腰椎正侧位片", ["颈椎正侧位片", "胸椎正侧片", "腰椎正侧位片"]),
+        ("肋骨双斜位片、肋骨正位片", ["肋骨双斜位片", "肋骨正位片"]),
+        ("颅脑CT平扫（总院）|颈椎间盘CT平扫（总院）", ["颅脑CT平扫", "颈椎间盘CT平扫"]),
+        ("上腹部CT增强,下腹部CT增强;盆腔CT增强", ["上腹部CT增强", "下腹部CT增强", "盆腔CT增强"]),
+        ("颅脑平扫(64排)(CT头部)", ["颅脑平扫(CT头部)"]),
+        ("胸部CT平扫+能量成像", ["胸部CT平扫+能量成像"]),
+        ("上腹部CT增强,上腹部CT增强", ["上腹部CT增强"]),
+        ("（总院）", ["（总院）"]),
+        # data/示例数据.csv: a bracketed enumeration belongs to one exam
+        ("CT平扫右上肢（手、腕、尺桡骨、肘、肱骨）()", ["CT平扫右上肢（手、腕、尺桡骨、肘、肱骨）"]),
+        ("CT平扫左下肢（股骨、胫腓骨、踝、足）,胸部CT平扫", ["CT平扫左下肢（股骨、胫腓骨、踝、足）", "胸部CT平扫"]),
+        ("64排CT(颈椎）、颅脑CT平扫", ["64排CT(颈椎）", "颅脑CT平扫"]),
+    ])
+    def test_split(self, name, fragments):
+        assert split_exam_name(name) == fragments
+
+    def test_fragments_do_not_split_again(self):
+        for fragment in split_exam_name("颅脑CT平扫（东院）| 颈椎间盘CT平扫()"):
+            assert not is_compound(fragment)
+
+    def test_plain_name_is_not_compound(self):
+        assert not is_compound("单手指正侧位片")
+        assert is_compound("胸部CT平扫（总院）")
@@ -0,0 +1,97 @@
+"""
+Unit tests for the in-memory examination ontology snapshot
+"""
+
+import pytest
+from app.services.examination_ontology_snapshot import OntologySnapshot, OntologySnapshotStore
+
+
+TREE = {
+    "上肢": {"手指": ["正位", "侧位"], "锁骨": ["正位"]},
+    "胸部": {"胸部": ["平扫", "增强"], "锁骨": ["正位"]},
+}
+METHOD_MODALITIES = {"正位": ["DR"], "侧位": ["DR"], "平扫": ["CT", "MRI"], "增强": ["CT"]}
+
+
+class FakeKG:
+    """Counts KG round trips made by the snapshot store."""
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.calls = 0
+
+    async def get_complete_tree(self):
+        self.calls += 1
+        return self.tree
+
+    async def get_method_modalities(self):
+        return METHOD_MODALITIES
+
+
+class TestOntologySnapshot:
+    """Test snapshot lookups."""
+
+    def test_lookups(self):
+        snapshot = OntologySnapshot.build(TREE, METHOD_MODALITIES)
+
+        assert snapshot.level1_parts == ("上肢", "胸部")
+        assert snapshot.get_level2_parts("上肢") == ["手指", "锁骨"]
+        assert snapshot.get_methods_by_modality("CT") == ["增强", "平扫"]
+        assert snapshot.level1_by_level2["锁骨"] == ("上肢", "胸部")
+        assert snapshot.has_path("上肢", "手指", "侧位")
+        assert not snapshot.has_path("胸部", "手指", "侧位")
+
+    def test_version_is_content_hash(self):
+        a = OntologySnapshot.build(TREE, METHOD_MODALITIES)
+        b = OntologySnapshot.build(TREE, METHOD_MODALITIES)
+        c = OntologySnapshot.build({"上肢": {"手指": ["正位"]}}, METHOD_MODALITIES)
+
+        assert a.version == b.version
+        assert a.version != c.version
+
+    def test_snapshot_is_immutable(self):
+        snapshot = OntologySnapshot.build(TREE, METHOD_MODALITIES)
+
+        with pytest.raises(TypeError):
+            snapshot.tree["腹部"] = {}
+        with pytest.raises(Exception):
+            snapshot.version = "other"
+
+    def test_from_rows(self):
+        rows = [
+            {"一级部位": "上肢", "二级部位": "手指", "检查方法": "正位", "检查模态": "DR"},
+            {"一级部位": "上肢", "二级部位": "手指", "检查方法": "侧位", "检查模态": "DR"},
+        ]
+        snapshot = OntologySnapshot.from_rows(rows)
+
+        assert snapshot.to_tree() == {"上肢": {"手指": ["侧位", "正位"]}}
+        assert snapshot.get_methods_by_modality("DR") == ["侧位", "正位"]
+
+
+class TestOntologySnapshotStore:
+    """Test loading and atomic refresh."""
+
+    @pytest.mark.asyncio
+    async def test_loads_once(self):
+        kg = FakeKG(TREE)
+        store = OntologySnapshotStore(kg)
+
+        first = await store.get()
+        second = await store.get()
+
+        assert first is second
+        assert kg.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_refresh_swaps_snapshot(self):
+        kg = FakeKG(TREE)
+        store = OntologySnapshotStore(kg)
+        old = await store.get()
+
+        kg.tree = {"上肢": {"手指": ["正位"]}}
+        new = await store.refresh()
+
+        assert new.version != old.version
+        assert await store.get() is new
+        # Readers holding the old snapshot keep a consistent view
+        assert old.has_path("胸部", "胸部", "平扫")
@@ -0,0 +1,814 @@
+"""
+Pipeline tests for ExaminationStandardizationService.process_file
+(SQLite in a temp dir, in-memory ontology, stubbed LLM stage)
+"""
+
+import json
+import re
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.exceptions import LLMOverloadedError
+from app.db.base import Base
+from app.db.models import StandardizationResult, StandardizationTask
+from app.services import examination_correction_memory as memory_module
+from app.services import examination_result_cache as cache_module
+from app.services import examination_standardization_service as service_module
+from app.services.examination_correction_memory import CorrectionMemory
+from app.services.examination_kg_service import ExaminationKGService
+from app.services.examination_ontology_snapshot import OntologySnapshot
+from app.services.examination_result_cache import StandardizationResultCache
+from app.services.examination_standardization_service import ExaminationStandardizationService
+
+
+TREE = {
+    "上肢": {"手指": ["正位", "侧位"]},
+    "胸部": {"胸部": ["平扫"]},
+}
+METHOD_MODALITIES = {"正位": ["DR"], "侧位": ["DR"], "平扫": ["CT"]}
+
+
+def build_service(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pipeline.db'}")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(service_module, "SessionLocal", session_factory)
+    monkeypatch.setattr(cache_module, "SessionLocal", session_factory)
+    monkeypatch.setattr(memory_module, "SessionLocal", session_factory)
+
+    svc = ExaminationStandardizationService()
+    svc.kg = ExaminationKGService()
+    svc.kg.snapshots.install(OntologySnapshot.build(TREE, METHOD_MODALITIES))
+    svc.result_cache = StandardizationResultCache()
+    svc.correction_memory = CorrectionMemory()
+    svc.llm_calls = []
+
+    svc.scheduled_syncs = []
+    svc.schedule_kag_sync = svc.scheduled_syncs.append
+    return svc
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """Service wired to a throwaway DB, a fixed ontology and a counting fake LLM stage."""
+    svc = build_service(tmp_path, monkeypatch)
+
+    async def fake_llm_stage(exam_name, modality):
+        svc.llm_calls.append(exam_name)
+        if "未知" in exam_name:
+            return None
+        return {"result": [["胸部", "胸部", "平扫"]], "status": "success", "source": "llm"}
+
+    original_single = svc._standardize_single
+
+    async def standardize_single(exam_name, modality, **kwargs):
+        result = await original_single(exam_name, modality, **kwargs)
+        if result and result.get("source") in ("dictionary", "correction"):
+            return result
+        return await fake_llm_stage(exam_name, modality)
+
+    svc._standardize_single = standardize_single
+    return svc
+
+
+@pytest.fixture
+def batch_service(tmp_path, monkeypatch):
+    """Service whose `_call_llm` answers batch prompts from a fixed table."""
+    svc = build_service(tmp_path, monkeypatch)
+    answers = {
+        "胸部CT增强扫描": (["胸部"], [["胸部", "胸部", "平扫"]]),
+        "胸部CT平扫(急诊)": (["胸部"], [["胸部", "胸部", "平扫"]]),
+        "肺部CT": (["胸部"], None),  # dropped from the stage 2 answer
+    }
+
+    async def fake_call_llm(prompt, max_tokens=500, **kwargs):
+        svc.llm_calls.append(prompt)
+        rows = dict(re.findall(r'^"(\d+)": (.+)$', prompt, re.M))
+        if rows and "一级检查部位" in prompt:
+            return json.dumps({row_id: answers[name][0] for row_id, name in rows.items()})
+        if rows:
+            return "```json\n" + json.dumps({
+                row_id: answers[name][1] for row_id, name in rows.items() if answers[name][1]
+            }) + "\n```"
+        # Single-mode fallback prompts
+        return '["胸部"]' if "一级检查部位" in prompt else '[["胸部", "胸部", "平扫"]]'
+
+    svc._call_llm = fake_call_llm
+    return svc
+
+
+@pytest.fixture
+def single_pass_service(tmp_path, monkeypatch):
+    """Service whose `_call_llm` only understands single-pass prompts."""
+    svc = build_service(tmp_path, monkeypatch)
+
+    async def fake_call_llm(prompt, max_tokens=500, **kwargs):
+        svc.llm_calls.append(prompt)
+        assert "一级检查部位" not in prompt
+        rows = re.findall(r'^"(\d+)": ', prompt, re.M)
+        if rows:
+            return json.dumps({row_id: [["胸部", "胸部", "平扫"]] for row_id in rows})
+        return '[["胸部", "胸部", "平扫"], ["胸部", "胸部", "冠状位"]]'
+
+    svc._call_llm = fake_call_llm
+    return svc
+
+
+def make_csv(rows):
+    lines = ["检查项目名,检查标准模态"] + [f"{name},{modality}" for name, modality in rows]
+    return "\n".join(lines).encode("utf-8")
+
+
+class TestProcessFileDedup:
+    """Test intra-file deduplication."""
+
+    @pytest.mark.asyncio
+    async def test_distinct_keys_standardized_once(self, service):
+        rows = [("胸部CT增强扫描", "CT")] * 5 + [("手指正位", "DR"), ("胸部ＣＴ增强扫描 ", "CT"), ("未知检查", "CT")]
+        task_id = service.create_task("dedup.csv")
+
+        await service.process_file(task_id, make_csv(rows), "dedup.csv")
+
+        task = service.get_task(task_id)
+        results = service.get_task_results(task_id)
+
+        # 胸部CT增强扫描 (6 rows incl. full-width variant) and 未知检查 each hit the LLM once
+        assert sorted(service.llm_calls) == ["未知检查", "胸部CT增强扫描"]
+        assert [r["original_name"] for r in results] == [name for name, _ in rows]
+        assert results[5]["source"] == "dictionary"
+        assert results[6]["standardized"] == [["胸部", "胸部", "平扫"]]
+        assert results[7]["status"] == "failed"
+
+        assert task["status"] == "completed"
+        assert task["processed_records"] == 8
+        assert task["success_count"] == 7
+        assert task["failed_count"] == 1
+        assert task["stats"]["distinct_keys"] == 3
+        assert task["stats"]["duplicate_rows"] == 5
+
+    @pytest.mark.asyncio
+    async def test_reupload_served_from_cache(self, service):
+        rows = [("胸部CT增强扫描", "CT")]
+        first = service.create_task("a.csv")
+        await service.process_file(first, make_csv(rows), "a.csv")
+        second = service.create_task("b.csv")
+        await service.process_file(second, make_csv(rows), "b.csv")
+
+        assert service.llm_calls == ["胸部CT增强扫描"]
+        assert service.get_task_results(second)[0]["source"] == "cache"
+        assert service.get_task(second)["stats"]["cache_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_manual_correction_overrides_cache(self, service):
+        rows = [("胸部CT增强扫描", "CT")]
+        first = service.create_task("a.csv")
+        await service.process_file(first, make_csv(rows), "a.csv")
+
+        corrected = service.get_task_results(first)
+        corrected[0]["standardized"] = [["胸部", "胸部", "增强"]]
+        assert await service.update_task_results(first, corrected)
+
+        service.result_cache.clear_memory()
+        second = service.create_task("b.csv")
+        await service.process_file(second, make_csv(rows), "b.csv")
+
+        assert service.get_task_results(second)[0]["standardized"] == [["胸部", "胸部", "增强"]]
+        assert service.llm_calls == ["胸部CT增强扫描"]
+
+    @pytest.mark.asyncio
+    async def test_filtered_page_is_matched_on_row_index(self, service):
+        rows = [("胸部CT增强扫描", "CT"), ("未知检查", "CT"), ("手指正位", "DR"), ("未知检查二", "CT")]
+        task_id = service.create_task("rows.csv")
+        await service.process_file(task_id, make_csv(rows), "rows.csv")
+
+        page = service.get_task_results(task_id, status="failed", offset=1, limit=1)
+        assert [row["row_index"] for row in page] == [3]
+        page[0]["standardized"] = [["胸部", "胸部", "平扫"]]
+        page[0]["status"] = "success"
+        assert await service.update_task_results(task_id, page)
+
+        results = service.get_task_results(task_id)
+        assert results[3]["standardized"] == [["胸部", "胸部", "平扫"]]
+        assert results[3]["source"] == "manual"
+        assert results[0]["source"] == "llm"
+        assert results[1]["status"] == "failed"
+
+    @pytest.mark.asyncio
+    async def test_unknown_or_missing_row_index_is_rejected(self, service):
+        task_id = service.create_task("rows.csv")
+        await service.process_file(task_id, make_csv([("未知检查", "CT")]), "rows.csv")
+        correction = {"original_name": "未知检查", "modality": "CT", "standardized": [["胸部", "胸部", "平扫"]]}
+
+        assert not await service.update_task_results(task_id, [{**correction, "row_index": 7}])
+        assert not await service.update_task_results(task_id, [correction])
+        assert service.get_task_results(task_id)[0]["status"] == "failed"
+
+
+class TestProcessFileRateLimits:
+    """Test that rate-limited records stay in the pipeline."""
+
+    @pytest.mark.asyncio
+    async def test_overloaded_record_is_requeued(self, service, monkeypatch):
+        monkeypatch.setattr(service_module.settings, "LLM_RETRY_BASE_DELAY", 0.001)
+        inner = service._standardize_single
+        throttled = []
+
+        async def flaky_single(exam_name, modality, **kwargs):
+            if len(throttled) < 2:
+                throttled.append(exam_name)
+                raise LLMOverloadedError("rate limited")
+            return await inner(exam_name, modality, **kwargs)
+
+        service._standardize_single = flaky_single
+        task_id = service.create_task("limits.csv")
+
+        await service.process_file(task_id, make_csv([("胸部CT增强扫描", "CT")]), "limits.csv")
+
+        task = service.get_task(task_id)
+        assert task["success_count"] == 1
+        assert task["failed_count"] == 0
+        assert task["stats"]["llm_requeued"] == 2
+
+
+class TestProcessFileBatchMode:
+    """Test multi-record prompts (batch_size > 1)."""
+
+    @pytest.mark.asyncio
+    async def test_batches_share_prompts_and_fall_back_per_item(self, batch_service):
+        rows = [("胸部CT增强扫描", "CT"), ("胸部CT平扫(急诊)", "CT"), ("肺部CT", "CT"), ("手指正位", "DR")]
+        task_id = batch_service.create_task("batch.csv", options={"batch_size": 10})
+
+        await batch_service.process_file(task_id, make_csv(rows), "batch.csv")
+
+        task = batch_service.get_task(task_id)
+        results = batch_service.get_task_results(task_id)
+
+        # 1 stage-1 + 1 stage-2 batch prompt, then 2 single-mode calls for 肺部CT
+        assert len(batch_service.llm_calls) == 4
+        assert [r["status"] for r in results] == ["success"] * 4
+        assert results[3]["source"] == "dictionary"
+        assert task["options"] == {"batch_size": 10}
+        assert task["stats"]["llm_batches"] == 1
+        assert task["stats"]["batch_fallbacks"] == 1
+
+    def test_parse_batch_response(self, batch_service):
+        parse = batch_service._parse_batch_response
+
+        assert parse('结果如下: {"1": [["胸部", "胸部", "平扫"]], "2": []}') == {"1": [["胸部", "胸部", "平扫"]], "2": []}
+        assert parse("[1, 2]") == {}
+        assert parse("not json") == {}
+        assert batch_service._coerce_triples(["胸部", "胸部", "平扫"]) == [["胸部", "胸部", "平扫"]]
+        assert batch_service._coerce_triples([["胸部", "胸部"], "x"]) == []
+
+    @pytest.mark.asyncio
+    async def test_batches_never_mix_modalities(self):
+        async def keys():
+            for key in [("A", "CT"), ("B", "DR"), ("C", "CT"), ("D", "CT")]:
+                yield key
+
+        batches = [batch async for batch in ExaminationStandardizationService._batch_by_modality(keys(), 2)]
+
+        assert batches == [[("A", "CT"), ("C", "CT")], [("B", "DR")], [("D", "CT")]]
+
+
+class TestProcessFileSinglePass:
+    """Test single-pass mode (one LLM call per name with the ontology tree)."""
+
+    @pytest.mark.asyncio
+    async def test_one_call_per_name_and_still_validated(self, single_pass_service):
+        rows = [("胸部CT增强扫描", "CT"), ("手指正位", "DR")]
+        task_id = single_pass_service.create_task("single.csv", options={"mode": "single_pass"})
+
+        await single_pass_service.process_file(task_id, make_csv(rows), "single.csv")
+
+        results = single_pass_service.get_task_results(task_id)
+        (prompt,) = single_pass_service.llm_calls
+        # Tree is filtered to the CT methods; DR-only parts are left out
+        assert "胸部: 胸部[平扫]" in prompt
+        assert "手指[" not in prompt
+        # 冠状位 is not in the ontology, so KG validation flags the row
+        assert results[0]["status"] == "review_required"
+        assert results[1]["source"] == "dictionary"
+        assert single_pass_service.get_task(task_id)["stats"]["mode"] == "single_pass"
+
+    @pytest.mark.asyncio
+    async def test_single_pass_batches(self, single_pass_service):
+        rows = [("胸部CT增强扫描", "CT"), ("胸部CT平扫(急诊)", "CT")]
+        task_id = single_pass_service.create_task("single.csv", options={"mode": "single_pass", "batch_size": 5})
+
+        await single_pass_service.process_file(task_id, make_csv(rows), "single.csv")
+
+        results = single_pass_service.get_task_results(task_id)
+        assert len(single_pass_service.llm_calls) == 1
+        assert [r["status"] for r in results] == ["success", "success"]
+
+
+class TestRowLevelResults:
+    """Test the standardization_results child table."""
+
+    @pytest.mark.asyncio
+    async def test_paginated_and_filtered_reads(self, service):
+        rows = [("胸部CT增强扫描", "CT"), ("未知检查", "CT"), ("手指正位", "DR"), ("胸部CT增强扫描", "CT")]
+        task_id = service.create_task("rows.csv")
+        await service.process_file(task_id, make_csv(rows), "rows.csv")
+
+        page = service.get_task_results(task_id, offset=1, limit=2)
+        failed = service.get_task_results(task_id, status="failed")
+
+        assert [r["row_index"] for r in page] == [1, 2]
+        assert [r["original_name"] for r in failed] == ["未知检查"]
+        assert service.count_task_results(task_id) == 4
+        assert service.count_task_results(task_id, status="success") == 3
+        assert [r["row_index"] for r in service.iter_task_results(task_id, page_size=3)] == [0, 1, 2, 3]
+
+    @pytest.mark.asyncio
+    async def test_single_row_correction(self, service):
+        rows = [("胸部CT增强扫描", "CT"), ("未知检查", "CT")]
+        task_id = service.create_task("rows.csv")
+        await service.process_file(task_id, make_csv(rows), "rows.csv")
+
+        row = await service.update_task_result(task_id, 1, [["胸部", "胸部", "平扫"]])
+
+        assert row["status"] == "success"
+        assert row["source"] == "manual"
+        assert service.get_task_results(task_id, status="failed") == []
+        assert await service.update_task_result(task_id, 99, []) is None
+        # Correction is remembered for later uploads
+        cached = await service.result_cache.get("未知检查", "CT", (await service.kg.get_snapshot()).version)
+        assert cached["cached_source"] == "manual"
+
+    def test_legacy_blob_tasks_still_readable(self, service):
+        legacy = [
+            {"original_name": "胸部CT", "modality": "CT", "standardized": [["胸部", "胸部", "平扫"]], "status": "success"},
+            {"original_name": "未知", "modality": "CT", "standardized": None, "status": "failed"},
+        ]
+        task_id = service.create_task("legacy.csv")
+        db = service_module.SessionLocal()
+        try:
+            task = db.query(StandardizationTask).filter(StandardizationTask.id == task_id).first()
+            task.results = json.dumps(legacy, ensure_ascii=False)
+            db.commit()
+        finally:
+            db.close()
+
+        assert service.get_task_results(task_id) == legacy
+        assert service.get_task_results(task_id, status="failed", limit=5) == legacy[1:]
+        assert list(service.iter_task_results(task_id)) == legacy
+
+    @pytest.mark.asyncio
+    async def test_legacy_blob_updates(self, service):
+        legacy = [
+            {"original_name": "胸部CT", "modality": "CT", "standardized": [["胸部", "胸部", "平扫"]], "status": "success"},
+            {"original_name": "未知", "modality": "CT", "standardized": None, "status": "failed"},
+        ]
+        task_id = service.create_task("legacy.csv")
+        db = service_module.SessionLocal()
+        try:
+            task = db.query(StandardizationTask).filter(StandardizationTask.id == task_id).first()
+            task.results = json.dumps(legacy, ensure_ascii=False)
+            db.commit()
+        finally:
+            db.close()
+
+        # A filtered page has no row_index on legacy rows and is not the full list
+        page = service.get_task_results(task_id, status="failed")
+        page[0]["standardized"] = [["胸部", "胸部", "平扫"]]
+        assert not await service.update_task_results(task_id, page)
+
+        assert await service.update_task_results(task_id, [{**page[0], "row_index": 1}])
+        assert service.get_task_results(task_id)[1]["standardized"] == [["胸部", "胸部", "平扫"]]
+        assert service.get_task_results(task_id)[0] == legacy[0]
+
+    @pytest.mark.asyncio
+    async def test_delete_task_removes_rows(self, service):
+        task_id = service.create_task("rows.csv")
+        await service.process_file(task_id, make_csv([("手指正位", "DR")]), "rows.csv")
+
+        assert service.delete_task(task_id)
+
+        db = service_module.SessionLocal()
+        try:
+            assert db.query(StandardizationResult).filter(StandardizationResult.task_id == task_id).count() == 0
+        finally:
+            db.close()
+
+
+class TestProcessFileFromDisk:
+    """Test processing a spooled upload."""
+
+    @pytest.mark.asyncio
+    async def test_xlsx_path_source(self, service, tmp_path):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(["检查项目名", "检查标准模态"])
+        for name, modality in [("手指正位", "DR"), ("胸部CT增强扫描", "CT"), ("手指正位", "DR")]:
+            sheet.append([name, modality])
+        path = tmp_path / "upload.xlsx"
+        workbook.save(path)
+        task_id = service.create_task("upload.xlsx")
+
+        await service.process_file(task_id, str(path), "upload.xlsx")
+
+        task = service.get_task(task_id)
+        results = service.get_task_results(task_id)
+        assert task["total_records"] == 3
+        assert task["stats"]["distinct_keys"] == 2
+        assert [r["original_name"] for r in results] == ["手指正位", "胸部CT增强扫描", "手指正位"]
+        assert results[2]["source"] == "dictionary"
+
+
+class TestResumableTasks:
+    """Test checkpoint-based resume and startup recovery."""
+
+    def interrupted_task(self, service, tmp_path, rows, done):
+        path = tmp_path / "interrupted.csv"
+        path.write_bytes(make_csv(rows))
+        task_id = service.create_task("interrupted.csv")
+        db = service_module.SessionLocal()
+        try:
+            db.query(StandardizationTask).filter(StandardizationTask.id == task_id).update(
+                {"file_path": str(path), "processed_records": len(done)}
+            )
+            db.add_all(
+                StandardizationResult(
+                    task_id=task_id, row_index=row_index, original_name=rows[row_index][0],
+                    modality=rows[row_index][1], triples=json.dumps([["胸部", "胸部", "平扫"]]),
+                    status="success", source="llm"
+                )
+                for row_index in done
+            )
+            db.commit()
+        finally:
+            db.close()
+        return task_id
+
+    @pytest.mark.asyncio
+    async def test_resume_only_dispatches_remaining_rows(self, service, tmp_path):
+        rows = [("胸部CT平扫", "CT"), ("胸部CT增强", "CT"), ("未知检查", "CT"), ("胸部CT复查", "CT")]
+        task_id = self.interrupted_task(service, tmp_path, rows, done=[0, 1])
+
+        assert await service.resume_task(task_id) is True
+
+        task = service.get_task(task_id)
+        results = service.get_task_results(task_id)
+        assert sorted(service.llm_calls) == ["未知检查", "胸部CT复查"]
+        assert [r["row_index"] for r in results] == [0, 1, 2, 3]
+        assert task["status"] == "completed"
+        assert task["processed_records"] == 4
+        assert task["success_count"] == 3
+        assert task["failed_count"] == 1
+        assert task["stats"]["resumed_rows"] == 2
+        assert task["stats"]["llm_records"] == 3
+        assert not (tmp_path / "interrupted.csv").exists()
+
+    @pytest.mark.asyncio
+    async def test_completed_task_is_not_resumable(self, service, tmp_path):
+        task_id = self.interrupted_task(service, tmp_path, [("胸部CT平扫", "CT")], done=[])
+        await service.resume_task(task_id)
+
+        assert service.check_resumable(task_id) == "Task is already completed"
+        assert service.check_resumable("missing") == "Task not found"
+
+    @pytest.mark.asyncio
+    async def test_reservation_refuses_a_second_resume(self, service, tmp_path):
+        task_id = self.interrupted_task(service, tmp_path, [("胸部CT平扫", "CT")], done=[])
+
+        assert service.check_resumable(task_id, reserve=True) is None
+        assert service.check_resumable(task_id, reserve=True) == "Task is already running"
+        assert await service.resume_task(task_id) is False
+
+        assert await service.resume_task(task_id, reserved=True) is True
+        assert not service.is_running(task_id)
+        assert service.get_task(task_id)["status"] == "completed"
+
+    def test_startup_recovery(self, service, tmp_path, monkeypatch):
+        from app.core.task_queue import resume_queue, task_queue
+
+        submitted = []
+        monkeypatch.setattr(resume_queue, "submit", lambda name, func, *args, **kwargs: submitted.append(args))
+        monkeypatch.setattr(task_queue, "submit", lambda *args, **kwargs: pytest.fail("resume on the shared queue"))
+        resumable = self.interrupted_task(service, tmp_path, [("胸部CT平扫", "CT")], done=[])
+        orphan = service.create_task("lost.csv")
+
+        summary = service.recover_interrupted_tasks()
+
+        assert summary == {"resumed": 1, "failed": 1}
+        assert submitted == [(resumable,)]
+        assert service.is_running(resumable)
+        assert service.recover_interrupted_tasks() == {"resumed": 0, "failed": 0}
+        task = service.get_task(orphan)
+        assert task["status"] == "failed"
+        assert "Interrupted by server restart" in task["error_message"]
+
+
+class TestTaskEvents:
+    """Test live progress events."""
+
+    def test_broker_replays_progress_and_drops_oldest(self):
+        from app.core.events import TopicBroker
+
+        broker = TopicBroker(max_queue=2)
+        broker.publish("t", "progress", {"processed_records": 1})
+        queue = broker.subscribe("t")
+        broker.publish("t", "results", {"rows": [1]})
+        broker.publish("t", "results", {"rows": [2]})
+        broker.close("t")
+
+        assert [queue.get_nowait() for _ in range(2)] == [("results", {"rows": [2]}), None]
+        assert not broker.has_subscribers("t")
+
+    @pytest.mark.asyncio
+    async def test_process_file_publishes_rows_and_progress(self, service):
+        from app.core.events import task_events
+
+        rows = [("胸部CT增强扫描", "CT"), ("手指正位", "DR"), ("胸部CT增强扫描", "CT")]
+        task_id = service.create_task("events.csv")
+        queue = task_events.subscribe(task_id)
+
+        await service.process_file(task_id, make_csv(rows), "events.csv")
+
+        events = []
+        while (item := queue.get_nowait()) is not None:
+            events.append(item)
+        streamed = sorted(row["row_index"] for name, data in events if name == "results" for row in data["rows"])
+        progress = [data for name, data in events if name == "progress"]
+        assert streamed == [0, 1, 2]
+        assert progress[-1]["status"] == "completed"
+        assert progress[-1]["processed_records"] == 3
+        assert progress[-1]["rows_per_second"] > 0
+        assert not task_events.has_subscribers(task_id)
+
+
+class TestExport:
+    """Test streaming exports of task results."""
+
+    @pytest.mark.asyncio
+    async def test_csv_export_reads_result_rows(self, service):
+        rows = [("胸部CT增强扫描", "CT"), ("手指正位", "DR")]
+        task_id = service.create_task("export.csv")
+        await service.process_file(task_id, make_csv(rows), "export.csv")
+
+        content = b"".join(service.export_results(task_id, "csv")).decode("utf-8-sig")
+
+        lines = content.strip().splitlines()
+        assert len(lines) == 3
+        assert lines[2].startswith("2,手指正位,DR,上肢-手指-正位")
+        assert service.export_results("missing") is None
+
+
+class TestStdTermSync:
+    """Test the batched StdTerm graph sync."""
+
+    @pytest.fixture
+    def writer(self, monkeypatch):
+        from app.services.examination_std_term_writer import std_term_writer
+
+        monkeypatch.setattr(service_module.settings, "STD_TERM_SYNC_BATCH_SIZE", 2)
+        monkeypatch.setattr(service_module.settings, "STD_TERM_SYNC_RETRY_BASE_DELAY", 0.001)
+        batches, failures, stored = [], [ConnectionError("neo4j down")], {}
+
+        async def write_batch(terms):
+            if failures:
+                raise failures.pop(0)
+            batches.append([term["original_name"] for term in terms])
+            written = [term for term in terms if stored.get(term["id"]) != term["standard_json"]]
+            stored.update((term["id"], term["standard_json"]) for term in written)
+            return {"written": len(written), "unchanged": len(terms) - len(written)}
+
+        monkeypatch.setattr(std_term_writer, "write_batch", write_batch)
+        return batches
+
+    @pytest.mark.asyncio
+    async def test_batches_dedup_retry_and_skip_unchanged(self, service, writer):
+        rows = [("胸部CT增强扫描", "CT"), ("手指正位", "DR"), ("胸部CT增强扫描", "CT"), ("胸部CT复查", "CT"), ("未知检查", "CT")]
+        task_id = service.create_task("sync.csv")
+        await service.process_file(task_id, make_csv(rows), "sync.csv")
+        assert service.scheduled_syncs == [task_id]
+
+        first = await service.sync_task_to_kag(task_id)
+        second = await service.sync_task_to_kag(task_id)
+
+        assert writer[:2] == [["胸部CT增强扫描", "手指正位"], ["胸部CT复查"]]
+        assert first["status"] == "completed"
+        assert first["rows"] == 4 and first["terms"] == 3
+        assert first["written"] == 3 and first["retries"] == 1
+        assert second["written"] == 0 and second["unchanged"] == 3
+        assert service.get_task(task_id)["kag_sync"]["status"] == "completed"
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_retries(self, service, writer, monkeypatch):
+        monkeypatch.setattr(service_module.settings, "STD_TERM_SYNC_MAX_RETRIES", 0)
+        task_id = service.create_task("sync.csv")
+        await service.process_file(task_id, make_csv([("手指正位", "DR")]), "sync.csv")
+
+        progress = await service.sync_task_to_kag(task_id)
+
+        assert progress["status"] == "failed"
+        assert service.get_task(task_id)["kag_sync"]["error"] == "neo4j down"
+
+
+class TestStandardizeOne:
+    """Test interactive single-name standardization."""
+
+    @pytest.mark.asyncio
+    async def test_dictionary_hit_skips_llm(self, service):
+        result = await service.standardize_one("手指正位", "DR")
+
+        assert result == {"status": "success", "standardized": [["上肢", "手指", "正位"]], "source": "dictionary"}
+        assert service.llm_calls == []
+
+    @pytest.mark.asyncio
+    async def test_llm_result_lands_in_shared_cache(self, service):
+        first = await service.standardize_one("胸部CT增强扫描", "CT", deadline=1.0)
+        second = await service.standardize_one("胸部ＣＴ增强扫描", "CT")
+
+        assert first["source"] == "llm"
+        assert second["source"] == "cache"
+        assert service.llm_calls == ["胸部CT增强扫描"]
+        assert service._tickets == {}
+
+    @pytest.mark.asyncio
+    async def test_deadline_returns_shared_ticket(self, service):
+        import asyncio
+
+        fast_single = service._standardize_single
+
+        async def slow_single(exam_name, modality, **kwargs):
+            await asyncio.sleep(0.05)
+            return await fast_single(exam_name, modality, **kwargs)
+
+        service._standardize_single = slow_single
+
+        first = await service.standardize_one("胸部CT增强扫描", "CT", deadline=0.001)
+        second = await service.standardize_one("胸部CT增强扫描", "CT", deadline=0.001)
+        assert first["status"] == "pending"
+        assert second["ticket"] == first["ticket"]
+
+        await asyncio.sleep(0.1)
+        assert service.get_ticket(first["ticket"])["standardized"] == [["胸部", "胸部", "平扫"]]
+        assert service.get_ticket("unknown") is None
+        assert service.llm_calls == ["胸部CT增强扫描"]
+
+    @pytest.mark.asyncio
+    async def test_ticket_ttl_starts_when_the_job_finishes(self, service, monkeypatch):
+        import asyncio
+
+        monkeypatch.setattr(service_module.settings, "STANDARDIZATION_TICKET_TTL", 0.05)
+        fast_single = service._standardize_single
+
+        async def slow_single(exam_name, modality, **kwargs):
+            await asyncio.sleep(0.1)  # slower than the TTL
+            return await fast_single(exam_name, modality, **kwargs)
+
+        service._standardize_single = slow_single
+
+        pending = await service.standardize_one("胸部CT增强扫描", "CT", deadline=0.001)
+        await asyncio.sleep(0.12)
+        service._prune_tickets()
+
+        assert service.get_ticket(pending["ticket"])["status"] == "success"
+        await asyncio.sleep(0.06)
+        service._prune_tickets()
+        assert service.get_ticket(pending["ticket"]) is None
+
+
+class TestCompoundNames:
+    """Test per-fragment standardization of compound names."""
+
+    @pytest.mark.asyncio
+    async def test_fragments_hit_dictionary(self, service):
+        task_id = service.create_task("compound.csv")
+
+        await service.process_file(task_id, make_csv([("手指正位、手指侧位（总院）", "DR")]), "compound.csv")
+
+        result = service.get_task_results(task_id)[0]
+        assert result["standardized"] == [["上肢", "手指", "正位"], ["上肢", "手指", "侧位"]]
+        assert result["status"] == "success"
+        assert result["source"] == "dictionary"
+        assert service.llm_calls == []
+        assert service.get_task(task_id)["stats"]["split_names"] == 1
+
+    @pytest.mark.asyncio
+    async def test_fragments_are_cached_across_rows(self, service, monkeypatch):
+        monkeypatch.setattr(service_module.settings, "STANDARDIZATION_CONCURRENCY", 1)
+        rows = [("胸部CT增强，胸部CT复查", "CT"), ("胸部CT复查|胸部CT增强", "CT"), ("胸部CT增强、未知检查", "CT")]
+        task_id = service.create_task("compound.csv")
+
+        await service.process_file(task_id, make_csv(rows), "compound.csv")
+
+        results = service.get_task_results(task_id)
+        assert sorted(service.llm_calls) == ["未知检查", "胸部CT增强", "胸部CT复查"]
+        assert results[1]["source"] == "cache"
+        assert results[2]["status"] == "review_required"
+        assert results[2]["standardized"] == [["胸部", "胸部", "平扫"]]
+
+    @pytest.mark.asyncio
+    async def test_batch_mode_batches_fragments(self, batch_service):
+        rows = [("胸部CT增强扫描、肺部CT（总院）", "CT"), ("肺部CT", "CT")]
+        task_id = batch_service.create_task("compound.csv", options={"batch_size": 10})
+
+        await batch_service.process_file(task_id, make_csv(rows), "compound.csv")
+
+        results = batch_service.get_task_results(task_id)
+        stage1 = batch_service.llm_calls[0]
+        assert sorted(re.findall(r'^"\d+": (.+)$', stage1, re.M)) == ["肺部CT", "胸部CT增强扫描"]
+        assert results[0]["standardized"] == [["胸部", "胸部", "平扫"]]
+        assert results[0]["status"] == "success"
+
+
+class TestDryRunEstimate:
+    """Test the no-LLM upload estimate."""
+
+    @pytest.mark.asyncio
+    async def test_estimate_skips_cache_and_dictionary_hits(self, service, monkeypatch):
+        monkeypatch.setattr(service_module.settings, "STANDARDIZATION_ESTIMATE_CALL_LATENCY", 2.0)
+        monkeypatch.setattr(service_module.settings, "STANDARDIZATION_CONCURRENCY", 4)
+        snapshot = await service.kg.get_snapshot()
+        await service.result_cache.put("胸部CT复查", "CT", snapshot.version, [["胸部", "胸部", "平扫"]], "success")
+        rows = [("胸部CT增强", "CT")] * 3 + [("手指正位", "DR"), ("胸部CT复查、未知检查", "CT"), ("", "CT")]
+
+        estimate = await service.estimate_file(make_csv(rows), "estimate.csv")
+
+        assert service.llm_calls == []
+        assert service.get_all_tasks() == []
+        assert estimate["rows"] == 5
+        assert estimate["skipped_rows"] == 1
+        assert estimate["distinct_keys"] == 3
+        assert estimate["dictionary_hits"] == 1
+        assert estimate["split_names"] == 1
+        # 胸部CT增强 and the uncached fragment 未知检查, two stages each
+        assert estimate["llm_inputs"] == 2
+        assert estimate["llm_calls"] == 4
+        assert estimate["prompt_tokens"] > estimate["completion_tokens"] > 0
+        # 4 rounds over 4 slots at 2 s per call
+        assert estimate["estimated_wall_s"] == 2.0
+
+    @pytest.mark.asyncio
+    async def test_estimate_leaves_cache_and_correction_metrics_alone(self, service):
+        snapshot = await service.kg.get_snapshot()
+        await service.result_cache.put("胸部CT复查", "CT", snapshot.version, [["胸部", "胸部", "平扫"]], "success")
+        service.correction_memory.add("左手指正位片（外伤）", "DR", [["上肢", "手指", "正位"]])
+        cache_stats = service.result_cache.get_stats()
+        lru = list(service.result_cache._lru)
+        correction_stats = service.correction_memory.get_stats()
+        rows = [("胸部CT复查", "CT"), ("右手指正位（外伤后）", "DR"), ("胸部CT增强", "CT")]
+
+        estimate = await service.estimate_file(make_csv(rows), "estimate.csv")
+
+        assert estimate["cache_hits"] == 1
+        assert estimate["correction_hits"] == 1
+        assert service.result_cache.get_stats() == cache_stats
+        assert list(service.result_cache._lru) == lru
+        assert service.correction_memory.get_stats() == correction_stats
+
+    @pytest.mark.asyncio
+    async def test_batch_estimate(self, service):
+        rows = [("胸部CT增强", "CT"), ("胸部CT复查", "CT"), ("胸部CT平扫加做", "CT"), ("手指骨折复查", "DR")]
+        single = await service.estimate_file(make_csv(rows), "estimate.csv", {"mode": "single_pass"})
+        batched = await service.estimate_file(make_csv(rows), "estimate.csv", {"mode": "single_pass", "batch_size": 10})
+
+        assert single["llm_calls"] == 4
+        # One prompt per modality
+        assert batched["llm_calls"] == 2
+        assert batched["prompt_tokens"] < single["prompt_tokens"]
+
+
+class TestCorrectionMemory:
+    """Test reuse of reviewer corrections for close variants."""
+
+    @pytest.mark.asyncio
+    async def test_variant_of_corrected_name_skips_llm(self, service):
+        first = service.create_task("first.csv")
+        await service.process_file(first, make_csv([("左手指正位片（外伤）", "DR")]), "first.csv")
+        await service.update_task_result(first, 0, [["上肢", "手指", "正位"]])
+        service.llm_calls.clear()
+
+        rows = [("右手指正位（外伤后）", "DR"), ("右手指侧位（外伤）", "DR")]
+        second = service.create_task("second.csv")
+        await service.process_file(second, make_csv(rows), "second.csv")
+
+        results = service.get_task_results(second)
+        assert results[0]["standardized"] == [["上肢", "手指", "正位"]]
+        assert results[0]["source"] == "correction"
+        # A different method is not a variant, however similar the text
+        assert results[1]["source"] == "llm"
+        assert service.llm_calls == ["右手指侧位（外伤）"]
+
+        stats = service.get_task(second)["stats"]
+        assert stats["correction_hits"] == 1
+        assert stats["correction_keys"] == 1
+        assert stats["llm_calls_saved"] == 2
+
+    @pytest.mark.asyncio
+    async def test_guard_rejects_different_methods(self, service, monkeypatch):
+        monkeypatch.setattr(service_module.settings, "STANDARDIZATION_CORRECTION_SIMILARITY", 0.5)
+        service.correction_memory.add("手指正位（外伤）", "DR", [["上肢", "手指", "正位"]])
+
+        assert await service._resolve_without_llm("手指侧位（外伤）", "DR") is None
+        hit = await service._resolve_without_llm("手指正位（陈旧外伤）", "DR")
+        assert hit["source"] == "correction"
+        assert hit["matched_name"] == "手指正位（外伤）"
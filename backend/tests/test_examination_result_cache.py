@@ -0,0 +1,147 @@
+"""
+Unit tests for the persistent standardization result cache
+"""
+
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.services import examination_result_cache as cache_module
+from app.services.examination_result_cache import (
+    StandardizationResultCache,
+    normalize_exam_name,
+    normalize_modality_key,
+)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    """Cache backed by a throwaway SQLite database."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(cache_module, "SessionLocal", sessionmaker(bind=engine))
+    return StandardizationResultCache(max_entries=2)
+
+
+class TestNormalization:
+    """Test key normalization."""
+
+    def test_exam_name(self):
+        assert normalize_exam_name(" 胸部ＣＴ 平扫（总院） ") == "胸部CT平扫(总院)"
+        assert normalize_exam_name(None) == ""
+
+    def test_modality(self):
+        assert normalize_modality_key("mr") == normalize_modality_key("MRI")
+        assert normalize_modality_key(float("nan")) == ""
+
+
+class TestStandardizationResultCache:
+    """Test LRU + DB behaviour."""
+
+    @pytest.mark.asyncio
+    async def test_roundtrip_survives_memory_clear(self, cache):
+        assert await cache.get("胸部CT平扫", "CT", "v1") is None
+
+        await cache.put("胸部CT平扫", "CT", "v1", [["胸部", "胸部", "平扫"]], "success")
+        cache.clear_memory()
+        cached = await cache.get("胸部ＣＴ平扫", "CT", "v1")
+
+        assert cached["result"] == [["胸部", "胸部", "平扫"]]
+        assert cached["status"] == "success"
+        assert cached["source"] == "cache"
+
+    @pytest.mark.asyncio
+    async def test_version_is_part_of_key(self, cache):
+        await cache.put("胸部CT平扫", "CT", "v1", [["胸部", "胸部", "平扫"]], "success")
+
+        assert await cache.get("胸部CT平扫", "CT", "v2") is None
+
+    @pytest.mark.asyncio
+    async def test_manual_overrides_llm(self, cache):
+        await cache.put("左手正位", "DR", "v1", [["上肢", "手指", "正位"]], "review_required")
+        await cache.put_manual("左手正位", "DR", "v1", [["上肢", "手掌", "正位"]])
+        written = await cache.put("左手正位", "DR", "v1", [["上肢", "手指", "正位"]], "success")
+        cache.clear_memory()
+
+        assert written is False
+        cached = await cache.get("左手正位", "DR", "v1")
+        assert cached["result"] == [["上肢", "手掌", "正位"]]
+        assert cached["cached_source"] == "manual"
+
+    @pytest.mark.asyncio
+    async def test_lru_is_bounded(self, cache):
+        for index in range(5):
+            await cache.put(f"检查{index}", "DR", "v1", [["上肢", "手指", "正位"]], "success")
+
+        assert cache.get_stats()["memory_entries"] == 2
+        assert await cache.get("检查0", "DR", "v1") is not None
+
+    @pytest.mark.asyncio
+    async def test_misses_expire(self, cache):
+        # Another worker (or a reviewer) writes the entry after this process missed it
+        cache.miss_ttl = 0.05
+        other_worker = StandardizationResultCache()
+        assert await cache.get("胸部CT平扫", "CT", "v1") is None
+        await other_worker.put_manual("胸部CT平扫", "CT", "v1", [["胸部", "胸部", "平扫"]])
+
+        assert await cache.get("胸部CT平扫", "CT", "v1") is None
+        await asyncio.sleep(0.06)
+        assert (await cache.get("胸部CT平扫", "CT", "v1"))["cached_source"] == "manual"
+
+    @pytest.mark.asyncio
+    async def test_db_round_trips_run_off_the_event_loop(self, cache, monkeypatch):
+        threads = []
+        load = cache._load
+
+        def recording_load(key):
+            threads.append(threading.current_thread())
+            return load(key)
+
+        monkeypatch.setattr(cache, "_load", recording_load)
+        await cache.get("胸部CT平扫", "CT", "v1")
+
+        assert threads and threads[0] is not threading.main_thread()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("upsert", [True, False], ids=["upsert", "select_and_write"])
+    async def test_concurrent_puts_keep_manual_precedence(self, cache, monkeypatch, upsert):
+        if not upsert:
+            monkeypatch.setattr(cache_module, "_UPSERT_INSERTS", {})
+        llm = [["上肢", "手指", "正位"]]
+        manual = [["上肢", "手掌", "正位"]]
+
+        puts = [cache.put("左手正位", "DR", "v1", llm, "success") for _ in range(8)]
+        puts.append(cache.put_manual("左手正位", "DR", "v1", manual))
+        results = await asyncio.gather(*puts)
+
+        assert results[-1] is True
+        assert (await cache.get("左手正位", "DR", "v1"))["result"] == manual
+        cache.clear_memory()
+        assert (await cache.get("左手正位", "DR", "v1"))["result"] == manual
+
+    def test_select_and_write_retries_a_lost_insert_race(self, cache):
+        values = {
+            "id": cache.make_key("左手正位", "DR", "v1"), "normalized_name": "左手正位", "modality": "DR",
+            "ontology_version": "v1", "triples": "[]", "status": "success", "source": "llm",
+        }
+        db = cache_module.SessionLocal()
+        query = db.query
+
+        def racing_query(*args):
+            # Another writer inserts the row between our select and our insert
+            other = cache_module.SessionLocal()
+            other.add(cache_module.StandardizationCacheEntry(**{**values, "source": "manual"}))
+            other.commit()
+            other.close()
+            db.query = query
+            return query(*args).filter(False)
+
+        db.query = racing_query
+        try:
+            assert cache._select_and_write(db, values) is False
+        finally:
+            db.close()
@@ -0,0 +1,84 @@
+"""
+Unit tests for the streaming result exporter
+"""
+
+import csv
+import io
+import json
+
+from openpyxl import load_workbook
+
+from app.services.examination_result_exporter import EXPORT_HEADERS, iter_csv, iter_xlsx
+
+
+def results(count):
+    for index in range(count):
+        yield {
+            "row_index": index,
+            "original_name": f"检查{index}",
+            "modality": "CT",
+            "standardized": [["胸部", "胸部", "平扫"]] if index % 2 == 0 else None,
+            "status": "success" if index % 2 == 0 else "failed",
+            "source": "llm" if index % 2 == 0 else None
+        }
+
+
+class TestIterCsv:
+    """Test chunked CSV export."""
+
+    def test_header_before_first_result(self):
+        pulled = []
+
+        def tracking():
+            for result in results(3):
+                pulled.append(result["row_index"])
+                yield result
+
+        chunks = iter_csv(tracking())
+        first = next(chunks)
+
+        assert pulled == []
+        assert first.decode("utf-8-sig").strip() == ",".join(EXPORT_HEADERS)
+
+    def test_rows_are_chunked_and_complete(self):
+        chunks = list(iter_csv(results(500), flush_bytes=1024))
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8-sig"))))
+
+        assert len(chunks) > 3
+        assert len(rows) == 501
+        assert rows[1] == ["1", "检查0", "CT", "胸部-胸部-平扫", json.dumps([["胸部", "胸部", "平扫"]], ensure_ascii=False), "success", "llm"]
+        assert rows[2][3:5] == ["", ""]
+
+
+class TestIterXlsx:
+    """Test streamed XLSX export."""
+
+    def test_streams_before_all_results_are_read(self):
+        pulled = []
+
+        def tracking():
+            for result in results(5000):
+                pulled.append(result["row_index"])
+                yield result
+
+        chunks = iter_xlsx(tracking(), chunk_size=1024)
+        next(chunks)
+        next(chunks)
+
+        assert len(pulled) < 5000
+
+    def test_round_trip(self):
+        content = b"".join(iter_xlsx(results(50), chunk_size=4096))
+
+        sheet = load_workbook(io.BytesIO(content), read_only=True).active
+        rows = list(sheet.iter_rows(values_only=True))
+        assert list(rows[0]) == EXPORT_HEADERS
+        assert len(rows) == 51
+        assert rows[1][:4] == (1, "检查0", "CT", "胸部-胸部-平扫")
+        assert rows[2][3] is None
+
+    def test_escapes_markup_and_control_characters(self):
+        content = b"".join(iter_xlsx([{"row_index": 0, "original_name": "<胸部> & \x01CT", "modality": "CT"}]))
+
+        sheet = load_workbook(io.BytesIO(content), read_only=True).active
+        assert list(sheet.iter_rows(values_only=True))[1][1] == "<胸部> & CT"
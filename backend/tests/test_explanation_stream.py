@@ -0,0 +1,131 @@
+"""
+Unit tests for thinking / answer stream sequencing
+"""
+
+import asyncio
+import pytest
+from app.services.explanation_stream import (
+    ANSWER_SITE,
+    STREAM_BUFFERED,
+    STREAM_INTERLEAVED,
+    STREAM_SEQUENTIAL,
+    THINKING_SITE,
+    resolve_option,
+    stream_thinking_and_answer,
+)
+
+
+class FakeStreams:
+    """generate_stream stand-in: each site emits its chunks with a fixed delay."""
+
+    def __init__(self, delays, fail=None):
+        self.delays = delays
+        self.fail = fail
+        self.started = {}
+        self.closed = []
+
+    async def generate_stream(self, prompt, site):
+        loop = asyncio.get_running_loop()
+        self.started[site] = loop.time()
+        try:
+            for index in range(3):
+                await asyncio.sleep(self.delays[site])
+                if self.fail == site:
+                    raise RuntimeError(f"{site} failed")
+                yield f"{prompt}{index}"
+        finally:
+            self.closed.append(site)
+
+
+async def collect(streams, mode, thinking_prompt="t"):
+    return [event async for event in stream_thinking_and_answer(
+        streams.generate_stream, thinking_prompt, "a", mode=mode
+    )]
+
+
+def types(events):
+    return [event_type for event_type, _ in events]
+
+
+class TestStreamModes:
+    """Test event order per mode."""
+
+    @pytest.mark.asyncio
+    async def test_sequential_keeps_the_original_order(self):
+        streams = FakeStreams({THINKING_SITE: 0.001, ANSWER_SITE: 0.001})
+
+        events = await collect(streams, STREAM_SEQUENTIAL)
+
+        assert types(events) == ["thinking_start", "thinking", "thinking", "thinking", "thinking_done",
+                                 "answer_start", "chunk", "chunk", "chunk"]
+        assert streams.started[ANSWER_SITE] > streams.started[THINKING_SITE]
+
+    @pytest.mark.asyncio
+    async def test_buffered_starts_both_but_keeps_the_order(self):
+        # The answer finishes before thinking; its chunks are held back
+        streams = FakeStreams({THINKING_SITE: 0.02, ANSWER_SITE: 0.001})
+
+        events = await collect(streams, STREAM_BUFFERED)
+
+        assert types(events) == ["thinking_start", "thinking", "thinking", "thinking", "thinking_done",
+                                 "answer_start", "chunk", "chunk", "chunk"]
+        assert [content for event_type, content in events if event_type == "chunk"] == ["a0", "a1", "a2"]
+        assert abs(streams.started[ANSWER_SITE] - streams.started[THINKING_SITE]) < 0.01
+
+    @pytest.mark.asyncio
+    async def test_interleaved_sends_answer_chunks_immediately(self):
+        streams = FakeStreams({THINKING_SITE: 0.02, ANSWER_SITE: 0.001})
+
+        events = await collect(streams, STREAM_INTERLEAVED)
+
+        assert types(events).index("chunk") < types(events).index("thinking_done")
+        assert types(events).count("answer_start") == 1
+        assert types(events).index("answer_start") < types(events).index("chunk")
+
+    @pytest.mark.asyncio
+    async def test_without_thinking(self):
+        streams = FakeStreams({THINKING_SITE: 0.001, ANSWER_SITE: 0.001})
+
+        events = await collect(streams, STREAM_BUFFERED, thinking_prompt=None)
+
+        assert types(events) == ["answer_start", "chunk", "chunk", "chunk"]
+        assert THINKING_SITE not in streams.started
+
+
+class TestStreamFailures:
+    """Test error handling and cleanup of the concurrent modes."""
+
+    @pytest.mark.asyncio
+    async def test_thinking_failure_does_not_stop_the_answer(self):
+        streams = FakeStreams({THINKING_SITE: 0.001, ANSWER_SITE: 0.005}, fail=THINKING_SITE)
+
+        events = await collect(streams, STREAM_BUFFERED)
+
+        assert "thinking_done" in types(events)
+        assert types(events).count("chunk") == 3
+
+    @pytest.mark.asyncio
+    async def test_answer_failure_is_raised_and_thinking_stopped(self):
+        streams = FakeStreams({THINKING_SITE: 0.05, ANSWER_SITE: 0.001}, fail=ANSWER_SITE)
+
+        with pytest.raises(RuntimeError):
+            await collect(streams, STREAM_BUFFERED)
+
+        assert THINKING_SITE in streams.closed
+
+    @pytest.mark.asyncio
+    async def test_closing_the_stream_stops_both_completions(self):
+        streams = FakeStreams({THINKING_SITE: 0.01, ANSWER_SITE: 0.01})
+        events = stream_thinking_and_answer(streams.generate_stream, "t", "a", mode=STREAM_BUFFERED)
+
+        assert await events.__anext__() == ("thinking_start", None)
+        await asyncio.sleep(0.005)
+        await events.aclose()
+
+        assert sorted(streams.closed) == sorted([THINKING_SITE, ANSWER_SITE])
+
+
+def test_resolve_option_falls_back_to_default():
+    assert resolve_option("interleaved", ("buffered", "interleaved"), "buffered") == "interleaved"
+    assert resolve_option(None, ("buffered", "interleaved"), "buffered") == "buffered"
+    assert resolve_option("bogus", ("buffered", "interleaved"), "buffered") == "buffered"
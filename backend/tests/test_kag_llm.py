@@ -0,0 +1,154 @@
+"""
+Unit tests for the async KAG LLM adapter
+"""
+
+import asyncio
+import threading
+import time
+
+import httpx
+import openai
+import pytest
+
+from app.core import kag_llm as kag_llm_module
+from app.core import llm as llm_module
+from app.core.concurrency import AdaptiveConcurrencyLimiter
+from app.core.exceptions import LLMOverloadedError
+from app.core.kag_llm import AsyncKAGLLM
+from app.core.llm import LLMMetrics, LLMService
+
+
+class SyncClient:
+    """Blocking client, like KAG's LLMClient.__call__."""
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.threads = set()
+
+    def __call__(self, prompt, **kwargs):
+        self.threads.add(threading.current_thread().name)
+        time.sleep(self.delay)
+        return f"answer: {prompt}"
+
+
+class LLMClient:
+    """Stand-in for KAG's base class, whose acall just calls the blocking __call__."""
+
+    async def acall(self, prompt, **kwargs):
+        return self(prompt, **kwargs)
+
+
+class NativeClient(LLMClient):
+    def __call__(self, prompt, **kwargs):
+        raise AssertionError("sync path used")
+
+    async def acall(self, prompt, **kwargs):
+        await asyncio.sleep(0)
+        return f"async answer: {prompt}"
+
+
+class FlakyClient(LLMClient):
+    """Native client that is rate limited `failures` times before answering."""
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.calls = 0
+
+    async def acall(self, prompt, **kwargs):
+        self.calls += 1
+        if self.calls <= self.failures:
+            request = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+            raise openai.RateLimitError("rate limited", response=httpx.Response(429, request=request), body=None)
+        return f"async answer: {prompt}"
+
+
+@pytest.fixture
+def gateway(monkeypatch):
+    monkeypatch.setattr(llm_module.settings, "LLM_RETRY_BASE_DELAY", 0.001)
+    monkeypatch.setattr(llm_module.settings, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(llm_module.settings, "LLM_PROMPT_CACHE_SITES", {})
+    metrics = LLMMetrics()
+    monkeypatch.setattr(llm_module, "llm_metrics", metrics)
+    monkeypatch.setattr(kag_llm_module, "llm_metrics", metrics)
+    svc = object.__new__(LLMService)
+    svc.limiter = AdaptiveConcurrencyLimiter(initial_limit=8, cooldown=0)
+    svc.metrics = metrics
+    return svc
+
+
+class TestAsyncKAGLLM:
+    """Test event-loop friendliness, timeouts and path selection."""
+
+    @pytest.mark.asyncio
+    async def test_sync_client_runs_off_the_event_loop(self):
+        client = SyncClient(delay=0.2)
+        llm = AsyncKAGLLM(client, max_workers=4)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        ticking = asyncio.create_task(ticker())
+        started = time.monotonic()
+        answers = await asyncio.gather(*(llm(f"q{i}") for i in range(4)))
+        ticking.cancel()
+
+        assert answers == [f"answer: q{i}" for i in range(4)]
+        assert time.monotonic() - started < 0.6  # 4 calls in parallel, not 0.8 s in a row
+        assert ticks >= 10
+        assert all(name.startswith("kag-llm") for name in client.threads)
+        assert not llm.is_native
+        llm.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_timeout(self):
+        llm = AsyncKAGLLM(SyncClient(delay=0.3), max_workers=1, timeout=0.05)
+
+        with pytest.raises(asyncio.TimeoutError):
+            await llm("slow")
+        assert llm.get_stats()["timeouts"] == 1
+        llm.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_native_async_path(self):
+        llm = AsyncKAGLLM(NativeClient())
+
+        assert llm.is_native
+        assert await llm("q") == "async answer: q"
+
+    def test_base_class_acall_is_not_native(self):
+        class PlainClient(LLMClient):
+            def __call__(self, prompt, **kwargs):
+                return prompt
+
+        llm = AsyncKAGLLM(PlainClient(), max_workers=1)
+        assert not llm.is_native
+        llm.shutdown()
+
+
+class TestGatewayRetries:
+    """Test that KAG calls share the gateway's limiter and retries."""
+
+    @pytest.mark.asyncio
+    async def test_rate_limits_are_retried(self, gateway):
+        client = FlakyClient(failures=2)
+        llm = AsyncKAGLLM(client, gateway=gateway)
+
+        assert await llm("q", site="rule.validate") == "async answer: q"
+
+        assert client.calls == 3
+        assert gateway.limiter.in_flight == 0
+        assert gateway.metrics.attempt_errors[("rule.validate", "rate_limit")] == 2
+        assert gateway.metrics.requests[("rule.validate", "ok")] == 1
+
+    @pytest.mark.asyncio
+    async def test_overloaded_after_max_retries(self, gateway):
+        llm = AsyncKAGLLM(FlakyClient(failures=10), gateway=gateway)
+
+        with pytest.raises(LLMOverloadedError):
+            await llm("q", site="rule.validate")
+
+        assert gateway.metrics.requests[("rule.validate", "overloaded")] == 1
@@ -0,0 +1,218 @@
+"""
+Unit tests for the LLM prompt cache
+"""
+
+import pytest
+from openai.types.chat import ChatCompletion
+from app.core import kag_llm as kag_llm_module
+from app.core import llm as llm_module
+from app.core import llm_cache as cache_module
+from app.core.concurrency import AdaptiveConcurrencyLimiter
+from app.core.kag_llm import AsyncKAGLLM
+from app.core.llm import LLMMetrics, LLMService
+from app.core.llm_cache import HIT_MEMORY, HIT_REDIS, MISS, PromptCache, prompt_key
+
+
+def completion(content="胸部"):
+    return ChatCompletion.model_validate({
+        "id": "cmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "test-model",
+        "choices": [{"index": 0, "finish_reason": "stop",
+                     "message": {"role": "assistant", "content": content}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 2, "total_tokens": 12}
+    })
+
+
+class CountingCompletions:
+    def __init__(self):
+        self.calls = 0
+
+    async def create(self, **kwargs):
+        self.calls += 1
+        return completion(f"answer {self.calls}")
+
+
+class FakeRedis:
+    """In-memory stand-in for CacheService."""
+
+    available = True
+
+    def __init__(self):
+        self.store = {}
+
+    async def get(self, key):
+        return self.store.get(key)
+
+    async def set(self, key, value, expire=3600):
+        self.store[key] = value
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = PromptCache(max_bytes=1_000_000, use_redis=False)
+    monkeypatch.setattr(llm_module, "prompt_cache", cache)
+    monkeypatch.setattr(kag_llm_module, "prompt_cache", cache)
+    monkeypatch.setattr(cache_module.settings, "LLM_PROMPT_CACHE_SITES", {"cached.site": 60})
+    return cache
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    metrics = LLMMetrics()
+    monkeypatch.setattr(llm_module, "llm_metrics", metrics)
+    monkeypatch.setattr(kag_llm_module, "llm_metrics", metrics)
+    return metrics
+
+
+@pytest.fixture
+def service():
+    svc = object.__new__(LLMService)
+    svc.model = "test-model"
+    svc.limiter = AdaptiveConcurrencyLimiter(initial_limit=8, cooldown=0)
+    svc.client = type("Client", (), {})()
+    svc.client.chat = type("Chat", (), {})()
+    svc.client.chat.completions = CountingCompletions()
+    return svc
+
+
+class TestPromptKey:
+    """Test cache key derivation."""
+
+    def test_stable_across_param_order(self):
+        assert prompt_key("m", "p", {"a": 1, "b": 2}) == prompt_key("m", "p", {"b": 2, "a": 1})
+
+    def test_model_prompt_and_params_change_key(self):
+        base = prompt_key("m", "p", {"temperature": 0.1})
+
+        assert prompt_key("m2", "p", {"temperature": 0.1}) != base
+        assert prompt_key("m", "p2", {"temperature": 0.1}) != base
+        assert prompt_key("m", "p", {"temperature": 0.7}) != base
+
+    def test_transport_options_are_ignored(self):
+        assert prompt_key("m", "p", {"timeout": 3.0}) == prompt_key("m", "p", {})
+
+
+class TestPromptCache:
+    """Test the two-tier LRU."""
+
+    @pytest.mark.asyncio
+    async def test_memory_hit_and_miss(self):
+        cache = PromptCache(max_bytes=10_000, use_redis=False)
+        await cache.set("k", "v", ttl=60)
+
+        assert await cache.get("k") == ("v", HIT_MEMORY)
+        assert await cache.get("other") == (None, MISS)
+
+    @pytest.mark.asyncio
+    async def test_byte_size_eviction_is_lru(self):
+        cache = PromptCache(max_bytes=30, use_redis=False)
+        await cache.set("a", "x" * 10, ttl=60)
+        await cache.set("b", "x" * 10, ttl=60)
+        await cache.get("a")
+        await cache.set("c", "x" * 10, ttl=60)
+
+        assert (await cache.get("b"))[1] == MISS
+        assert (await cache.get("a"))[1] == HIT_MEMORY
+        assert cache.bytes <= 30
+        assert cache.evictions == 1
+
+    @pytest.mark.asyncio
+    async def test_oversized_values_are_not_kept(self):
+        cache = PromptCache(max_bytes=10, use_redis=False)
+        await cache.set("k", "x" * 100, ttl=60)
+
+        assert cache.get_stats()["entries"] == 0
+
+    @pytest.mark.asyncio
+    async def test_expired_entries_miss(self):
+        cache = PromptCache(max_bytes=10_000, use_redis=False)
+        await cache.set("k", "v", ttl=60)
+        value, size, _ = cache._entries["k"]
+        cache._entries["k"] = (value, size, 0.0)
+
+        assert await cache.get("k") == (None, MISS)
+        assert cache.bytes == 0
+
+    @pytest.mark.asyncio
+    async def test_redis_tier_is_promoted(self, monkeypatch):
+        redis = FakeRedis()
+        monkeypatch.setattr(cache_module, "cache_service", redis)
+        writer = PromptCache(max_bytes=10_000)
+        reader = PromptCache(max_bytes=10_000)
+        await writer.set("k", {"content": "v"}, ttl=60)
+
+        assert await reader.get("k") == ({"content": "v"}, HIT_REDIS)
+        assert await reader.get("k") == ({"content": "v"}, HIT_MEMORY)
+
+    @pytest.mark.asyncio
+    async def test_unavailable_redis_is_skipped(self, monkeypatch):
+        redis = FakeRedis()
+        redis.available = False
+        monkeypatch.setattr(cache_module, "cache_service", redis)
+        cache = PromptCache(max_bytes=10_000)
+        await cache.set("k", "v", ttl=60)
+
+        assert redis.store == {}
+        assert (await cache.get("k"))[1] == HIT_MEMORY
+
+
+class TestGatewayCaching:
+    """Test prompt caching in chat_completion and the KAG adapter."""
+
+    @pytest.mark.asyncio
+    async def test_opted_in_site_is_served_from_cache(self, service, cache, metrics):
+        messages = [{"role": "user", "content": "胸部CT平扫"}]
+
+        first = await service.chat_completion(messages=messages, site="cached.site", temperature=0.1)
+        second = await service.chat_completion(messages=messages, site="cached.site", temperature=0.1)
+
+        assert service.client.chat.completions.calls == 1
+        assert second.choices[0].message.content == first.choices[0].message.content
+        assert metrics.cache_lookups[("cached.site", MISS)] == 1
+        assert metrics.cache_lookups[("cached.site", HIT_MEMORY)] == 1
+        assert metrics.tokens[("cached.site", "prompt")] == 10
+
+    @pytest.mark.asyncio
+    async def test_other_sites_are_not_cached(self, service, cache, metrics):
+        messages = [{"role": "user", "content": "hi"}]
+
+        await service.chat_completion(messages=messages, site="explanation.generate")
+        await service.chat_completion(messages=messages, site="explanation.generate")
+
+        assert service.client.chat.completions.calls == 2
+        assert not metrics.cache_lookups
+
+    @pytest.mark.asyncio
+    async def test_different_params_miss(self, service, cache, metrics):
+        messages = [{"role": "user", "content": "胸部CT平扫"}]
+
+        await service.chat_completion(messages=messages, site="cached.site", max_tokens=100)
+        await service.chat_completion(messages=messages, site="cached.site", max_tokens=200)
+
+        assert service.client.chat.completions.calls == 2
+
+    @pytest.mark.asyncio
+    async def test_kag_adapter_caches_opted_in_sites(self, cache, metrics):
+        calls = []
+
+        class Client:
+            model = "kag-model"
+
+            def __call__(self, prompt):
+                calls.append(prompt)
+                return f"entities of {prompt}"
+
+        llm = AsyncKAGLLM(Client(), max_workers=1, timeout=5)
+        try:
+            first = await llm("头痛三天", site="cached.site")
+            second = await llm("头痛三天", site="cached.site")
+            await llm("头痛三天", site="uncached")
+            await llm("头痛三天", site="uncached")
+        finally:
+            llm.shutdown()
+
+        assert first == second == "entities of 头痛三天"
+        assert len(calls) == 3
+        assert metrics.cache_lookups[("cached.site", HIT_MEMORY)] == 1
@@ -0,0 +1,262 @@
+"""
+Unit tests for the LLM gateway: deadlines, JSON mode, jittered backoff, metrics and coalescing
+"""
+
+import asyncio
+import math
+import httpx
+import openai
+import pytest
+from app.core import llm as llm_module
+from app.core.concurrency import AdaptiveConcurrencyLimiter
+from app.core.llm import LLMMetrics, LLMService
+
+
+class Usage:
+    prompt_tokens = 12
+    completion_tokens = 3
+
+
+class Response:
+    usage = Usage()
+
+
+class ScriptedCompletions:
+    """Each call pops the next step: an exception to raise or a delay in seconds."""
+
+    def __init__(self, steps=()):
+        self.steps = list(steps)
+        self.calls = []
+
+    async def create(self, **kwargs):
+        self.calls.append(kwargs)
+        step = self.steps.pop(0) if self.steps else None
+        if isinstance(step, Exception):
+            raise step
+        if step:
+            await asyncio.sleep(step)
+        return Response()
+
+
+def client_with(steps=()):
+    client = type("Client", (), {})()
+    client.chat = type("Chat", (), {})()
+    client.chat.completions = ScriptedCompletions(steps)
+    return client
+
+
+def bad_request(message):
+    request = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+    response = httpx.Response(400, request=request)
+    return openai.BadRequestError(message, response=response, body=None)
+
+
+def rate_limit_error():
+    request = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+    return openai.RateLimitError("rate limited", response=httpx.Response(429, request=request), body=None)
+
+
+@pytest.fixture
+def metrics(monkeypatch):
+    metrics = LLMMetrics()
+    monkeypatch.setattr(llm_module, "llm_metrics", metrics)
+    return metrics
+
+
+@pytest.fixture
+def service(monkeypatch, metrics):
+    monkeypatch.setattr(llm_module.settings, "LLM_RETRY_BASE_DELAY", 0.001)
+    monkeypatch.setattr(llm_module.settings, "LLM_MAX_RETRIES", 2)
+    monkeypatch.setattr(llm_module.settings, "LLM_PROMPT_CACHE_SITES", {})
+    svc = object.__new__(LLMService)
+    svc.model = "test-model"
+    svc.limiter = AdaptiveConcurrencyLimiter(initial_limit=8, cooldown=0)
+    return svc
+
+
+class TestDeadline:
+    """Test per-call deadlines."""
+
+    @pytest.mark.asyncio
+    async def test_attempt_timeout_is_remaining_budget(self, service):
+        service.client = client_with()
+
+        await service.chat_completion(messages=[], deadline=5.0)
+
+        timeout = service.client.chat.completions.calls[0]["timeout"]
+        assert 4.0 < timeout <= 5.0
+
+    @pytest.mark.asyncio
+    async def test_slow_call_exceeds_deadline(self, service, metrics):
+        service.client = client_with([1.0])
+
+        with pytest.raises(asyncio.TimeoutError):
+            await service.chat_completion(messages=[], site="slow", deadline=0.05)
+
+        assert service.limiter.in_flight == 0
+        assert metrics.requests[("slow", "timeout")] == 1
+
+    @pytest.mark.asyncio
+    async def test_limiter_wait_counts_against_deadline(self, service):
+        service.client = client_with()
+        service.limiter = AdaptiveConcurrencyLimiter(initial_limit=1, min_limit=1, max_limit=1)
+        await service.limiter.acquire()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await service.chat_completion(messages=[], deadline=0.05)
+
+        assert service.client.chat.completions.calls == []
+
+    @pytest.mark.asyncio
+    async def test_no_timeout_without_deadline(self, service):
+        service.client = client_with()
+
+        await service.chat_completion(messages=[])
+
+        assert "timeout" not in service.client.chat.completions.calls[0]
+
+
+class TestJsonMode:
+    """Test response_format handling."""
+
+    @pytest.mark.asyncio
+    async def test_sets_response_format(self, service):
+        service.client = client_with()
+
+        await service.chat_completion(messages=[], json_mode=True)
+
+        assert service.client.chat.completions.calls[0]["response_format"] == {"type": "json_object"}
+
+    @pytest.mark.asyncio
+    async def test_falls_back_when_provider_rejects_it(self, service):
+        service.client = client_with([bad_request("response_format is not supported")])
+
+        await service.chat_completion(messages=[], json_mode=True)
+        await service.chat_completion(messages=[], json_mode=True)
+
+        calls = service.client.chat.completions.calls
+        assert len(calls) == 3
+        assert "response_format" not in calls[1]
+        assert "response_format" not in calls[2]
+
+    @pytest.mark.asyncio
+    async def test_fallback_does_not_use_up_a_retry(self, service):
+        # LLM_MAX_RETRIES is 2: the rejection arrives on the last attempt
+        service.client = client_with([
+            rate_limit_error(), rate_limit_error(), bad_request("response_format is not supported")
+        ])
+
+        await service.chat_completion(messages=[], json_mode=True)
+
+        calls = service.client.chat.completions.calls
+        assert len(calls) == 4
+        assert "response_format" not in calls[3]
+
+    @pytest.mark.asyncio
+    async def test_other_bad_requests_are_raised(self, service):
+        service.client = client_with([bad_request("context length exceeded")])
+
+        with pytest.raises(openai.BadRequestError):
+            await service.chat_completion(messages=[], json_mode=True)
+
+
+class TestBackoff:
+    """Test jittered retry delays."""
+
+    def test_full_jitter_is_bounded(self, service, monkeypatch):
+        monkeypatch.setattr(llm_module.settings, "LLM_RETRY_BASE_DELAY", 1.0)
+        loop = asyncio.new_event_loop()
+        try:
+            delays = [service._backoff(2, None, None, loop) for _ in range(200)]
+        finally:
+            loop.close()
+
+        assert all(0 <= delay <= 4.0 for delay in delays)
+        assert len(set(delays)) > 1
+
+    def test_retry_after_wins_but_not_past_deadline(self, service):
+        loop = asyncio.new_event_loop()
+        try:
+            assert service._backoff(0, 3.0, None, loop) == 3.0
+            assert service._backoff(0, 3.0, loop.time() + 0.5, loop) <= 0.5
+        finally:
+            loop.close()
+
+
+class TestMetrics:
+    """Test per-call-site counters and exposition."""
+
+    @pytest.mark.asyncio
+    async def test_records_outcome_tokens_and_retries(self, service, metrics):
+        service.client = client_with([rate_limit_error()])
+
+        await service.chat_completion(messages=[], site="examination.level1")
+
+        assert metrics.requests[("examination.level1", "ok")] == 1
+        assert metrics.attempt_errors[("examination.level1", "rate_limit")] == 1
+        assert metrics.tokens[("examination.level1", "prompt")] == 12
+        assert metrics.tokens[("examination.level1", "completion")] == 3
+        assert metrics.latency_count["examination.level1"] == 1
+
+    @pytest.mark.asyncio
+    async def test_records_errors(self, service, metrics):
+        service.client = client_with([ValueError("boom")])
+
+        with pytest.raises(ValueError):
+            await service.chat_completion(messages=[], site="system.test")
+
+        assert metrics.requests[("system.test", "error")] == 1
+
+    def test_render_prometheus_text(self):
+        metrics = LLMMetrics()
+        metrics.observe("a", "ok", 0.3, prompt_tokens=5, completion_tokens=2)
+        metrics.observe("a", "ok", 20.0)
+
+        text = metrics.render()
+
+        assert 'llm_requests_total{site="a",outcome="ok"} 2' in text
+        assert 'llm_tokens_total{site="a",kind="prompt"} 5' in text
+        assert 'llm_request_duration_seconds_bucket{site="a",le="0.5"} 1' in text
+        assert 'llm_request_duration_seconds_bucket{site="a",le="+Inf"} 2' in text
+        assert 'llm_request_duration_seconds_count{site="a"} 2' in text
+        assert LLMMetrics.BUCKETS[-1] == math.inf
+
+    def test_snapshot(self):
+        metrics = LLMMetrics()
+        metrics.observe("a", "ok", 1.0, prompt_tokens=4)
+        metrics.attempt_error("a", "timeout")
+
+        snapshot = metrics.snapshot()
+
+        assert snapshot["a"]["requests"] == {"ok": 1}
+        assert snapshot["a"]["attempt_errors"] == {"timeout": 1}
+        assert snapshot["a"]["latency_avg_s"] == 1.0
+
+
+class TestCoalescing:
+    """Test single-flight of identical in-flight requests."""
+
+    @pytest.mark.asyncio
+    async def test_identical_requests_share_one_call(self, service, metrics):
+        service.client = client_with([0.01])
+        messages = [{"role": "user", "content": "胸部CT平扫"}]
+
+        responses = await asyncio.gather(*(
+            service.chat_completion(messages=messages, site="examination.level1", temperature=0.1)
+            for _ in range(5)
+        ))
+
+        assert len(service.client.chat.completions.calls) == 1
+        assert all(response is responses[0] for response in responses)
+        assert metrics.requests[("examination.level1", "ok")] == 1
+
+    @pytest.mark.asyncio
+    async def test_different_requests_are_not_joined(self, service):
+        service.client = client_with([0.01, 0.01])
+
+        await asyncio.gather(
+            service.chat_completion(messages=[{"role": "user", "content": "a"}]),
+            service.chat_completion(messages=[{"role": "user", "content": "b"}])
+        )
+
+        assert len(service.client.chat.completions.calls) == 2